@@ -1,7 +1,12 @@
 from django.contrib import admin
-from .models import Trip, LogSheet, HoursOfService, LogActivity
+from .models import Trip, LogSheet, HoursOfService, LogActivity, GeoCacheEntry, GeoCacheGeneration, PlanningJob, DutyRollup, DashboardVersion
 
 admin.site.register(Trip)
 admin.site.register(LogSheet)
 admin.site.register(HoursOfService)
 admin.site.register(LogActivity)
+admin.site.register(GeoCacheEntry)
+admin.site.register(GeoCacheGeneration)
+admin.site.register(PlanningJob)
+admin.site.register(DutyRollup)
+admin.site.register(DashboardVersion)
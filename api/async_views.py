@@ -0,0 +1,187 @@
+"""
+Native async versions of the route planner and reverse geocoding views
+
+DRF views are synchronous, so under ASGI every request holds a thread
+while it waits on OSRM and Nominatim. These views await the upstream
+calls on a shared httpx client instead, so a single ASGI worker can keep
+hundreds of plans in flight. They reuse RoutePlannerView's planning and
+persistence code and the same caches, and accept the same token auth.
+
+Requests that would queue for a rate-limited upstream for longer than
+OUTBOUND_HTTP['MAX_QUEUE_WAIT'] are answered 503 with Retry-After instead.
+
+Run them under an ASGI server, e.g. uvicorn truckerapp.asgi:application
+"""
+import asyncio
+import datetime
+import json
+import math
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views import View
+from rest_framework.authentication import get_authorization_header
+from rest_framework.authtoken.models import Token
+
+from .cycle import hours_of_service_defaults
+from .geocoding import ageocode, areverse_geocode_address
+from .http import UpstreamThrottled, fail_fast
+from .models import HoursOfService
+from .poi import FUEL_STOP_KINDS, REST_STOP_KINDS, get_poi_index
+from .projection import serialize
+from .routing import aget_route
+from .serializers import GeocodingRequestSerializer, RouteRequestSerializer, RouteResponseSerializer
+from .views import RoutePlannerView
+
+
+async def authenticate(request):
+    """
+    Resolve the user from a DRF "Authorization: Token <key>" header
+
+    Returns:
+        User or None if the header is missing or invalid
+    """
+    auth = get_authorization_header(request).split()
+    if len(auth) != 2 or auth[0].lower() != b'token':
+        return None
+    try:
+        token = await Token.objects.select_related('user').aget(key=auth[1].decode())
+    except (Token.DoesNotExist, UnicodeError):
+        return None
+    return token.user if token.user.is_active else None
+
+
+class AsyncAPIView(View):
+    """
+    Async view requiring token authentication, exempt from CSRF like DRF views
+    """
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        view.csrf_exempt = True
+        return view
+
+    async def dispatch(self, request, *args, **kwargs):
+        request.user = await authenticate(request)
+        if request.user is None:
+            return JsonResponse(
+                {'detail': 'Authentication credentials were not provided.'}, status=401
+            )
+        try:
+            with fail_fast():
+                return await super().dispatch(request, *args, **kwargs)
+        except UpstreamThrottled as e:
+            response = JsonResponse({'error': str(e)}, status=503)
+            response['Retry-After'] = str(math.ceil(e.wait))
+            return response
+
+
+class AsyncRoutePlannerView(AsyncAPIView):
+    """
+    Async equivalent of RoutePlannerView.post
+    """
+    planner = RoutePlannerView()
+
+    async def post(self, request):
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return JsonResponse({'detail': 'JSON parse error'}, status=400)
+
+        serializer = RouteRequestSerializer(data=data)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=400)
+
+        current_location = serializer.validated_data['current_location']
+        pickup_location = serializer.validated_data['pickup_location']
+        dropoff_location = serializer.validated_data['dropoff_location']
+
+        today = datetime.date.today()
+        current_hours, _ = await HoursOfService.objects.aget_or_create(
+            driver=request.user,
+            date=today,
+            defaults=hours_of_service_defaults(request.user, today)
+        )
+
+        try:
+            route_data = await self._calculate_route(
+                current_location, pickup_location, dropoff_location, current_hours
+            )
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        # Saving needs a transaction, which the async ORM does not support
+        await sync_to_async(self.planner._save_plan)(
+            request.user, current_hours, pickup_location, dropoff_location, route_data
+        )
+
+        return JsonResponse(serialize(RouteResponseSerializer, route_data))
+
+    async def _calculate_route(self, current_location, pickup_location, dropoff_location, current_hours):
+        """
+        Async equivalent of RoutePlannerView._calculate_route
+        """
+        try:
+            coords = await asyncio.gather(
+                ageocode(current_location),
+                ageocode(pickup_location),
+                ageocode(dropoff_location),
+            )
+        except UpstreamThrottled:
+            raise
+        except Exception as e:
+            raise ValueError(f"Geocoding error: {str(e)}")
+
+        route = await aget_route(*coords)
+
+        # Decoding the route and simulating the trip is CPU work without any
+        # database access; off the event loop it does not stall other plans
+        route_data, pending_stops = await sync_to_async(self.planner._plan_route, thread_sensitive=False)(
+            [current_location, pickup_location, dropoff_location],
+            coords,
+            route,
+            current_hours
+        )
+
+        await asyncio.gather(*(
+            self._place_stop(stop, geometry, ratio)
+            for stop, _, geometry, ratio in pending_stops
+        ))
+
+        return route_data
+
+    async def _place_stop(self, stop, geometry, ratio):
+        """
+        Locate a rest or fuel stop the same way as the sync stop finders
+        """
+        if stop['type'] == 'fuel':
+            kinds, placeholder = FUEL_STOP_KINDS, "Fuel Station"
+        else:
+            kinds, placeholder = REST_STOP_KINDS, "Rest Area"
+
+        poi = get_poi_index().find_along(geometry, ratio, kinds)
+        if poi is not None:
+            location, coordinates = poi.description, poi.coordinates
+        elif (point := geometry.point_at(ratio)) is not None:
+            long, lat = point
+            location, coordinates = await areverse_geocode_address(lat, long), f"{long},{lat}"
+        else:
+            location, coordinates = placeholder, await ageocode(placeholder)
+
+        stop['location'] = location
+        stop['coordinates'] = coordinates
+
+
+class AsyncReverseGeocodeView(AsyncAPIView):
+    """
+    Async equivalent of the reverse_geocode view
+    """
+    async def get(self, request):
+        serializer = GeocodingRequestSerializer(data=request.GET)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=400)
+
+        address = await areverse_geocode_address(
+            serializer.validated_data['lat'], serializer.validated_data['lng']
+        )
+        return JsonResponse({'formatted_address': address})
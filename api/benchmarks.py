@@ -0,0 +1,359 @@
+"""
+Benchmark suite for the planner's hot paths
+
+Each case is timed over a number of samples after a warm-up run, then run
+once more under tracemalloc and a query counter. Routing and geocoding go
+to the offline stand-in (api.standin) with no added latency, and the geo
+caches are purged before every sample, so lookups always take the cold
+path without any network noise. The benchmark_suite command runs this
+against a throwaway test database and saves or compares the results.
+"""
+import io
+import platform
+import random
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import timedelta
+from unittest import mock
+
+import django
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.db.backends.utils import CursorWrapper
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from accounts.models import DriverProfile
+
+from . import geocoding, http, standin
+from .cache import TwoTierCache
+from .models import DutyRollup, HoursOfService, LogActivity, LogSheet, Trip
+from .routing import route_key
+from .views import RoutePlannerView, generate_driver_log_pdf, generate_driver_log_template_pdf
+
+
+PERCENTILES = (50, 90, 95, 99)
+
+# Allowed slowdown in compare mode before a metric counts as a regression
+DEFAULT_THRESHOLD = 0.25
+
+# Metrics compare() checks, and whether they may grow by the threshold
+# (timings and memory) or not at all (query counts)
+COMPARED_METRICS = {
+    'p50_ms': True,
+    'p95_ms': True,
+    'peak_kib': True,
+    'queries': False,
+}
+
+TRIP = ('Los Angeles, CA', 'Denver, CO', 'Chicago, IL')
+
+# Seattle to Miami to Boston, about 9,000 synthetic road kilometers
+LONG_ROUTE = ('-122.33,47.61', '-80.19,25.76', '-71.06,42.36')
+
+RANGE_DAYS = 7
+
+
+def percentile(values, p):
+    """
+    Linearly interpolated percentile of a sorted list
+    """
+    position = (len(values) - 1) * p / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+@contextmanager
+def count_queries():
+    """
+    Count the queries run on every thread, including the lookup pool's
+
+    Yields:
+        dict: {'queries': count so far}
+    """
+    counter = {'queries': 0}
+    lock = threading.Lock()
+    execute = CursorWrapper._execute_with_wrappers
+
+    def counted(self, *args, **kwargs):
+        with lock:
+            counter['queries'] += 1
+        return execute(self, *args, **kwargs)
+
+    with mock.patch.object(CursorWrapper, '_execute_with_wrappers', counted):
+        yield counter
+
+
+@contextmanager
+def use_standin(fixtures=None):
+    """
+    Route every routing and geocoding call to the stand-in, without latency
+    """
+    def reset():
+        for accessor in (http.get_session, geocoding.get_geolocator, standin._shared_standin):
+            accessor.reset()
+
+    config = {
+        'ENABLED': True,
+        'FIXTURES': fixtures,
+        'LATENCY': {service: 0.0 for service in standin.SERVICES},
+        'RECORD': False,
+        'SYNTHESIZE': True,
+    }
+    reset()
+    try:
+        with override_settings(GEO_STANDIN=config):
+            yield
+    finally:
+        reset()
+
+
+def populate_trips(count, prefix):
+    """
+    Create a driver with count synthetic trips spread back over time
+
+    Blocks of ten trips share a created_at, to exercise the id tie-break
+    in the trip ordering.
+
+    Args:
+        count (int): Trips to create
+        prefix (str): Start of the driver's username
+
+    Returns:
+        User: The driver, whose deletion removes the trips again
+    """
+    driver = User.objects.create_user(f'{prefix}-{time.time_ns()}')
+    with transaction.atomic():
+        Trip.objects.bulk_create(
+            (
+                Trip(
+                    driver=driver,
+                    pickup_location=f'Pickup {i}',
+                    dropoff_location=f'Dropoff {i}',
+                    distance=random.uniform(50, 2500),
+                    estimated_hours=random.uniform(1, 40),
+                    start_time=timezone.now(),
+                )
+                for i in range(count)
+            ),
+            batch_size=1000
+        )
+        # created_at is auto_now_add, so spread the rows over time afterwards
+        ids = list(Trip.objects.filter(driver=driver).order_by('id').values_list('id', flat=True))
+        now = timezone.now()
+        for block in range(0, len(ids), 10):
+            Trip.objects.filter(id__in=ids[block:block + 10]).update(
+                created_at=now - timedelta(minutes=len(ids) - block)
+            )
+    return driver
+
+
+def purge_geo_caches():
+    for cache in TwoTierCache.registry.values():
+        cache.purge()
+
+
+class Case:
+    """
+    A benchmarked call with optional untimed setup before each run
+    """
+    def __init__(self, name, run, setup=None):
+        self.name = name
+        self.run = run
+        self.setup = setup
+
+    def measure(self, samples, warmup=1):
+        """
+        Time the case, then trace one more run for allocations and queries
+
+        Returns:
+            dict: Latency percentiles and extremes (ms), peak and retained
+            traced memory (KiB) and the query count of one run
+        """
+        for _ in range(warmup):
+            self._prepare()
+            self.run()
+
+        timings = []
+        for _ in range(samples):
+            self._prepare()
+            started = time.perf_counter()
+            self.run()
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+
+        self._prepare()
+        tracemalloc.start()
+        try:
+            with count_queries() as counter:
+                self.run()
+            retained, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        result = {
+            'samples': samples,
+            'min_ms': timings[0],
+            **{f'p{p}_ms': percentile(timings, p) for p in PERCENTILES},
+            'max_ms': timings[-1],
+            'mean_ms': sum(timings) / len(timings),
+            'peak_kib': peak / 1024,
+            'retained_kib': retained / 1024,
+            'queries': counter['queries'],
+        }
+        return {key: round(value, 3) if isinstance(value, float) else value for key, value in result.items()}
+
+    def _prepare(self):
+        if self.setup is not None:
+            self.setup()
+
+
+def build_cases():
+    """
+    Create a benchmark driver with a week of log sheets and the cases using it
+    """
+    driver = User.objects.create_user(f'benchmark-suite-{time.time_ns()}')
+    DriverProfile.objects.create(user=driver, driver_license='BENCH-0001', phone_number='555-0100')
+    view = RoutePlannerView()
+    factory = APIRequestFactory()
+    fresh_hours = HoursOfService(driver=driver, driving_used=0.0, daily_used=0.0, cycle_used=0.0)
+
+    def plan():
+        request = factory.post('/api/routes/plan/', dict(zip(
+            ('current_location', 'pickup_location', 'dropoff_location'), TRIP
+        )), format='json', secure=True)
+        force_authenticate(request, user=driver)
+        response = RoutePlannerView.as_view()(request)
+        assert response.status_code == 200, response.data
+
+    def reset_driver():
+        Trip.objects.filter(driver=driver).delete()
+        LogSheet.objects.filter(driver=driver).delete()
+        HoursOfService.objects.filter(driver=driver).delete()
+        DutyRollup.objects.filter(driver=driver).delete()
+        purge_geo_caches()
+
+    # Today's sheet from a real plan, copied back over the previous days
+    reset_driver()
+    plan()
+    today = LogSheet.objects.get(driver=driver, date=timezone.localdate())
+    activities = list(today.activities.all())
+    for days in range(1, RANGE_DAYS):
+        sheet = LogSheet.objects.create(
+            driver=driver, trip=today.trip, date=today.date - timedelta(days=days),
+            hours_logged=today.hours_logged, cycle_hours=today.cycle_hours
+        )
+        LogActivity.objects.bulk_create(
+            LogActivity(
+                log_sheet=sheet, driver=driver, activity_type=activity.activity_type, location=activity.location,
+                description=activity.description,
+                start_time=activity.start_time - timedelta(days=days),
+                end_time=activity.end_time - timedelta(days=days),
+            )
+            for activity in activities
+        )
+
+    # The long route is synthesized once; only placing stops on it is timed
+    _, long_route = standin.StandIn().lookup(f'/route/v1/driving/{route_key(*LONG_ROUTE)}')
+    long_route = long_route['routes'][0]
+
+    def calculate_route():
+        view._calculate_route(*TRIP, fresh_hours)
+
+    def place_stops():
+        _, pending_stops = view._plan_route(['Seattle', 'Miami', 'Boston'], list(LONG_ROUTE), long_route, fresh_hours)
+        for _, _, geometry, ratio in pending_stops:
+            geometry.point_at(ratio)
+
+    def pdf(pdf_view, path, **params):
+        def run():
+            request = factory.get(path, params, secure=True)
+            force_authenticate(request, user=driver)
+            response = pdf_view(request)
+            assert response.status_code == 200, response.status_code
+            if response.streaming:
+                io.BytesIO().writelines(response.streaming_content)
+        return run
+
+    start = (today.date - timedelta(days=RANGE_DAYS - 1)).isoformat()
+    clear_pdfs = caches['pdf'].clear
+    cases = [
+        Case('calculate_route', calculate_route, setup=purge_geo_caches),
+        Case('stop_placement_long_route', place_stops),
+        Case('plan_view', plan, setup=reset_driver),
+        Case('pdf_canvas', pdf(generate_driver_log_pdf, '/api/driver-logs/pdf/'), setup=clear_pdfs),
+        Case(
+            f'pdf_canvas_{RANGE_DAYS}_days',
+            pdf(generate_driver_log_pdf, '/api/driver-logs/pdf/', start=start, end=today.date.isoformat()),
+        ),
+        Case('pdf_template', pdf(generate_driver_log_template_pdf, '/api/driver-logs/pdf/template/'), setup=clear_pdfs),
+    ]
+    return driver, cases
+
+
+def run_suite(samples=20, only=None, fixtures=None, report=None):
+    """
+    Run the benchmark cases
+
+    Args:
+        samples (int): Timed runs per case
+        only (list): Names of the cases to run, all by default
+        fixtures (str): Stand-in fixture file to serve recorded responses from
+        report (callable): Called with (name, result) as each case finishes
+
+    Returns:
+        dict: Run metadata under 'meta' and each case's result under 'cases'
+    """
+    results = {
+        'meta': {
+            'created': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'machine': platform.machine(),
+            'samples': samples,
+        },
+        'cases': {},
+    }
+    with use_standin(fixtures):
+        driver, cases = build_cases()
+        try:
+            for case in cases:
+                if only and case.name not in only:
+                    continue
+                results['cases'][case.name] = case.measure(samples)
+                if report is not None:
+                    report(case.name, results['cases'][case.name])
+        finally:
+            driver.delete()
+            purge_geo_caches()
+    return results
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare a run against a baseline run
+
+    Timings and peak memory regress when they exceed the baseline by more
+    than threshold; query counts regress on any increase.
+
+    Returns:
+        list: (case, metric, baseline value, current value, regressed) rows
+        for every metric present in both runs
+    """
+    rows = []
+    for name, result in current['cases'].items():
+        base = baseline['cases'].get(name)
+        if base is None:
+            continue
+        for metric, relative in COMPARED_METRICS.items():
+            if metric not in base or metric not in result:
+                continue
+            limit = base[metric] * (1 + threshold) if relative else base[metric]
+            rows.append((name, metric, base[metric], result[metric], result[metric] > limit))
+    return rows
@@ -0,0 +1,371 @@
+"""
+Two-tier cache for outbound geo lookups.
+
+Each cache keeps a small in-process LRU in front of the GeoCacheEntry table.
+Repeat lookups inside one worker never touch the database, and lookups
+shared between workers never touch the upstream service.
+
+Purging bumps the namespace's GeoCacheGeneration row. Every process checks
+it at most every GENERATION_CHECK seconds and clears its LRU when it has
+changed, so a purge reaches running workers without a restart.
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .lookups import run_concurrently
+from .models import GeoCacheEntry, GeoCacheGeneration
+
+
+logger = logging.getLogger(__name__)
+
+
+# Defaults for every cache namespace, overridable through settings.GEO_CACHES
+DEFAULT_CACHE_CONFIG = {
+    'MAX_ENTRIES': 1024,             # In-process LRU size
+    'DB_MAX_ENTRIES': 50000,         # Rows kept in the database tier
+    'TTL': 60 * 60 * 24 * 30,        # Seconds before an entry goes stale
+    'EVICT_EVERY': 100,              # Writes between sweeps of the database tier
+    'GENERATION_CHECK': 30,          # Seconds between checks for purges by other processes
+}
+
+# Longest key the GeoCacheEntry.key column holds
+MAX_KEY_LENGTH = 255
+
+
+def storage_key(key):
+    """
+    The database key for a cache key, hashing keys too long for the column
+
+    Truncating instead would let two long keys sharing a prefix read each
+    other's values.
+    """
+    if len(key) <= MAX_KEY_LENGTH:
+        return key
+    return 'sha256:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+def get_cache_config(namespace):
+    """
+    Merge the defaults with any settings.GEO_CACHES override for a namespace
+    """
+    config = dict(DEFAULT_CACHE_CONFIG)
+    config.update(getattr(settings, 'GEO_CACHES', {}).get(namespace, {}))
+    return config
+
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache with a per-entry TTL
+    """
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class TwoTierCache:
+    """
+    In-process LRU backed by GeoCacheEntry rows in one namespace
+
+    Values must be JSON serializable and never None, since None means a miss.
+    """
+    registry = {}
+
+    def __init__(self, namespace):
+        self.namespace = namespace
+        self.config = get_cache_config(namespace)
+        self.memory = LRUCache(self.config['MAX_ENTRIES'], self.config['TTL'])
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._generation = None
+        self._generation_checked = float('-inf')
+        self.reset_stats()
+        TwoTierCache.registry[namespace] = self
+
+    def reset_stats(self):
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _entries(self, key):
+        return GeoCacheEntry.objects.filter(
+            namespace=self.namespace,
+            key=storage_key(key),
+            expires_at__gt=timezone.now()
+        ).only('value', 'expires_at')
+
+    def get(self, key):
+        """
+        Return the cached value for key, or None on a miss
+        """
+        if self._generation_due():
+            self._check_generation()
+        value = self.memory.get(key)
+        if value is not None:
+            self._count('memory_hits')
+            return value
+
+        try:
+            entry = self._entries(key).first()
+        except DatabaseError:
+            # The database tier is best effort; treat failures as a miss
+            logger.exception("Geo cache read failed for %s", self.namespace)
+            entry = None
+        return self._db_result(key, entry)
+
+    async def aget(self, key):
+        """
+        Async get, reading the database tier with the async ORM
+        """
+        if self._generation_due():
+            await sync_to_async(self._check_generation)()
+        value = self.memory.get(key)
+        if value is not None:
+            self._count('memory_hits')
+            return value
+
+        try:
+            entry = await self._entries(key).afirst()
+        except DatabaseError:
+            logger.exception("Geo cache read failed for %s", self.namespace)
+            entry = None
+        return self._db_result(key, entry)
+
+    def _generation_due(self):
+        return time.monotonic() - self._generation_checked >= self.config['GENERATION_CHECK']
+
+    def _check_generation(self):
+        """
+        Clear the in-process tier if another process purged the namespace
+        """
+        try:
+            generation = GeoCacheGeneration.objects.filter(
+                namespace=self.namespace
+            ).values_list('generation', flat=True).first() or 0
+        except DatabaseError:
+            logger.exception("Geo cache generation check failed for %s", self.namespace)
+            return
+        with self._lock:
+            if self._generation is not None and generation != self._generation:
+                self.memory.clear()
+            self._generation = generation
+            self._generation_checked = time.monotonic()
+
+    def _db_result(self, key, entry):
+        if entry is None:
+            self._count('misses')
+            return None
+
+        # Promote to the in-process tier for the rest of its lifetime
+        remaining = (entry.expires_at - timezone.now()).total_seconds()
+        self.memory.set(key, entry.value, ttl=min(remaining, self.config['TTL']))
+        self._count('db_hits')
+        return entry.value
+
+    def set(self, key, value):
+        """
+        Store value in both tiers
+        """
+        self.memory.set(key, value)
+        self._store(key, value)
+
+    async def aset(self, key, value):
+        """
+        Async set. The database write needs a transaction, which the async
+        ORM does not support, so it runs on Django's sync thread.
+        """
+        self.memory.set(key, value)
+        await sync_to_async(self._store)(key, value)
+
+    def _store(self, key, value):
+        if self._generation_due():
+            self._check_generation()
+        key = storage_key(key)
+        expires_at = timezone.now() + timedelta(seconds=self.config['TTL'])
+        try:
+            # Savepoint so a failed write cannot break a surrounding transaction
+            with transaction.atomic():
+                updated = GeoCacheEntry.objects.filter(namespace=self.namespace, key=key).update(
+                    value=value, expires_at=expires_at, updated_at=timezone.now()
+                )
+                if not updated:
+                    GeoCacheEntry.objects.create(
+                        namespace=self.namespace, key=key, value=value, expires_at=expires_at
+                    )
+            # Sweep now and then rather than on every miss, which would add a
+            # count over the whole table to the cold path
+            with self._lock:
+                self._writes += 1
+                sweep = self._writes % self.config['EVICT_EVERY'] == 0
+            if sweep:
+                self.evict()
+        except DatabaseError:
+            # Another worker may have stored the same key first; the value is
+            # already in memory so the lookup itself still succeeds
+            logger.warning("Geo cache write failed for %s", self.namespace, exc_info=True)
+
+    def get_or_fetch(self, key, fetch):
+        """
+        Return the cached value for key, calling fetch() and storing its result on a miss
+        """
+        value = self.get(key)
+        if value is None:
+            value = fetch()
+            self.set(key, value)
+        return value
+
+    async def aget_or_fetch(self, key, fetch):
+        """
+        Async get_or_fetch; fetch is a coroutine function
+        """
+        value = await self.aget(key)
+        if value is None:
+            value = await fetch()
+            await self.aset(key, value)
+        return value
+
+    def evict(self):
+        """
+        Delete expired rows, then the least recently written rows past DB_MAX_ENTRIES
+
+        Returns:
+            int: Rows deleted
+        """
+        rows = GeoCacheEntry.objects.filter(namespace=self.namespace)
+        deleted, _ = rows.filter(expires_at__lte=timezone.now()).delete()
+
+        overflow = rows.count() - self.config['DB_MAX_ENTRIES']
+        if overflow > 0:
+            stale_ids = rows.order_by('updated_at').values_list('id', flat=True)[:overflow]
+            deleted += GeoCacheEntry.objects.filter(id__in=list(stale_ids)).delete()[0]
+        return deleted
+
+    def purge(self):
+        """
+        Drop every entry in this namespace from both tiers, in every process
+
+        Other processes clear their in-process tier within GENERATION_CHECK seconds.
+        """
+        with transaction.atomic():
+            deleted, _ = GeoCacheEntry.objects.filter(namespace=self.namespace).delete()
+            GeoCacheGeneration.objects.get_or_create(namespace=self.namespace)
+            GeoCacheGeneration.objects.filter(namespace=self.namespace).update(generation=F('generation') + 1)
+        self.memory.clear()
+        self._check_generation()
+        return deleted
+
+    def stats(self):
+        return {
+            'memory_hits': self.memory_hits,
+            'db_hits': self.db_hits,
+            'misses': self.misses,
+            'memory_entries': len(self.memory),
+        }
+
+
+class Lookup:
+    """
+    A cache key and the call that fetches its value on a miss
+    """
+    __slots__ = ('cache', 'key', 'fetch')
+
+    def __init__(self, cache, key, fetch):
+        self.cache = cache
+        self.key = key
+        self.fetch = fetch
+
+    def get(self):
+        return self.cache.get_or_fetch(self.key, self.fetch)
+
+
+def _capture(fetch):
+    try:
+        return fetch()
+    except Exception as e:
+        return e
+
+
+def resolve(lookups, safe=False):
+    """
+    Values of several lookups, fetching the misses concurrently
+
+    Both cache tiers are read and written here on the calling thread; only
+    the upstream fetches run on the lookup pool, so pool threads never
+    touch the database. Lookups sharing a cache and key are fetched once.
+
+    Args:
+        lookups (list): Lookup instances
+        safe (bool): Put a failed fetch's exception in its place instead of raising it
+
+    Returns:
+        list: Values in the same order as lookups
+    """
+    values = [lookup.cache.get(lookup.key) for lookup in lookups]
+
+    misses = {}
+    for lookup, value in zip(lookups, values):
+        if value is None:
+            misses.setdefault((lookup.cache.namespace, lookup.key), lookup)
+
+    call = _capture if safe else (lambda fetch: fetch())
+    fetched = dict(zip(misses, run_concurrently([(call, lookup.fetch) for lookup in misses.values()])))
+    for (_, key), value in fetched.items():
+        if not isinstance(value, Exception):
+            misses[_, key].cache.set(key, value)
+
+    return [
+        fetched[lookup.cache.namespace, lookup.key] if value is None else value
+        for lookup, value in zip(lookups, values)
+    ]
+
+
+def cache_stats():
+    """
+    Hit/miss counters for every cache registered in this process
+    """
+    return {
+        namespace: cache.stats()
+        for namespace, cache in TwoTierCache.registry.items()
+    }
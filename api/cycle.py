@@ -0,0 +1,90 @@
+"""
+Rolling 70-hour/8-day cycle totals
+
+Each driver has one DutyRollup row per day on duty, holding that day's
+on-duty hours and the running total of every day up to it. The hours in
+the 8-day window ending on a date are then the running total at that
+date minus the running total 8 days earlier: two index lookups, however
+long the driver's history. Adding hours to a day bumps the running total
+of that day and any later rows in a single UPDATE, while the driver's
+user row is locked so concurrent plans add their hours one at a time.
+"""
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Case, F, When
+
+from .models import DutyRollup
+
+
+MAX_CYCLE_HOURS = 70    # On-duty hours allowed in the rolling window
+CYCLE_DAYS = 8          # Length of the rolling window in days
+
+
+def record_duty_hours(driver, date, hours):
+    """
+    Add on-duty hours to a driver's day and the running totals after it
+
+    Args:
+        driver (User): The driver
+        date (date): Day the hours were worked
+        hours (float): On-duty hours to add
+    """
+    rows = DutyRollup.objects.filter(driver=driver)
+    with transaction.atomic():
+        # Lock the driver, a single row however long the history, so no
+        # other plan moves the running totals between reading the previous
+        # day's and adding these hours
+        User.objects.select_for_update().filter(pk=driver.pk).values_list('pk', flat=True).get()
+
+        # A new day starts from the running total of the driver's previous day
+        DutyRollup.objects.get_or_create(driver=driver, date=date, defaults={
+            'cumulative_hours': lambda: rows.filter(date__lt=date).order_by('-date').values_list(
+                'cumulative_hours', flat=True
+            ).first() or 0.0
+        })
+
+        rows.filter(date__gte=date).update(
+            duty_hours=Case(When(date=date, then=F('duty_hours') + hours), default=F('duty_hours')),
+            cumulative_hours=F('cumulative_hours') + hours
+        )
+
+
+def _cumulative_hours(driver, date):
+    """
+    Running total of on-duty hours up to and including a date
+    """
+    total = DutyRollup.objects.filter(driver=driver, date__lte=date).order_by('-date').values_list(
+        'cumulative_hours', flat=True
+    ).first()
+    return total or 0.0
+
+
+def cycle_hours_used(driver, date):
+    """
+    On-duty hours in the 8-day window ending on a date
+
+    Args:
+        driver (User): The driver
+        date (date): Last day of the window
+
+    Returns:
+        float: Hours used
+    """
+    used = _cumulative_hours(driver, date) - _cumulative_hours(driver, date - timedelta(days=CYCLE_DAYS))
+    return max(round(used, 2), 0.0)
+
+
+def hours_of_service_defaults(driver, date):
+    """
+    Defaults for creating a driver's HoursOfService row for a day
+
+    The cycle hours carry over from the previous 7 days. They are computed
+    lazily, so get_or_create only looks them up when it creates the row.
+    """
+    return {
+        'cycle_used': lambda: cycle_hours_used(driver, date),
+        'daily_used': 0,
+        'driving_used': 0
+    }
@@ -0,0 +1,79 @@
+"""
+Per-driver cache for the dashboard endpoints the mobile app polls
+
+Each driver has a version counter, a DashboardVersion row. Responses are
+cached in the "dashboard" cache under the driver's current version and
+carry it in their ETag, so a poll costs one indexed read of the version,
+plus one cache read when the response has to be sent, while nothing has
+changed. Any committed write to a driver's trips, hours of service, log
+sheets or activities bumps the version (see api.signals), which retires
+every cached response of that driver at once, in every process.
+"""
+import time
+
+from django.core.cache import caches
+from django.db.models import F
+from django.utils.cache import get_conditional_response, patch_cache_control
+from rest_framework.response import Response
+
+from .models import DashboardVersion
+
+
+DASHBOARD_CACHE_ALIAS = 'dashboard'
+
+
+def get_version(driver_id):
+    """
+    The driver's current data version, starting one if there is none
+    """
+    version = DashboardVersion.objects.filter(driver_id=driver_id).values_list('version', flat=True).first()
+    if version is None:
+        # Seed from the clock rather than 0, so a driver id reused after a
+        # delete never repeats a version still in the response cache
+        version = DashboardVersion.objects.get_or_create(
+            driver_id=driver_id, defaults={'version': time.time_ns()}
+        )[0].version
+    return version
+
+
+def bump_version(driver_id):
+    """
+    Retire every cached dashboard response of a driver
+    """
+    # No row means nothing of this driver's has been cached yet; the first
+    # poll creates it after this write committed, so it sees the new data
+    DashboardVersion.objects.filter(driver_id=driver_id).update(version=F('version') + 1)
+
+
+def cached_driver_response(request, name, build, *parts):
+    """
+    Serve a driver's dashboard response from the cache
+
+    Args:
+        request: The DRF request of the authenticated driver
+        name (str): Which response this is
+        build (callable): Returns the response data on a cache miss
+        parts: Anything else the response depends on, such as today's date
+
+    Returns:
+        Response: The data with an ETag, or 304 if the client's copy is current
+    """
+    driver_id = request.user.id
+    tag = ':'.join(str(part) for part in (name, driver_id, get_version(driver_id), *parts))
+    etag = f'"{tag}"'
+
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+
+    cache = caches[DASHBOARD_CACHE_ALIAS]
+    key = f'dashboard:{tag}'
+    data = cache.get(key)
+    if data is None:
+        data = build()
+        cache.set(key, data)
+
+    response = Response(data)
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
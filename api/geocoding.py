@@ -0,0 +1,156 @@
+"""
+Cached geocoding helpers shared by the route planner views
+"""
+import math
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from geopy.geocoders import Nominatim
+
+from .cache import Lookup, TwoTierCache
+from .http import PooledRequestsAdapter, aget, get_http_config
+from .singleton import process_singleton
+
+
+USER_AGENT = "trucking_route_planner"
+DEFAULT_NOMINATIM_URL = "https://nominatim.openstreetmap.org"
+
+geocode_cache = TwoTierCache('geocode')
+reverse_cache = TwoTierCache('reverse')
+
+
+@process_singleton
+def get_geolocator():
+    """
+    Return the process-wide Nominatim geocoder on the pooled HTTP session
+    """
+    url = urlsplit(getattr(settings, 'NOMINATIM_URL', DEFAULT_NOMINATIM_URL))
+    return Nominatim(
+        user_agent=USER_AGENT,
+        domain=url.netloc + url.path.rstrip('/'),
+        scheme=url.scheme,
+        timeout=get_http_config()['TIMEOUT'],
+        adapter_factory=PooledRequestsAdapter,
+    )
+
+
+def normalize_address(location_name):
+    """
+    Collapse case and whitespace so equivalent addresses share a cache entry
+    """
+    return ' '.join(location_name.lower().split())
+
+
+def geocode_lookup(geolocator, location_name):
+    """
+    Lookup of an address's "longitude,latitude" in the geocode cache, for api.cache.resolve
+    """
+    def fetch():
+        location = geolocator.geocode(location_name)
+        if not location:
+            raise ValueError(f"Could not geocode location: {location_name}")
+        return f"{location.longitude},{location.latitude}"
+
+    return Lookup(geocode_cache, normalize_address(location_name), fetch)
+
+
+def geocode(geolocator, location_name):
+    """
+    Convert address to coordinates, consulting the geocode cache first
+
+    Args:
+        geolocator: Nominatim geolocator instance
+        location_name (str): Address or location name
+
+    Returns:
+        str: "longitude,latitude"
+    """
+    return geocode_lookup(geolocator, location_name).get()
+
+
+def grid_cell(lat, lng, precision=None):
+    """
+    Quantize a coordinate to a fixed-precision grid cell key
+
+    With the default precision of 3 decimal places a cell is roughly 110m
+    across, so trucks passing the same point on a corridor share one entry.
+    """
+    if precision is None:
+        precision = reverse_cache.config.get('PRECISION', 3)
+    scale = 10 ** precision
+    return f"{precision}:{math.floor(lat * scale)}:{math.floor(lng * scale)}"
+
+
+def reverse_geocode_lookup(geolocator, lat, lng):
+    """
+    Lookup of a point's address in the reverse geocode cache, for api.cache.resolve
+    """
+    def fetch():
+        location = geolocator.reverse(f'{lat}, {lng}')
+        if not location:
+            raise ValueError(f"Could not reverse geocode location: {lat}, {lng}")
+        return location.address
+
+    return Lookup(reverse_cache, grid_cell(lat, lng), fetch)
+
+
+def reverse_geocode_address(geolocator, lat, lng):
+    """
+    Convert coordinates to an address, consulting the reverse geocode cache first
+
+    Args:
+        geolocator: Nominatim geolocator instance
+        lat (float): Latitude
+        lng (float): Longitude
+
+    Returns:
+        str: Formatted address of the grid cell containing the point
+    """
+    return reverse_geocode_lookup(geolocator, lat, lng).get()
+
+
+async def _nominatim(path, params):
+    """
+    Query the Nominatim JSON API on the async client
+    """
+    base_url = getattr(settings, 'NOMINATIM_URL', DEFAULT_NOMINATIM_URL).rstrip('/')
+    response = await aget(
+        f"{base_url}/{path}",
+        params={**params, 'format': 'json'},
+        headers={'User-Agent': USER_AGENT}
+    )
+    if response.status_code != 200:
+        raise Exception(f"Nominatim API error: {response.status_code}")
+    return response.json()
+
+
+async def ageocode(location_name):
+    """
+    Async geocode, sharing the geocode cache with the sync version
+
+    Returns:
+        str: "longitude,latitude"
+    """
+    async def fetch():
+        results = await _nominatim('search', {'q': location_name, 'limit': 1})
+        if not results:
+            raise ValueError(f"Could not geocode location: {location_name}")
+        return f"{float(results[0]['lon'])},{float(results[0]['lat'])}"
+
+    return await geocode_cache.aget_or_fetch(normalize_address(location_name), fetch)
+
+
+async def areverse_geocode_address(lat, lng):
+    """
+    Async reverse geocode, sharing the reverse geocode cache with the sync version
+
+    Returns:
+        str: Formatted address of the grid cell containing the point
+    """
+    async def fetch():
+        result = await _nominatim('reverse', {'lat': lat, 'lon': lng})
+        if not result or 'error' in result:
+            raise ValueError(f"Could not reverse geocode location: {lat}, {lng}")
+        return result['display_name']
+
+    return await reverse_cache.aget_or_fetch(grid_cell(lat, lng), fetch)
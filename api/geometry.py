@@ -0,0 +1,242 @@
+"""
+Route geometry decoded into NumPy arrays for fast point lookups
+
+A RouteGeometry is built once per route leg. Placing a stop at a given
+fraction of the leg is then a binary search over cumulative distance plus
+a linear interpolation, instead of a rescan of the OSRM steps.
+
+compact_route simplifies a planned route and encodes it as a polyline, so
+trips can store their route in a few kilobytes and serve it again later
+without calling OSRM.
+"""
+import numpy as np
+
+
+EARTH_RADIUS_METERS = 6371008.8
+
+# Stored trip routes keep every vertex needed to stay within this many meters
+# of the OSRM geometry, which is invisible at street-level zoom
+STORED_ROUTE_TOLERANCE = 10.0
+POLYLINE_PRECISION = 5
+
+
+def decode_polyline(encoded, precision=5):
+    """
+    Decode a Google encoded polyline (the OSRM default geometry format)
+
+    Args:
+        encoded (str): Encoded polyline
+        precision (int): Decimal places the polyline was encoded with
+
+    Returns:
+        np.ndarray: (n, 2) array of [longitude, latitude]
+    """
+    if not encoded:
+        return np.empty((0, 2))
+
+    chunks = np.frombuffer(encoded.encode('ascii'), dtype=np.uint8).astype(np.int64) - 63
+
+    # Each value is a run of 5-bit chunks; the last chunk has the 0x20 bit clear
+    ends = chunks < 0x20
+    starts = np.concatenate(([0], np.flatnonzero(ends)[:-1] + 1))
+    position = np.arange(len(chunks)) - np.repeat(starts, np.diff(np.append(starts, len(chunks))))
+    values = np.add.reduceat((chunks & 0x1f) << (5 * position), starts)
+
+    # Undo the zigzag sign encoding, then the delta encoding
+    deltas = (values >> 1) ^ -(values & 1)
+    lat_lng = np.cumsum(deltas.reshape(-1, 2), axis=0) / 10 ** precision
+    return lat_lng[:, ::-1]
+
+
+def haversine_distances(coords):
+    """
+    Great-circle distance in meters between consecutive [lon, lat] points
+    """
+    radians = np.radians(coords)
+    lon, lat = radians[:, 0], radians[:, 1]
+    dlon, dlat = np.diff(lon), np.diff(lat)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(a))
+
+
+class RouteGeometry:
+    """
+    Decoded polyline of a route with the cumulative distance at each vertex
+    """
+    __slots__ = ('coords', 'cumulative')
+
+    def __init__(self, coords):
+        self.coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+        self.cumulative = np.concatenate(([0.0], np.cumsum(haversine_distances(self.coords))))
+
+    @classmethod
+    def from_route(cls, route):
+        """
+        Build the geometry of every leg of an OSRM route
+
+        Uses the per-step polylines, falling back to maneuver locations for
+        steps without geometry.
+        """
+        parts = []
+        for leg in route.get('legs', []):
+            for step in leg.get('steps', []):
+                if step.get('geometry'):
+                    points = decode_polyline(step['geometry'])
+                else:
+                    location = step.get('maneuver', {}).get('location')
+                    points = np.array([location]) if location else np.empty((0, 2))
+                # Consecutive steps share their joining vertex
+                if parts and len(points) and len(parts[-1]) and np.array_equal(parts[-1][-1], points[0]):
+                    points = points[1:]
+                parts.append(points)
+
+        if not parts:
+            return cls(np.empty((0, 2)))
+        return cls(np.concatenate(parts))
+
+    @property
+    def total_distance(self):
+        return float(self.cumulative[-1])
+
+    def __len__(self):
+        return len(self.coords)
+
+    def points_between(self, start, end, spacing):
+        """
+        Evenly spaced points between two distances along the route
+
+        Args:
+            start (float): Distance in meters from the start of the route
+            end (float): Distance in meters from the start of the route
+            spacing (float): Meters between consecutive points
+
+        Returns:
+            tuple: (distances, coords) arrays, coords as [longitude, latitude]
+        """
+        start = max(start, 0.0)
+        end = min(end, self.total_distance)
+        count = max(int((end - start) // spacing) + 1, 2)
+        distances = np.linspace(start, end, count)
+        coords = np.column_stack((
+            np.interp(distances, self.cumulative, self.coords[:, 0]),
+            np.interp(distances, self.cumulative, self.coords[:, 1]),
+        ))
+        return distances, coords
+
+    def point_at(self, ratio):
+        """
+        Interpolated point at a fraction of the route distance
+
+        Args:
+            ratio (float): Route completion ratio (0-1)
+
+        Returns:
+            tuple: (longitude, latitude), or None for an empty geometry
+        """
+        if not len(self.coords):
+            return None
+        if len(self.coords) == 1:
+            return tuple(self.coords[0])
+
+        target = min(max(ratio, 0.0), 1.0) * self.total_distance
+        i = int(np.searchsorted(self.cumulative, target, side='left'))
+        i = min(max(i, 1), len(self.coords) - 1)
+
+        start, end = self.cumulative[i - 1], self.cumulative[i]
+        fraction = (target - start) / (end - start) if end > start else 0.0
+        lon, lat = self.coords[i - 1] + fraction * (self.coords[i] - self.coords[i - 1])
+        return float(lon), float(lat)
+
+
+def encode_polyline(coords, precision=5):
+    """
+    Encode [longitude, latitude] points as a Google encoded polyline
+
+    Args:
+        coords: (n, 2) array of [longitude, latitude]
+        precision (int): Decimal places to keep
+
+    Returns:
+        str: Encoded polyline, the inverse of decode_polyline
+    """
+    coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+    lat_lng = np.round(coords[:, ::-1] * 10 ** precision).astype(np.int64)
+    deltas = np.diff(lat_lng, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+
+    # Zigzag the sign into the lowest bit, then emit 5-bit chunks
+    chunks = []
+    for value in ((deltas << 1) ^ (deltas >> 63)).tolist():
+        while value >= 0x20:
+            chunks.append((0x20 | (value & 0x1f)) + 63)
+            value >>= 5
+        chunks.append(value + 63)
+    return bytes(chunks).decode('ascii')
+
+
+def simplify(coords, tolerance):
+    """
+    Drop vertices that lie within tolerance of the simplified line (Douglas-Peucker)
+
+    Args:
+        coords: (n, 2) array of [longitude, latitude]
+        tolerance (float): Maximum deviation in meters
+
+    Returns:
+        np.ndarray: The kept vertices, always including both ends
+    """
+    coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+    if len(coords) < 3:
+        return coords
+
+    # Project to meters on a plane; accurate enough at this tolerance
+    scale = np.radians(EARTH_RADIUS_METERS) * np.array([np.cos(np.radians(coords[:, 1].mean())), 1.0])
+    points = coords * scale
+
+    keep = np.zeros(len(points), dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        start, direction = points[first], points[last] - points[first]
+        offsets = points[first + 1:last] - start
+        length = np.hypot(*direction)
+        if length:
+            deviations = np.abs(direction[0] * offsets[:, 1] - direction[1] * offsets[:, 0]) / length
+        else:
+            deviations = np.hypot(offsets[:, 0], offsets[:, 1])
+        i = int(np.argmax(deviations))
+        if deviations[i] > tolerance:
+            split = first + 1 + i
+            keep[split] = True
+            stack += [(first, split), (split, last)]
+    return coords[keep]
+
+
+def compact_route(geometries, tolerance=STORED_ROUTE_TOLERANCE):
+    """
+    Simplify the legs of a route and encode them as one polyline for storage
+
+    Args:
+        geometries (list): RouteGeometry of each leg, in order
+        tolerance (float): Maximum deviation in meters
+
+    Returns:
+        tuple: (encoded polyline, index of the first vertex of each leg)
+    """
+    parts, leg_starts, count = [], [], 0
+    for geometry in geometries:
+        points = simplify(geometry.coords, tolerance)
+        # Consecutive legs share their joining vertex
+        if count and len(points) and len(parts[-1]) and np.allclose(parts[-1][-1], points[0]):
+            points = points[1:]
+            leg_starts.append(count - 1)
+        else:
+            leg_starts.append(count)
+        parts.append(points)
+        count += len(points)
+
+    if not count:
+        return '', leg_starts
+    return encode_polyline(np.concatenate(parts), POLYLINE_PRECISION), leg_starts
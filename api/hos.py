@@ -0,0 +1,299 @@
+"""
+Hours of service trip simulation
+
+A pure planning engine: given the distance and duration of the leg to
+pickup and the leg from pickup to dropoff, the driver's starting hours and
+a start time, it lays out the HOS-compliant timeline of driving breaks,
+overnight rests, 34-hour cycle restarts, fuel stops, pickup and dropoff.
+It performs no I/O and no string formatting, so it can be run and
+benchmarked on its own; RoutePlannerView resolves locations for the
+events afterwards.
+"""
+from datetime import timedelta
+
+
+# HOS limits
+MAX_DRIVING_HOURS = 11      # Maximum 11 hours driving time
+MAX_DUTY_HOURS = 14         # Maximum 14 hours on duty
+BREAK_REQUIRED_AFTER = 8    # Break required after 8 hours of driving
+MAX_CYCLE_HOURS = 70        # Maximum 70 hours on duty in 8 days
+
+# Time spent at each kind of stop, in hours
+BREAK_HOURS = 0.5
+OVERNIGHT_HOURS = 10.0
+RESTART_HOURS = 34.0        # Off duty that resets the 70-hour cycle
+FUEL_HOURS = 0.25
+LOADING_HOURS = 1.0
+
+FUEL_INTERVAL_MILES = 1000
+
+# Less cycle time than this left (one minute) is not worth driving on
+MIN_CYCLE_LEFT = 1 / 60
+
+# Waypoint indices for events that happen at a trip endpoint
+CURRENT, PICKUP, DROPOFF = 0, 1, 2
+
+
+class Leg:
+    """
+    One routed leg of a trip
+    """
+    __slots__ = ('distance', 'duration')
+
+    def __init__(self, distance, duration):
+        self.distance = distance    # Miles
+        self.duration = duration    # Driving hours
+
+    def __repr__(self):
+        return f'Leg(distance={self.distance!r}, duration={self.duration!r})'
+
+
+class HOSState:
+    """
+    Hours already used by the driver when the trip starts
+    """
+    __slots__ = ('driving_used', 'duty_used', 'cycle_used')
+
+    def __init__(self, driving_used=0.0, duty_used=0.0, cycle_used=0.0):
+        self.driving_used = driving_used
+        self.duty_used = duty_used
+        self.cycle_used = cycle_used    # On duty in the rolling 8-day window
+
+    def __repr__(self):
+        return (f'HOSState(driving_used={self.driving_used!r}, duty_used={self.duty_used!r}, '
+                f'cycle_used={self.cycle_used!r})')
+
+
+class TimelineEvent:
+    """
+    A stop on the planned timeline
+
+    Events at a trip endpoint carry its waypoint index (CURRENT, PICKUP or
+    DROPOFF). Events placed along a route carry the index of the leg they
+    fall on and the completion ratio (0-1) of that leg instead. Times are
+    kept as hours since the trip start; start and end datetimes are only
+    built when asked for.
+    """
+    __slots__ = ('type', 'activity', 'offset', 'duration', 'waypoint', 'leg', 'ratio', 'trip_start')
+
+    def __init__(self, type, activity, offset, duration, trip_start,
+                 waypoint=None, leg=None, ratio=None):
+        self.type = type
+        self.activity = activity
+        self.offset = offset
+        self.duration = duration
+        self.trip_start = trip_start
+        self.waypoint = waypoint
+        self.leg = leg
+        self.ratio = ratio
+
+    @property
+    def start(self):
+        return self.trip_start + timedelta(hours=self.offset)
+
+    @property
+    def end(self):
+        return self.trip_start + timedelta(hours=self.offset + self.duration)
+
+    def __repr__(self):
+        return f'TimelineEvent({self.type!r}, {self.activity!r}, {self.offset!r}, {self.duration!r})'
+
+
+class Timeline:
+    """
+    Result of a trip simulation
+    """
+    __slots__ = ('events', 'total_distance', 'driving_hours')
+
+    def __init__(self, events, total_distance, driving_hours):
+        self.events = events
+        self.total_distance = total_distance    # Miles
+        self.driving_hours = driving_hours
+
+    @property
+    def total_hours(self):
+        """
+        Elapsed hours from the start of the trip to the end of the dropoff
+        """
+        last = self.events[-1]
+        return last.offset + last.duration
+
+    @property
+    def duty_hours(self):
+        """
+        Hours on duty: driving plus every on-duty stop
+        """
+        return self.driving_hours + sum(
+            event.duration for event in self.events if event.activity == 'ON_DUTY'
+        )
+
+    def duty_hours_by_day(self):
+        """
+        Hours on duty on each calendar day the trip spans
+
+        Driving fills the time between events, so the on-duty stretches are
+        those gaps plus the on-duty stops. Days follow the trip start's time zone.
+
+        Returns:
+            dict: {date: hours} in chronological order
+        """
+        trip_start = self.events[0].trip_start
+        stretches = [
+            (event.offset, event.offset + event.duration)
+            for event in self.events if event.activity == 'ON_DUTY'
+        ]
+        stretches += [
+            (previous.offset + previous.duration, event.offset)
+            for previous, event in zip(self.events, self.events[1:])
+        ]
+
+        days = {}
+        for start, end in sorted(stretches):
+            moment, end = trip_start + timedelta(hours=start), trip_start + timedelta(hours=end)
+            while moment < end:
+                midnight = (moment + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+                until = min(midnight, end)
+                days[moment.date()] = days.get(moment.date(), 0.0) + (until - moment).total_seconds() / 3600
+                moment = until
+        return days
+
+    @property
+    def required_stops(self):
+        return len(self.events) - 2  # Exclude start and end
+
+
+def simulate_trip(legs, state, start_time):
+    """
+    Lay out an HOS compliant timeline for a pickup and delivery
+
+    Args:
+        legs (list): Leg to pickup and leg from pickup to dropoff
+        state (HOSState): Hours already used by the driver
+        start_time (datetime): When the driver sets off
+
+    Returns:
+        Timeline: Events in chronological order
+    """
+    to_pickup, to_dropoff = legs
+    total_distance = to_pickup.distance + to_dropoff.distance
+    driving_used = state.driving_used
+    duty_used = state.duty_used
+    cycle_used = state.cycle_used
+
+    # Hours since start_time
+    clock = 0.0
+
+    # Start at the current location
+    events = [TimelineEvent('start', 'OFF_DUTY', clock, 0, start_time, CURRENT)]
+
+    # Take a 34-hour restart before setting off if the 70-hour cycle cannot
+    # cover the drive to pickup and the loading
+    if cycle_used + to_pickup.duration + LOADING_HOURS > MAX_CYCLE_HOURS:
+        events.append(TimelineEvent('restart', 'OFF_DUTY', clock, RESTART_HOURS, start_time, CURRENT))
+        clock += RESTART_HOURS
+        driving_used = 0
+        duty_used = 0
+        cycle_used = 0
+
+    # Drive to pickup, taking one break if the 8 hour limit falls on the way
+    driving_segment = to_pickup.duration
+    if driving_used + driving_segment > BREAK_REQUIRED_AFTER:
+        driving_until_break = BREAK_REQUIRED_AFTER - driving_used
+        clock += driving_until_break
+        events.append(TimelineEvent(
+            'rest', 'ON_DUTY', clock, BREAK_HOURS, start_time,
+            leg=0, ratio=driving_until_break / driving_segment
+        ))
+        clock += BREAK_HOURS
+        cycle_used += BREAK_HOURS
+        driving_used = 0
+        driving_segment -= driving_until_break
+
+    driving_used += driving_segment
+    clock += driving_segment
+
+    events.append(TimelineEvent('pickup', 'ON_DUTY', clock, LOADING_HOURS, start_time, PICKUP))
+    clock += LOADING_HOURS
+    cycle_used += to_pickup.duration + LOADING_HOURS
+
+    # Take a 10-hour rest at pickup if the duty window is used up
+    if duty_used + to_pickup.duration + LOADING_HOURS > MAX_DUTY_HOURS:
+        events.append(TimelineEvent('overnight', 'SLEEPER', clock, OVERNIGHT_HOURS, start_time, PICKUP))
+        clock += OVERNIGHT_HOURS
+        driving_used = 0
+        duty_used = 0
+    else:
+        duty_used += to_pickup.duration + LOADING_HOURS
+
+    # Drive from pickup to dropoff in segments bounded by the HOS limits
+    remaining_distance = to_dropoff.distance
+    remaining_duration = to_dropoff.duration
+
+    while remaining_distance > 0 and remaining_duration > 0:
+        ratio_driven = 1 - (remaining_distance / to_dropoff.distance)
+
+        # 34-hour restart once the 70-hour cycle is used up
+        if MAX_CYCLE_HOURS - cycle_used < MIN_CYCLE_LEFT:
+            events.append(TimelineEvent(
+                'restart', 'OFF_DUTY', clock, RESTART_HOURS, start_time, leg=1, ratio=ratio_driven
+            ))
+            clock += RESTART_HOURS
+            driving_used = 0
+            duty_used = 0
+            cycle_used = 0
+            continue
+
+        if driving_used >= BREAK_REQUIRED_AFTER:
+            driving_segment = 0
+        else:
+            driving_segment = min(
+                BREAK_REQUIRED_AFTER - driving_used,    # Time until break
+                remaining_duration,                     # Remaining drive time
+                MAX_DUTY_HOURS - duty_used,             # Time until end of duty
+                MAX_CYCLE_HOURS - cycle_used            # Time until end of cycle
+            )
+
+        # Out of driving time: take a break. When it is the duty window that
+        # is exhausted a break would not help, so fall through to an overnight.
+        if driving_segment == 0 and driving_used >= BREAK_REQUIRED_AFTER:
+            events.append(TimelineEvent(
+                'rest', 'ON_DUTY', clock, BREAK_HOURS, start_time, leg=1, ratio=ratio_driven
+            ))
+            clock += BREAK_HOURS
+            cycle_used += BREAK_HOURS
+            driving_used = 0
+            continue
+
+        # Overnight rest when the duty window would run out
+        if duty_used + driving_segment + BREAK_HOURS >= MAX_DUTY_HOURS:
+            events.append(TimelineEvent(
+                'overnight', 'SLEEPER', clock, OVERNIGHT_HOURS, start_time, leg=1, ratio=ratio_driven
+            ))
+            clock += OVERNIGHT_HOURS
+            driving_used = 0
+            duty_used = 0
+            continue
+
+        drive_segment_distance = (driving_segment / remaining_duration) * remaining_distance
+
+        clock += driving_segment
+        driving_used += driving_segment
+        duty_used += driving_segment
+        cycle_used += driving_segment
+        remaining_distance -= drive_segment_distance
+        remaining_duration -= driving_segment
+
+        # Fuel roughly every 1000 miles
+        driven_distance = total_distance - remaining_distance
+        if int(driven_distance / FUEL_INTERVAL_MILES) != int((driven_distance - drive_segment_distance) / FUEL_INTERVAL_MILES):
+            events.append(TimelineEvent(
+                'fuel', 'ON_DUTY', clock, FUEL_HOURS, start_time,
+                leg=1, ratio=1 - (remaining_distance / to_dropoff.distance)
+            ))
+            clock += FUEL_HOURS
+            duty_used += FUEL_HOURS
+            cycle_used += FUEL_HOURS
+
+    events.append(TimelineEvent('dropoff', 'ON_DUTY', clock, LOADING_HOURS, start_time, DROPOFF))
+
+    return Timeline(events, total_distance, to_pickup.duration + to_dropoff.duration)
@@ -0,0 +1,274 @@
+"""
+Shared HTTP layer for outbound geocoding and routing calls
+
+One pooled requests.Session is kept per process, so calls to OSRM and
+Nominatim reuse keep-alive connections instead of paying a TCP and TLS
+handshake every time. Pool size, timeouts and retries come from
+settings.OUTBOUND_HTTP.
+
+The async views use an httpx.AsyncClient instead, one per event loop,
+with the same timeout and retry policy.
+
+Requests to the public OSRM and Nominatim servers are spaced out per host
+(MIN_INTERVALS) to respect their usage policies of at most one request a
+second, however many lookups the planner runs concurrently. The limit is
+per process; run several workers only against self-hosted servers. Code
+running under fail_fast() gets UpstreamThrottled instead of waiting longer
+than MAX_QUEUE_WAIT for a slot, so a request never queues past its timeout.
+
+When settings.GEO_STANDIN is enabled both clients answer from the offline
+stand-in (api.standin) instead of the network.
+"""
+import asyncio
+import contextvars
+import math
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from django.conf import settings
+from geopy.adapters import BaseSyncAdapter, RequestsAdapter, RequestsHTTPWithSSLContextAdapter
+from geopy.exc import GeocoderServiceError
+from urllib3.util.retry import Retry
+
+from .singleton import process_singleton
+from .standin import StandInAdapter, StandInTransport, get_standin
+
+
+DEFAULT_HTTP_CONFIG = {
+    'POOL_CONNECTIONS': 10,     # Distinct hosts kept in the pool
+    'POOL_MAXSIZE': 10,         # Connections kept per host
+    'TIMEOUT': 10,              # Seconds
+    'RETRIES': 3,
+    'BACKOFF_FACTOR': 0.5,      # Sleeps 0.5s, 1s, 2s between retries
+    'RETRY_STATUSES': (429, 500, 502, 503, 504),
+    'ASYNC_MAX_CONNECTIONS': 100,   # Connections per async client, across hosts
+    # Minimum seconds between requests to a host
+    'MIN_INTERVALS': {
+        'nominatim.openstreetmap.org': 1.0,
+        'router.project-osrm.org': 1.0,
+    },
+    'MAX_QUEUE_WAIT': 10,       # Seconds a request may wait for its host's slot under fail_fast()
+}
+
+# Async clients are bound to the event loop they were created on
+_async_clients = weakref.WeakKeyDictionary()
+
+# Longest wait for a rate limit slot the current request allows, or None to wait as long as it takes
+_max_wait = contextvars.ContextVar('max_rate_limit_wait', default=None)
+
+
+def get_http_config():
+    config = dict(DEFAULT_HTTP_CONFIG)
+    config.update(getattr(settings, 'OUTBOUND_HTTP', {}))
+    return config
+
+
+class UpstreamThrottled(Exception):
+    """
+    A request would wait longer for its host's rate limit than the caller allows
+    """
+    def __init__(self, host, wait):
+        super().__init__(f"Rate limit for {host} reached, try again in {math.ceil(wait)}s")
+        self.host = host
+        self.wait = wait
+
+
+@contextmanager
+def fail_fast(max_wait=None):
+    """
+    Raise UpstreamThrottled instead of waiting longer than max_wait for a rate limit slot
+
+    Applies to requests made in this context, including lookups it hands
+    to the lookup pool and tasks it starts.
+
+    Args:
+        max_wait (float): Seconds, settings.OUTBOUND_HTTP['MAX_QUEUE_WAIT'] by default
+    """
+    if max_wait is None:
+        max_wait = get_http_config()['MAX_QUEUE_WAIT']
+    token = _max_wait.set(max_wait)
+    try:
+        yield
+    finally:
+        _max_wait.reset(token)
+
+
+class HostRateLimiter:
+    """
+    Spaces out requests to each rate-limited host across every thread and event loop
+    """
+    def __init__(self, intervals):
+        self.intervals = intervals
+        self._next = {}
+        self._lock = threading.Lock()
+
+    def reserve(self, url, max_wait=None):
+        """
+        Claim the next slot for the URL's host
+
+        Args:
+            url: The request URL
+            max_wait (float): Longest acceptable wait, unlimited by default
+
+        Returns:
+            float: Seconds to wait before sending
+
+        Raises:
+            UpstreamThrottled: The next slot is further away than max_wait;
+            no slot is claimed
+        """
+        host = urlsplit(str(url)).hostname
+        interval = self.intervals.get(host)
+        if not interval:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next.get(host, now))
+            if max_wait is not None and start - now > max_wait:
+                raise UpstreamThrottled(host, start - now)
+            self._next[host] = start + interval
+        return start - now
+
+
+@process_singleton
+def get_rate_limiter():
+    return HostRateLimiter(get_http_config()['MIN_INTERVALS'])
+
+
+class RateLimitedHTTPAdapter(RequestsHTTPWithSSLContextAdapter):
+    """
+    HTTPAdapter waiting for the host's rate limit, with an optional SSL context
+    """
+    def send(self, request, **kwargs):
+        time.sleep(get_rate_limiter().reserve(request.url, _max_wait.get()))
+        return super().send(request, **kwargs)
+
+
+class RateLimitedAsyncTransport(httpx.AsyncHTTPTransport):
+    async def handle_async_request(self, request):
+        await asyncio.sleep(get_rate_limiter().reserve(request.url, _max_wait.get()))
+        return await super().handle_async_request(request)
+
+
+@process_singleton
+def get_session():
+    """
+    Return the process-wide pooled session, creating it on first use
+    """
+    return _build_session(get_http_config())
+
+
+def _build_session(config, proxies=None, ssl_context=None):
+    retry = Retry(
+        total=config['RETRIES'],
+        backoff_factor=config['BACKOFF_FACTOR'],
+        status_forcelist=config['RETRY_STATUSES'],
+        allowed_methods=frozenset(['GET']),
+        # Hand the last response back rather than raising, so callers can
+        # report the upstream status code
+        raise_on_status=False,
+    )
+    adapter = RateLimitedHTTPAdapter(
+        pool_connections=config['POOL_CONNECTIONS'],
+        pool_maxsize=config['POOL_MAXSIZE'],
+        max_retries=retry,
+        pool_block=True,
+        ssl_context=ssl_context,
+    )
+    standin = get_standin()
+    if standin is not None:
+        # The real adapter is only used to record fixtures
+        adapter = StandInAdapter(standin, forward=adapter)
+    session = requests.Session()
+    if proxies is not None:
+        # Explicit proxies replace the environment's, as in geopy's own adapter
+        session.trust_env = False
+        session.proxies = {
+            scheme: url if '://' in url else f'http://{url}'
+            for scheme, url in proxies.items() if url
+        }
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+class PooledRequestsAdapter(RequestsAdapter):
+    """
+    geopy adapter that sends geocoder requests over the shared session
+
+    A geocoder given its own proxies or SSL context gets a session of its
+    own instead, built with the same pooling, retry and rate limit policy.
+    """
+    def __init__(self, *, proxies, ssl_context):
+        BaseSyncAdapter.__init__(self, proxies=proxies, ssl_context=ssl_context)
+        self.owns_session = proxies is not None or ssl_context is not None
+        if self.owns_session:
+            self.session = _build_session(get_http_config(), proxies=proxies, ssl_context=ssl_context)
+        else:
+            self.session = get_session()
+
+    def _request(self, url, *, timeout, headers):
+        try:
+            return super()._request(url, timeout=timeout, headers=headers)
+        except GeocoderServiceError as error:
+            # geopy turns every session error into a service error; callers
+            # need to tell a throttled request apart
+            if isinstance(error.__context__, UpstreamThrottled):
+                raise error.__context__ from None
+            raise
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        # The shared session outlives any single geocoder
+        if self.owns_session:
+            super().__exit__(exc_type, exc_val, exc_tb)
+
+    def __del__(self):
+        if getattr(self, 'owns_session', False):
+            super().__del__()
+
+
+def get_async_client():
+    """
+    Return the pooled async client for the running event loop, creating it on first use
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        config = get_http_config()
+        # Retries connection failures; status retries are handled in aget
+        transport = RateLimitedAsyncTransport(retries=config['RETRIES'])
+        standin = get_standin()
+        if standin is not None:
+            transport = StandInTransport(standin, forward=transport)
+        client = httpx.AsyncClient(
+            timeout=config['TIMEOUT'],
+            limits=httpx.Limits(
+                max_connections=config['ASYNC_MAX_CONNECTIONS'],
+                max_keepalive_connections=config['ASYNC_MAX_CONNECTIONS'],
+            ),
+            transport=transport,
+        )
+        _async_clients[loop] = client
+    return client
+
+
+async def aget(url, **kwargs):
+    """
+    GET a URL on the async client, retrying the same statuses with the same
+    backoff as the sync session
+
+    Returns:
+        httpx.Response: The last response received
+    """
+    config = get_http_config()
+    client = get_async_client()
+    for attempt in range(config['RETRIES'] + 1):
+        response = await client.get(url, **kwargs)
+        if response.status_code not in config['RETRY_STATUSES'] or attempt == config['RETRIES']:
+            return response
+        await asyncio.sleep(config['BACKOFF_FACTOR'] * (2 ** attempt))
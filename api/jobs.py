@@ -0,0 +1,171 @@
+"""
+Database-backed queue for asynchronous route planning
+
+RoutePlannerView queues a PlanningJob when asked to plan asynchronously.
+The run_planning_worker management command claims queued jobs, plans
+them with RoutePlannerView's own planning and persistence code and stores
+the response on the job for clients to poll.
+
+A claim is a lease: the worker renews it from a heartbeat thread while
+the job runs, and only jobs whose lease has expired, because their worker
+died, are put back on the queue. A worker whose lease was handed on saves
+nothing, and the trip is saved in the same transaction that marks the job
+done, so a job never produces two trips.
+"""
+import logging
+import threading
+from datetime import timedelta
+
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+
+from .models import PlanningJob
+from .projection import serialize
+from .serializers import RouteResponseSerializer
+
+
+logger = logging.getLogger(__name__)
+
+# Seconds a claim lasts without a heartbeat
+DEFAULT_LEASE = 60
+
+# Claims after which a job whose worker keeps dying is failed instead of requeued
+MAX_ATTEMPTS = 3
+
+
+def claim_next_job(lease=DEFAULT_LEASE):
+    """
+    Mark the oldest queued job as running and return it, or None if the queue is empty
+
+    Rows are locked with SKIP LOCKED where the database supports it, so
+    several workers can share the queue without claiming the same job.
+
+    Args:
+        lease (float): Seconds the claim lasts unless renewed
+    """
+    with transaction.atomic():
+        job = (
+            PlanningJob.objects
+            .select_for_update(skip_locked=True)
+            .filter(status='QUEUED')
+            .order_by('created_at', 'id')
+            .first()
+        )
+        if job is None:
+            return None
+
+        job.status = 'RUNNING'
+        job.started_at = timezone.now()
+        job.lease_expires_at = job.started_at + timedelta(seconds=lease)
+        job.attempts += 1
+        job.save(update_fields=['status', 'started_at', 'lease_expires_at', 'attempts'])
+    return job
+
+
+def _claimed(job):
+    """
+    The job's row while this claim on it holds, not yet handed to another worker
+    """
+    return PlanningJob.objects.filter(id=job.id, status='RUNNING', attempts=job.attempts)
+
+
+def renew_lease(job, lease=DEFAULT_LEASE):
+    """
+    Extend the lease on a claimed job
+
+    Returns:
+        bool: False once the claim has been handed to another worker
+    """
+    return _claimed(job).update(lease_expires_at=timezone.now() + timedelta(seconds=lease)) == 1
+
+
+class Heartbeat(threading.Thread):
+    """
+    Renews a job's lease a few times per lease period until stopped
+    """
+    def __init__(self, job, lease):
+        super().__init__(name=f'planning-job-{job.id}-heartbeat', daemon=True)
+        self.job = job
+        self.lease = lease
+        self._stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self._stopped.wait(self.lease / 3):
+                try:
+                    if not renew_lease(self.job, self.lease):
+                        return
+                except DatabaseError:
+                    logger.exception("Could not renew the lease on planning job %s", self.job.id)
+        finally:
+            connection.close()
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+def run_job(job, lease=DEFAULT_LEASE):
+    """
+    Plan and persist a claimed job, recording the response or the error on it
+
+    Nothing is saved if the job's lease expired and it was claimed again
+    in the meantime.
+    """
+    # Imported here to avoid a circular import with the views module
+    from .views import RoutePlannerView
+
+    planner = RoutePlannerView()
+    heartbeat = Heartbeat(job, lease)
+    heartbeat.start()
+    try:
+        current_hours = planner._get_current_hours(job.driver)
+        route_data = planner._calculate_route(
+            job.current_location,
+            job.pickup_location,
+            job.dropoff_location,
+            current_hours
+        )
+        with transaction.atomic():
+            if not _claimed(job).select_for_update().exists():
+                logger.warning("Planning job %s was handed to another worker, dropping its result", job.id)
+                return job
+
+            job.trip = planner._save_plan(
+                job.driver,
+                current_hours,
+                job.pickup_location,
+                job.dropoff_location,
+                route_data
+            )
+            job.status = 'DONE'
+            job.result = serialize(RouteResponseSerializer, route_data)
+            job.finished_at = timezone.now()
+            job.save(update_fields=['status', 'trip', 'result', 'finished_at'])
+    except Exception as e:
+        logger.exception("Planning job %s failed", job.id)
+        job.status = 'FAILED'
+        job.error = str(e)
+        job.finished_at = timezone.now()
+        _claimed(job).update(status=job.status, error=job.error, finished_at=job.finished_at)
+    finally:
+        heartbeat.stop()
+    return job
+
+
+def requeue_expired_jobs():
+    """
+    Put jobs back on the queue whose worker stopped renewing their lease
+
+    A job that has already been claimed MAX_ATTEMPTS times is failed
+    instead, so one that keeps killing its worker does not loop forever.
+
+    Returns:
+        int: Jobs requeued
+    """
+    now = timezone.now()
+    expired = PlanningJob.objects.filter(status='RUNNING', lease_expires_at__lt=now)
+    expired.filter(attempts__gte=MAX_ATTEMPTS).update(
+        status='FAILED', error='The worker running this job stopped', finished_at=now
+    )
+    return expired.update(status='QUEUED', started_at=None, lease_expires_at=None)
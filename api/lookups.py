@@ -0,0 +1,77 @@
+"""
+Bounded thread pool for running independent geo lookups concurrently
+
+Geocoding, routing and reverse geocoding are network bound, so the route
+planner fans them out here instead of paying each round trip in sequence.
+The pool is shared by the whole process, which also caps the number of
+requests in flight against the upstream services.
+
+Calls run here must not use the database: a pool thread would open its
+own connection outside the caller's transaction. api.cache.resolve keeps
+the cache reads and writes on the calling thread and sends only the
+upstream fetches here.
+"""
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from .singleton import process_singleton
+
+
+_worker_state = threading.local()
+
+
+@process_singleton
+def get_executor():
+    """
+    Return the process-wide lookup pool, creating it on first use
+    """
+    return ThreadPoolExecutor(
+        max_workers=getattr(settings, 'GEO_LOOKUP_CONCURRENCY', 8),
+        thread_name_prefix='geo-lookup'
+    )
+
+
+def _call_in_worker(fn, args):
+    _worker_state.active = True
+    try:
+        return fn(*args)
+    finally:
+        _worker_state.active = False
+
+
+def run_concurrently(calls):
+    """
+    Run independent calls on the lookup pool
+
+    Args:
+        calls (list): (function, *args) tuples
+
+    Returns:
+        list: Results in the same order as calls. The first exception raised
+        by any call is re-raised once every call has finished.
+    """
+    # Run inline when there is nothing to overlap, or when already on a pool
+    # thread, since waiting on the pool from inside it could deadlock
+    if len(calls) <= 1 or getattr(_worker_state, 'active', False):
+        return [fn(*args) for fn, *args in calls]
+
+    executor = get_executor()
+    # Each call runs in a copy of the caller's context, e.g. its fail_fast() limit
+    futures = [
+        executor.submit(contextvars.copy_context().run, _call_in_worker, fn, args)
+        for fn, *args in calls
+    ]
+
+    results, error = [], None
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:
+            results.append(None)
+            error = error or e
+    if error is not None:
+        raise error
+    return results
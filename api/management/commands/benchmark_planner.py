@@ -0,0 +1,85 @@
+import asyncio
+import time
+
+import httpx
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmarks import PERCENTILES, percentile
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the sync (WSGI) and async (ASGI) route planner under concurrent load. "
+        "Start the servers first, e.g. gunicorn truckerapp.wsgi -b :8000 and "
+        "uvicorn truckerapp.asgi:application --port 8001"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--token', required=True, help="Driver API token")
+        parser.add_argument('--wsgi-url', help="Base URL of the WSGI server, e.g. http://localhost:8000")
+        parser.add_argument('--asgi-url', help="Base URL of the ASGI server, e.g. http://localhost:8001")
+        parser.add_argument('--requests', type=int, default=500, help="Plans to request per server")
+        parser.add_argument('--concurrency', type=int, default=200, help="Plans in flight at once")
+        parser.add_argument('--current', default='Los Angeles, CA')
+        parser.add_argument('--pickup', default='Denver, CO')
+        parser.add_argument('--dropoff', default='Chicago, IL')
+        parser.add_argument(
+            '--cold', action='store_true',
+            help="Number every address so no plan is served from the caches "
+                 "(only useful against a stand-in OSRM/Nominatim)"
+        )
+
+    def handle(self, *args, **options):
+        targets = []
+        if options['wsgi_url']:
+            targets.append(('wsgi', options['wsgi_url'].rstrip('/') + '/api/routes/plan/'))
+        if options['asgi_url']:
+            targets.append(('asgi', options['asgi_url'].rstrip('/') + '/api/async/routes/plan/'))
+        if not targets:
+            raise CommandError("Pass --wsgi-url, --asgi-url or both")
+
+        payload = {
+            'current_location': options['current'],
+            'pickup_location': options['pickup'],
+            'dropoff_location': options['dropoff'],
+        }
+        for name, url in targets:
+            result = asyncio.run(self._run(url, payload, options))
+            self._report(name, result)
+
+    async def _run(self, url, payload, options):
+        semaphore = asyncio.Semaphore(options['concurrency'])
+        limits = httpx.Limits(max_connections=options['concurrency'])
+        headers = {'Authorization': f"Token {options['token']}"}
+        latencies, errors = [], 0
+
+        async with httpx.AsyncClient(limits=limits, headers=headers, timeout=120) as client:
+            async def one(i):
+                nonlocal errors
+                body = {key: f'{value} #{i}' for key, value in payload.items()} if options['cold'] else payload
+                async with semaphore:
+                    started = time.perf_counter()
+                    try:
+                        response = await client.post(url, json=body)
+                        ok = response.status_code == 200
+                    except httpx.HTTPError:
+                        ok = False
+                    if ok:
+                        latencies.append(time.perf_counter() - started)
+                    else:
+                        errors += 1
+
+            started = time.perf_counter()
+            await asyncio.gather(*(one(i) for i in range(options['requests'])))
+            elapsed = time.perf_counter() - started
+
+        return latencies, errors, elapsed
+
+    def _report(self, name, result):
+        latencies, errors, elapsed = result
+        self.stdout.write(f"{name}: {len(latencies)} ok, {errors} failed in {elapsed:.2f}s "
+                          f"({len(latencies) / elapsed:.1f} plans/s)")
+        if latencies:
+            latencies = sorted(latency * 1000 for latency in latencies)
+            cuts = '  '.join(f"p{p} {percentile(latencies, p):.0f}ms" for p in PERCENTILES)
+            self.stdout.write(f"  latency {cuts}  max {latencies[-1]:.0f}ms")
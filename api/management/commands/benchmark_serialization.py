@@ -0,0 +1,70 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.runner import DiscoverRunner
+from rest_framework.renderers import JSONRenderer
+
+from api.benchmarks import Case, populate_trips
+from api.models import Trip
+from api.projection import Projection
+from api.renderers import FastJSONRenderer, orjson
+from api.serializers import TripSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Time serializing and rendering a large trip list on a throwaway test "
+        "database, comparing TripSerializer + JSONRenderer against values() "
+        "rows + FastJSONRenderer"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--trips', type=int, default=10000, help="Synthetic trips to create")
+        parser.add_argument('--samples', type=int, default=10, help="Timed runs per path")
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write(self.style.WARNING("orjson is not installed, FastJSONRenderer falls back to json"))
+
+        # The synthetic trips go into a throwaway test database, never the real one
+        runner = DiscoverRunner(verbosity=0, interactive=False)
+        old_config = runner.setup_databases()
+        try:
+            started = time.perf_counter()
+            driver = populate_trips(options['trips'], 'benchmark-json')
+            self.stdout.write(f"Created {options['trips']} trips in {time.perf_counter() - started:.1f}s")
+            self._run(driver, options['samples'])
+        finally:
+            runner.teardown_databases(old_config)
+
+    def _run(self, driver, samples):
+        trips = Trip.objects.filter(driver=driver).order_by('-created_at', '-id')
+        projection = Projection.of(TripSerializer)
+
+        def stock():
+            return JSONRenderer().render(TripSerializer(trips, many=True).data)
+
+        def fast():
+            return FastJSONRenderer().render(projection.rows(trips.values(*projection.sources)))
+
+        stock_bytes, fast_bytes = stock(), fast()
+        if stock_bytes != fast_bytes:
+            raise CommandError("The fast path rendered different bytes")
+        self.stdout.write(f"Both paths render the same {len(stock_bytes)} bytes")
+
+        # Split the fast path to show where the time goes
+        rows = projection.rows(trips.values(*projection.sources))
+        cases = [
+            Case('stock', stock),
+            Case('fast', fast),
+            Case('values() + projection', lambda: projection.rows(trips.values(*projection.sources))),
+            Case('render only', lambda: FastJSONRenderer().render(rows)),
+        ]
+        results = {case.name: case.measure(samples) for case in cases}
+
+        self.stdout.write(f"{'path':>24} {'p50':>10} {'p95':>10} {'peak':>10}")
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:>24} {result['p50_ms']:>8.1f}ms {result['p95_ms']:>8.1f}ms {result['peak_kib']:>7.0f}KiB"
+            )
+        self.stdout.write(f"Speedup: {results['stock']['p50_ms'] / results['fast']['p50_ms']:.1f}x")
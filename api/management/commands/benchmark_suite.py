@@ -0,0 +1,66 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.runner import DiscoverRunner
+
+from api.benchmarks import DEFAULT_THRESHOLD, PERCENTILES, compare, run_suite
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the planner's hot paths (route calculation, stop placement, "
+        "the plan endpoint and the PDF generators) on a throwaway test database "
+        "with stubbed routing and geocoding, and save or compare the results"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--samples', type=int, default=20, help="Timed runs per case")
+        parser.add_argument('--case', action='append', dest='cases', help="Run only this case (repeatable)")
+        parser.add_argument('--fixtures', help="Stand-in fixture file with recorded OSRM/Nominatim responses")
+        parser.add_argument('--save', metavar='PATH', help="Write the results to a JSON baseline")
+        parser.add_argument('--compare', metavar='PATH', help="Flag regressions against a saved baseline")
+        parser.add_argument(
+            '--threshold', type=float, default=DEFAULT_THRESHOLD,
+            help="Allowed slowdown before a timing or memory metric regresses (0.25 = 25%%)"
+        )
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+
+        header = ' '.join(f"{f'p{p}':>9}" for p in PERCENTILES)
+        self.stdout.write(f"{'case':<28}{header} {'peak':>10} {'queries':>8}")
+
+        def report(name, result):
+            timings = ' '.join(f"{result[f'p{p}_ms']:>7.1f}ms" for p in PERCENTILES)
+            self.stdout.write(f"{name:<28}{timings} {result['peak_kib']:>7.0f}KiB {result['queries']:>8}")
+
+        runner = DiscoverRunner(verbosity=0, interactive=False)
+        old_config = runner.setup_databases()
+        try:
+            results = run_suite(options['samples'], options['cases'], options['fixtures'], report)
+        finally:
+            runner.teardown_databases(old_config)
+
+        if options['save']:
+            with open(options['save'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Saved results to {options['save']}")
+
+        if baseline is not None:
+            self._compare(baseline, results, options['threshold'])
+
+    def _compare(self, baseline, results, threshold):
+        rows = compare(baseline, results, threshold)
+        self.stdout.write(f"\nAgainst {baseline['meta']['created']} (threshold {threshold:.0%})")
+        for name, metric, before, after, regressed in rows:
+            change = f"{(after - before) / before:+.0%}" if before else 'new'
+            line = f"{name:<28}{metric:<10}{before:>12.1f} -> {after:<12.1f}{change:>6}"
+            self.stdout.write(self.style.ERROR(f"{line}  REGRESSION") if regressed else line)
+
+        regressions = sum(regressed for *_, regressed in rows)
+        if regressions:
+            raise CommandError(f"{regressions} regression(s) against the baseline")
+        self.stdout.write(self.style.SUCCESS("No regressions"))
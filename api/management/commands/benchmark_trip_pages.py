@@ -0,0 +1,72 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.test.runner import DiscoverRunner
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.benchmarks import Case, populate_trips
+from api.models import Trip
+from api.pagination import KeysetPagination
+from api.views import AllTripsView
+
+
+class Command(BaseCommand):
+    help = (
+        "Time trip listing pages at increasing depth over a synthetic driver "
+        "on a throwaway test database, comparing keyset pagination against "
+        "OFFSET pagination"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--trips', type=int, default=100000, help="Synthetic trips to create")
+        parser.add_argument('--page-size', type=int, default=KeysetPagination.page_size)
+        parser.add_argument('--samples', type=int, default=20, help="Timed fetches per depth")
+
+    def handle(self, *args, **options):
+        # The synthetic trips go into a throwaway test database, never the real one
+        runner = DiscoverRunner(verbosity=0, interactive=False)
+        old_config = runner.setup_databases()
+        try:
+            started = time.perf_counter()
+            driver = populate_trips(options['trips'], 'benchmark-trips')
+            self.stdout.write(f"Created {options['trips']} trips in {time.perf_counter() - started:.1f}s")
+            self._run(driver, options)
+        finally:
+            runner.teardown_databases(old_config)
+
+    def _run(self, driver, options):
+        factory = APIRequestFactory()
+        view = AllTripsView.as_view()
+        page_size = options['page_size']
+        pages = -(-options['trips'] // page_size)
+
+        def fetch(params):
+            request = factory.get('/api/trips/all/', params, secure=True)
+            force_authenticate(request, user=driver)
+            return view(request).data
+
+        # Walk the keyset pages once to collect the cursor for each depth
+        depths = sorted({d for d in (1, 10, 100, 1000, pages // 2, pages) if 1 <= d <= pages})
+        cursors, cursor, page = {}, None, 1
+        while page <= depths[-1]:
+            if page in depths:
+                cursors[page] = cursor
+            next_url = fetch({'page_size': page_size, **({'cursor': cursor} if cursor else {})})['next']
+            cursor = next_url and next_url.split('cursor=')[1].split('&')[0]
+            page += 1
+
+        trips = Trip.objects.filter(driver=driver)
+        ordered = trips.order_by('-created_at', '-id')
+        self.stdout.write(f"{'page':>8} {'keyset':>10} {'offset':>10} {'view':>10}   (p50 query/response time)")
+        for depth in depths:
+            params = {'page_size': page_size, **({'cursor': cursors[depth]} if cursors[depth] else {})}
+            request = Request(factory.get('/api/trips/all/', params))
+            offset = (depth - 1) * page_size
+            cases = [
+                Case('keyset', lambda: KeysetPagination().paginate_queryset(trips, request)),
+                Case('offset', lambda: list(ordered[offset:offset + page_size])),
+                Case('view', lambda: fetch(params)),
+            ]
+            timings = ' '.join(f"{case.measure(options['samples'])['p50_ms']:>8.2f}ms" for case in cases)
+            self.stdout.write(f"{depth:>8} {timings}")
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.cache import TwoTierCache
+# Importing these modules registers their caches
+from api import geocoding, routing  # noqa: F401
+
+
+class Command(BaseCommand):
+    help = "Purge cached geocoding and routing lookups, e.g. after road data changes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'namespaces', nargs='*',
+            help="Caches to purge (geocode, reverse, route). Defaults to all."
+        )
+        parser.add_argument(
+            '--evict', action='store_true',
+            help="Only delete expired entries and those past DB_MAX_ENTRIES, e.g. from cron"
+        )
+
+    def handle(self, *args, **options):
+        namespaces = options['namespaces'] or list(TwoTierCache.registry)
+        for namespace in namespaces:
+            cache = TwoTierCache.registry.get(namespace)
+            if cache is None:
+                raise CommandError(f"Unknown cache: {namespace}")
+            if options['evict']:
+                self.stdout.write(f"Evicted {cache.evict()} {namespace} entries")
+            else:
+                self.stdout.write(f"Purged {cache.purge()} {namespace} entries")
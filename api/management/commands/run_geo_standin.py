@@ -0,0 +1,69 @@
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+from api.standin import StandIn, get_standin_config
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve recorded OSRM and Nominatim responses over HTTP. Point "
+        "OSRM_BASE_URL and NOMINATIM_URL at it, e.g. http://127.0.0.1:8100"
+    )
+
+    def add_arguments(self, parser):
+        config = get_standin_config()
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8100)
+        parser.add_argument('--fixtures', default=config['FIXTURES'], help="Fixture file to serve")
+        parser.add_argument(
+            '--latency', type=float,
+            help="Seconds added to every response, overriding settings.GEO_STANDIN['LATENCY']"
+        )
+        parser.add_argument('--no-synthesize', action='store_true', help="Answer unrecorded requests with no result")
+
+    def handle(self, *args, **options):
+        config = get_standin_config()
+        latency = config['LATENCY']
+        if options['latency'] is not None:
+            latency = {service: options['latency'] for service in latency}
+
+        standin = StandIn(
+            fixtures=options['fixtures'],
+            latency=latency,
+            synthesize=config['SYNTHESIZE'] and not options['no_synthesize'],
+        )
+        server = ThreadingHTTPServer((options['host'], options['port']), make_handler(standin))
+        server.daemon_threads = True
+
+        counts = ', '.join(f"{len(entries)} {service}" for service, entries in standin.fixtures.items())
+        self.stdout.write(f"Serving {counts} fixtures on http://{options['host']}:{options['port']}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+
+def make_handler(standin):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            time.sleep(standin.delay(self.path))
+            status, body = standin.lookup(self.path) or (404, {'error': 'Not recorded'})
+            content = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def log_message(self, format, *args):
+            # One line per request would swamp a load test
+            pass
+
+    return Handler
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api.jobs import DEFAULT_LEASE, claim_next_job, requeue_expired_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = "Process queued asynchronous route planning jobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help="Exit once the queue is empty instead of waiting for new jobs"
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=1.0,
+            help="Seconds to sleep when the queue is empty"
+        )
+        parser.add_argument(
+            '--lease', type=float, default=DEFAULT_LEASE,
+            help="Seconds a claimed job stays reserved for this worker without a heartbeat. "
+                 "The worker renews it while the job runs; once it expires the job is requeued"
+        )
+
+    def handle(self, *args, **options):
+        requeued = requeue_expired_jobs()
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} abandoned jobs")
+
+        while True:
+            close_old_connections()
+            job = claim_next_job(options['lease'])
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['poll_interval'])
+                requeue_expired_jobs()
+                continue
+
+            job = run_job(job, options['lease'])
+            self.stdout.write(f"Job {job.id}: {job.status}")
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-17 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0005_remove_logactivity_duration_logactivity_end_time_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GeoCacheEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("namespace", models.CharField(max_length=20)),
+                ("key", models.CharField(max_length=255)),
+                ("value", models.JSONField()),
+                ("expires_at", models.DateTimeField()),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name_plural": "Geo cache entries",
+                "indexes": [
+                    models.Index(
+                        fields=["namespace", "updated_at"],
+                        name="api_geocach_namespa_eac8e9_idx",
+                    )
+                ],
+                "unique_together": {("namespace", "key")},
+            },
+        ),
+    ]
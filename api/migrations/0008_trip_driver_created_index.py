@@ -0,0 +1,20 @@
+# Generated by Django 4.2.7 on 2026-10-17 20:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0007_planningjob"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="trip",
+            index=models.Index(
+                fields=["driver", "created_at", "id"],
+                name="api_trip_driver_created_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 4.2.7 on 2026-10-17 20:51
+
+from datetime import timedelta
+from itertools import groupby
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_rollups(apps, schema_editor):
+    """
+    Build the running totals from existing hours of service and recompute
+    each day's cycle_used as the real 8-day window
+    """
+    HoursOfService = apps.get_model("api", "HoursOfService")
+    DutyRollup = apps.get_model("api", "DutyRollup")
+
+    rows = HoursOfService.objects.order_by("driver_id", "date")
+    for driver_id, days in groupby(rows.iterator(), key=lambda hours: hours.driver_id):
+        days = list(days)
+        rollups, running, totals = [], 0.0, {}
+        for hours in days:
+            # daily_used counted elapsed trip time including rests, so cap
+            # it at the 14-hour duty window
+            duty = min(hours.daily_used, 14.0)
+            running += duty
+            totals[hours.date] = running
+            rollups.append(DutyRollup(
+                driver_id=driver_id, date=hours.date, duty_hours=duty, cumulative_hours=running
+            ))
+        DutyRollup.objects.bulk_create(rollups)
+
+        for hours in days:
+            before = [total for date, total in totals.items() if date <= hours.date - timedelta(days=8)]
+            hours.cycle_used = round(totals[hours.date] - (before[-1] if before else 0.0), 2)
+        HoursOfService.objects.bulk_update(days, ["cycle_used"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("api", "0008_trip_driver_created_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DutyRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                (
+                    "duty_hours",
+                    models.FloatField(
+                        default=0.0, help_text="On-duty hours on this day"
+                    ),
+                ),
+                (
+                    "cumulative_hours",
+                    models.FloatField(
+                        default=0.0,
+                        help_text="On-duty hours on this day and every earlier day",
+                    ),
+                ),
+                (
+                    "driver",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="duty_rollups",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("driver", "date")},
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
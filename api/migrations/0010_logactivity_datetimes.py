@@ -0,0 +1,130 @@
+# Generated by Django 4.2.7 on 2026-10-17 21:05
+
+from datetime import datetime, time, timedelta
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def parse_clock(value):
+    """
+    Time of day from a "02:30 PM" string, or None if it cannot be parsed
+    """
+    try:
+        return datetime.strptime(value.strip(), "%I:%M %p").time()
+    except (AttributeError, ValueError):
+        return None
+
+
+def convert_times(apps, schema_editor):
+    """
+    Turn the clock strings into datetimes on the log sheet's date
+
+    The strings carry no date, so days are reconstructed from the order the
+    planner wrote the activities in: each plan begins with a "start"
+    activity on the sheet's date, and every later activity starts where
+    the previous one ended, rolling over to the next day when its clock
+    time is earlier.
+    """
+    LogSheet = apps.get_model("api", "LogSheet")
+    LogActivity = apps.get_model("api", "LogActivity")
+    tz = timezone.get_current_timezone()
+
+    for log_sheet in LogSheet.objects.iterator():
+        midnight = timezone.make_aware(datetime.combine(log_sheet.date, time()), tz)
+        previous_end = midnight
+        activities = list(LogActivity.objects.filter(log_sheet=log_sheet).order_by("id"))
+
+        for activity in activities:
+            start_clock = parse_clock(activity.start_time) or time()
+            end_clock = parse_clock(activity.end_time) or start_clock
+            if activity.description == "start":
+                previous_end = midnight
+
+            start = timezone.make_aware(datetime.combine(previous_end.date(), start_clock), tz)
+            if start < previous_end:
+                start += timedelta(days=1)
+            end = timezone.make_aware(datetime.combine(start.date(), end_clock), tz)
+            if end < start:
+                end += timedelta(days=1)
+            if activity.description == "restart":
+                # The only stop longer than a day
+                end = start + timedelta(hours=34)
+
+            activity.started_at = start
+            activity.ended_at = end
+            previous_end = end
+
+        LogActivity.objects.bulk_update(activities, ["started_at", "ended_at"])
+
+
+def format_times(apps, schema_editor):
+    """
+    Turn the datetimes back into "02:30 PM" clock strings in local time
+
+    Only the time of day survives; the dates are recovered again, from the
+    order of the activities, when migrating forwards.
+    """
+    LogActivity = apps.get_model("api", "LogActivity")
+    tz = timezone.get_current_timezone()
+
+    activities = list(LogActivity.objects.exclude(started_at=None))
+    for activity in activities:
+        activity.start_time = timezone.localtime(activity.started_at, tz).strftime("%I:%M %p")
+        activity.end_time = timezone.localtime(activity.ended_at or activity.started_at, tz).strftime("%I:%M %p")
+    LogActivity.objects.bulk_update(activities, ["start_time", "end_time"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0009_dutyrollup"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="logactivity",
+            name="started_at",
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name="logactivity",
+            name="ended_at",
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(convert_times, format_times),
+        migrations.RemoveField(
+            model_name="logactivity",
+            name="start_time",
+        ),
+        migrations.RemoveField(
+            model_name="logactivity",
+            name="end_time",
+        ),
+        migrations.RenameField(
+            model_name="logactivity",
+            old_name="started_at",
+            new_name="start_time",
+        ),
+        migrations.RenameField(
+            model_name="logactivity",
+            old_name="ended_at",
+            new_name="end_time",
+        ),
+        migrations.AlterField(
+            model_name="logactivity",
+            name="start_time",
+            field=models.DateTimeField(),
+        ),
+        migrations.AlterField(
+            model_name="logactivity",
+            name="end_time",
+            field=models.DateTimeField(),
+        ),
+        migrations.AddIndex(
+            model_name="logactivity",
+            index=models.Index(
+                fields=["log_sheet", "start_time"], name="api_logacti_log_she_de4071_idx"
+            ),
+        ),
+    ]
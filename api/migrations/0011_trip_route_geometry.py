@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-17 20:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0010_logactivity_datetimes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="trip",
+            name="route_leg_starts",
+            field=models.JSONField(
+                blank=True,
+                default=list,
+                help_text="Index of the first polyline vertex of each leg",
+            ),
+        ),
+        migrations.AddField(
+            model_name="trip",
+            name="route_polyline",
+            field=models.TextField(
+                blank=True,
+                default="",
+                help_text="Simplified route as an encoded polyline (precision 5)",
+            ),
+        ),
+    ]
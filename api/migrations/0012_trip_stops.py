@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-17 20:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0011_trip_route_geometry"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="tripstop",
+            name="trip",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="stops",
+                to="api.trip",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="tripstop",
+            name="type",
+            field=models.CharField(
+                choices=[
+                    ("start", "Start"),
+                    ("pickup", "Pickup"),
+                    ("dropoff", "Dropoff"),
+                    ("rest", "Rest Stop"),
+                    ("fuel", "Rest fuel"),
+                    ("overnight", "Overnight rest"),
+                    ("restart", "34-hour restart"),
+                ],
+                max_length=10,
+            ),
+        ),
+    ]
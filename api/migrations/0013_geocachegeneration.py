@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-17 21:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0012_trip_stops"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GeoCacheGeneration",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("namespace", models.CharField(max_length=20, unique=True)),
+                ("generation", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-17 21:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0013_geocachegeneration"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="planningjob",
+            name="attempts",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="planningjob",
+            name="lease_expires_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
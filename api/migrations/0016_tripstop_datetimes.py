@@ -0,0 +1,115 @@
+# Generated by Django 4.2.7 on 2026-10-17 22:10
+
+from datetime import datetime, time, timedelta
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def parse_clock(value):
+    """
+    Time of day from a "02:30 PM" string, or None if it cannot be parsed
+    """
+    try:
+        return datetime.strptime(value.strip(), "%I:%M %p").time()
+    except (AttributeError, ValueError):
+        return None
+
+
+def convert_times(apps, schema_editor):
+    """
+    Turn the arrival clock strings into arrival and departure datetimes
+
+    The strings carry no date, so days are reconstructed from the order the
+    planner wrote the stops in: the first stop is on the day the trip was
+    created, every later stop arrives after the previous one departed,
+    rolling over to the next day when its clock time is earlier, and each
+    stop departs its duration after arriving.
+    """
+    Trip = apps.get_model("api", "Trip")
+    TripStop = apps.get_model("api", "TripStop")
+    tz = timezone.get_current_timezone()
+
+    for trip in Trip.objects.iterator():
+        previous_departure = timezone.localtime(trip.created_at, tz).replace(hour=0, minute=0, second=0, microsecond=0)
+        stops = list(TripStop.objects.filter(trip=trip).order_by("id"))
+
+        for stop in stops:
+            clock = parse_clock(stop.arrival_time) or previous_departure.time()
+            arrival = timezone.make_aware(datetime.combine(previous_departure.date(), clock), tz)
+            if arrival < previous_departure:
+                arrival += timedelta(days=1)
+
+            stop.arrived_at = arrival
+            stop.departed_at = arrival + timedelta(hours=stop.duration)
+            previous_departure = stop.departed_at
+
+        TripStop.objects.bulk_update(stops, ["arrived_at", "departed_at"])
+
+
+def format_times(apps, schema_editor):
+    """
+    Turn the arrival datetimes back into "02:30 PM" clock strings in local time
+
+    Only the time of day survives; the dates are recovered again, from the
+    order of the stops, when migrating forwards.
+    """
+    TripStop = apps.get_model("api", "TripStop")
+    tz = timezone.get_current_timezone()
+
+    stops = list(TripStop.objects.exclude(arrived_at=None))
+    for stop in stops:
+        stop.arrival_time = timezone.localtime(stop.arrived_at, tz).strftime("%I:%M %p")
+    TripStop.objects.bulk_update(stops, ["arrival_time"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0015_dashboardversion"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="tripstop",
+            name="arrived_at",
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name="tripstop",
+            name="departed_at",
+            field=models.DateTimeField(null=True),
+        ),
+        # Nullable while migrating, so migrating backwards can re-add the
+        # column before format_times fills it in
+        migrations.AlterField(
+            model_name="tripstop",
+            name="arrival_time",
+            field=models.CharField(max_length=50, null=True),
+        ),
+        migrations.RunPython(convert_times, format_times),
+        migrations.RemoveField(
+            model_name="tripstop",
+            name="arrival_time",
+        ),
+        migrations.RenameField(
+            model_name="tripstop",
+            old_name="arrived_at",
+            new_name="arrival_time",
+        ),
+        migrations.RenameField(
+            model_name="tripstop",
+            old_name="departed_at",
+            new_name="departure_time",
+        ),
+        migrations.AlterField(
+            model_name="tripstop",
+            name="arrival_time",
+            field=models.DateTimeField(),
+        ),
+        migrations.AlterField(
+            model_name="tripstop",
+            name="departure_time",
+            field=models.DateTimeField(),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.2.7 on 2026-10-17 22:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_sheet_drivers(apps, schema_editor):
+    """
+    Give every activity the driver of the sheet it is logged on
+    """
+    LogActivity = apps.get_model("api", "LogActivity")
+    LogSheet = apps.get_model("api", "LogSheet")
+    LogActivity.objects.update(
+        driver=Subquery(LogSheet.objects.filter(pk=OuterRef("log_sheet")).values("driver")[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("api", "0016_tripstop_datetimes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="logactivity",
+            name="driver",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="log_activities",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.RunPython(copy_sheet_drivers, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="logactivity",
+            name="driver",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="log_activities",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="logactivity",
+            index=models.Index(fields=["driver", "start_time", "end_time"], name="api_logactivity_driver_idx"),
+        ),
+    ]
@@ -20,6 +20,16 @@ class Trip(models.Model):
     start_time = models.DateTimeField(null=True, blank=True)
     end_time = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    route_polyline = models.TextField(
+        blank=True, default='', help_text="Simplified route as an encoded polyline (precision 5)"
+    )
+    route_leg_starts = models.JSONField(
+        default=list, blank=True, help_text="Index of the first polyline vertex of each leg"
+    )
+
+    class Meta:
+        # Serves the newest-first trip listings and their keyset pagination
+        indexes = [models.Index(fields=['driver', 'created_at', 'id'], name='api_trip_driver_created_idx')]
 
     def __str__(self):
         return f'{self.pickup_location} to {self.dropoff_location}'
@@ -27,16 +37,20 @@ class Trip(models.Model):
 
 class TripStop(models.Model):
     STOP_TYPES = [
+        ('start', 'Start'),
         ('pickup', 'Pickup'),
         ('dropoff', 'Dropoff'),
         ('rest', 'Rest Stop'),
-        ('fuel', 'Rest fuel')
+        ('fuel', 'Rest fuel'),
+        ('overnight', 'Overnight rest'),
+        ('restart', '34-hour restart')
     ]
 
-    trip = models.ForeignKey(Trip, on_delete=models.CASCADE, related_name='stop')
+    trip = models.ForeignKey(Trip, on_delete=models.CASCADE, related_name='stops')
     type = models.CharField(max_length=10, choices=STOP_TYPES)
     location = models.CharField(max_length=255)
-    arrival_time = models.CharField(max_length=50)
+    arrival_time = models.DateTimeField()
+    departure_time = models.DateTimeField()
     duration = models.FloatField(help_text="Duration in hrs")
     coordinates = models.CharField(max_length=100, default=1)
 
@@ -84,6 +98,27 @@ class HoursOfService(models.Model):
         return f'{self.driver.username} - {self.date}'
     
 
+class DutyRollup(models.Model):
+    """
+    A driver's on-duty hours for one day with the running total up to that day
+
+    cumulative_hours is a prefix sum over the driver's days, so the hours
+    in any window of days are the difference of two rows. See api.cycle.
+    """
+    driver = models.ForeignKey(User, on_delete=models.CASCADE, related_name='duty_rollups')
+    date = models.DateField()
+    duty_hours = models.FloatField(default=0.0, help_text="On-duty hours on this day")
+    cumulative_hours = models.FloatField(
+        default=0.0, help_text="On-duty hours on this day and every earlier day"
+    )
+
+    class Meta:
+        unique_together = ['driver', 'date']
+
+    def __str__(self):
+        return f'{self.driver.username} - {self.date}: {self.duty_hours}'
+
+
 # class HoursOfService(models.Model):
 #     driver = models.ForeignKey(User, on_delete=models.CASCADE, related_name='hours_of_service')
 #     date = models.DateField()
@@ -141,11 +176,95 @@ class LogActivity(models.Model):
     ]
 
     log_sheet = models.ForeignKey(LogSheet, on_delete=models.CASCADE, related_name="activities")
+    # The sheet's driver, copied so that a driver's activities can be range
+    # scanned by time without going through their sheets
+    driver = models.ForeignKey(User, on_delete=models.CASCADE, related_name="log_activities")
     activity_type = models.CharField(max_length=20, choices=ACTIVITY_TYPES)
-    start_time = models.CharField(max_length=10, default=1)
-    end_time = models.CharField(max_length=10, default=1)
+    start_time = models.DateTimeField()
+    end_time = models.DateTimeField()
     description = models.CharField(max_length=255)
     location = models.CharField(max_length=255, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Activities in time order per sheet
+            models.Index(fields=['log_sheet', 'start_time']),
+            # A driver's activities overlapping a time range: scanned up to
+            # the range's end, with end_time checked from the index
+            models.Index(fields=['driver', 'start_time', 'end_time'], name='api_logactivity_driver_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.activity_type}: {self.start_time:%Y-%m-%d %I:%M %p} to {self.end_time:%I:%M %p}'
+
+
+class GeoCacheEntry(models.Model):
+    """Persisted result of an outbound geocoding or routing lookup"""
+    namespace = models.CharField(max_length=20)
+    key = models.CharField(max_length=255)
+    value = models.JSONField()
+    expires_at = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['namespace', 'key']
+        indexes = [models.Index(fields=['namespace', 'updated_at'])]
+        verbose_name_plural = "Geo cache entries"
+
+    def __str__(self):
+        return f'{self.namespace}: {self.key}'
+
+
+class GeoCacheGeneration(models.Model):
+    """Bumped by every purge of a geo cache namespace, so each process drops its in-memory copies"""
+    namespace = models.CharField(max_length=20, unique=True)
+    generation = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.namespace}: {self.generation}'
+
+
+class DashboardVersion(models.Model):
+    """Bumped by every committed change to a driver's data, retiring their cached dashboard responses"""
+    driver = models.OneToOneField(User, on_delete=models.CASCADE, related_name='dashboard_version')
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.driver}: {self.version}'
+
+
+class PlanningJob(models.Model):
+    """Route plan queued for the run_planning_worker management command"""
+    STATUS_CHOICES = [
+        ('QUEUED', 'queued'),
+        ('RUNNING', 'running'),
+        ('DONE', 'done'),
+        ('FAILED', 'failed'),
+    ]
+
+    driver = models.ForeignKey(User, on_delete=models.CASCADE, related_name='planning_jobs')
+    current_location = models.CharField(max_length=255)
+    pickup_location = models.CharField(max_length=255)
+    dropoff_location = models.CharField(max_length=255)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='QUEUED')
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    trip = models.ForeignKey(
+        Trip, on_delete=models.SET_NULL, blank=True, null=True, related_name='planning_jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Renewed by the worker running the job; an expired lease means the
+    # worker died and the job may be handed to another one
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'created_at'])]
+
+    @property
+    def is_finished(self):
+        return self.status in ('DONE', 'FAILED')
+
     def __str__(self):
-        return f'{self.activity_type}: {self.start_time} to {self.end_time}'
+        return f'Job {self.id} ({self.status}): {self.pickup_location} to {self.dropoff_location}'
@@ -1,187 +1,471 @@
-@api_view(['GET'])
-def generate_driver_log_pdf(request):
-    try:
-        # Get the driver log data
-        from datetime import datetime
-        driver_log = LogSheet.objects.get(date=datetime.today())
-        activities = driver_log.activities.all()
-        
-        # Get the absolute path to your PDF template
-        template_path = os.path.join(settings.BASE_DIR, 'static', 'pdf_templates', 'blank-paper-log.pdf')
-        
-        # Check if file exists
-        if not os.path.exists(template_path):
-            return Response({'error': 'PDF template not found'}, status=404)
-        
-        # Create a buffer for the final PDF
-        buffer = io.BytesIO()
-        
-        # Open the template PDF
-        template_pdf = PdfReader(open(template_path, 'rb'))
-        output_pdf = PdfWriter()
-        
-        # Add the template page to the output
-        page = template_pdf.pages[0]
-        output_pdf.add_page(page)
-        
-        # Create a canvas for overlaying data
-        packet = io.BytesIO()
-        c = canvas.Canvas(packet, pagesize=letter)
-        
-        # Get driver info
-        driver = DriverProfile.objects.get(user=request.user)
-        
-        # Set font before drawing text
-        c.setFont("Helvetica", 10)
-        
-        # Draw text data on the canvas
-        c.drawString(233.2, 731.0, driver_log.date.strftime('%m/%d/%Y'))
-        c.drawString(117.6, 665.7, driver_log.trip.pickup_location)
-        c.drawString(331.5, 667.7, driver_log.trip.dropoff_location)
-        c.drawString(206.2, 604.3, str(driver_log.trip.distance))
-        c.drawString(113.7, 548.6, driver.driver_license)
-        
-        # Define grid parameters 
-        grid_start_x = 73.2
-        grid_start_y = 412.4
-        grid_width = 454.9
-        grid_height = 19.2
-        
-        # Draw the grid framework
-        c.setStrokeColorRGB(0, 0, 1)  # Blue for grid lines
-        c.setLineWidth(1)
-        
-        # Draw horizontal grid lines
-        for i in range(5):
-            y = grid_start_y + (i * grid_height)
-            c.line(grid_start_x, y, grid_start_x + grid_width, y)
-        
-        # Draw vertical grid lines (24 hours) and add time labels
-        c.setFont("Helvetica", 6)  # Smaller font for time labels
+"""
+Driver log sheet PDF rendering
+
+Everything on a log sheet that is the same for every driver is built once
+per process. The canvas layout draws its grid from precomputed line
+coordinates. The template layout parses static/pdf_templates/blank-paper-log.pdf
+once and wraps it, together with the grid and its labels, in a single form
+XObject. Each request then renders only the driver-specific text and
+activity lines with ReportLab and places them over that form, without
+re-parsing the template or merging content streams.
+
+Multi-day logs are streamed: stream_pdf writes each page's objects out as
+soon as the page is drawn, so memory does not grow with the page count.
+
+Rendered PDFs are content addressed. log_sheet_etag hashes every input of
+a render, the hash serves as the strong ETag and as the key into the
+"pdf" cache, and any change to an input yields a new key.
+"""
+import datetime
+import hashlib
+import io
+import json
+import os
+import zlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+from PyPDF2 import PdfReader, PdfWriter
+from PyPDF2.generic import (
+    ArrayObject, DecodedStreamObject, DictionaryObject, IndirectObject, NameObject, StreamObject
+)
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+from .singleton import process_singleton
+
+
+# Grid parameters
+GRID_START_X = 73.2
+GRID_START_Y = 412.4
+GRID_WIDTH = 454.9
+GRID_HEIGHT = 19.2
+
+# Activity row positions (y-coordinates)
+ACTIVITY_ROWS = {
+    'OFF_DUTY': GRID_START_Y + (3 * GRID_HEIGHT),
+    'SLEEPER': GRID_START_Y + (2 * GRID_HEIGHT),
+    'Driving': GRID_START_Y + (1 * GRID_HEIGHT),
+    'ON_DUTY': GRID_START_Y,
+}
+
+ROW_LABELS = (
+    ("OFF DUTY", GRID_START_Y + (3 * GRID_HEIGHT)),
+    ("SLEEPER", GRID_START_Y + (2 * GRID_HEIGHT)),
+    ("DRIVING", GRID_START_Y + (1 * GRID_HEIGHT)),
+    ("ON DUTY", GRID_START_Y),
+)
+
+# 5 horizontal lines and 25 vertical lines (one per hour), as (x1, y1, x2, y2)
+GRID_LINES = [
+    (GRID_START_X, GRID_START_Y + (i * GRID_HEIGHT), GRID_START_X + GRID_WIDTH, GRID_START_Y + (i * GRID_HEIGHT))
+    for i in range(5)
+] + [
+    (GRID_START_X + (i * (GRID_WIDTH / 24)), GRID_START_Y,
+     GRID_START_X + (i * (GRID_WIDTH / 24)), GRID_START_Y + (4 * GRID_HEIGHT))
+    for i in range(25)
+]
+
+TEMPLATE_PATH = os.path.join(settings.BASE_DIR, 'static', 'pdf_templates', 'blank-paper-log.pdf')
+
+# Bump whenever the drawing code changes, so earlier renders are not reused
+LAYOUT_VERSION = 2
+
+PDF_CACHE_ALIAS = 'pdf'
+
+
+def day_bounds(date):
+    """
+    Local midnight at the start and end of a log sheet's day
+    """
+    start = timezone.make_aware(datetime.datetime.combine(date, datetime.time()))
+    return start, start + datetime.timedelta(days=1)
+
+
+def time_to_x_coord(moment, day_start):
+    """
+    Convert a datetime to an x-coordinate on the grid of the day starting at day_start
+
+    Times before or after that day are pinned to the ends of the grid.
+    """
+    hours = (moment - day_start).total_seconds() / 3600
+    return GRID_START_X + (min(max(hours, 0), 24) / 24) * GRID_WIDTH
+
+
+def hour_label(i):
+    """
+    Label for the i-th vertical grid line (0-24)
+    """
+    if i == 0:
+        return "MID"
+    if i == 12:
+        return "NOON"
+    hour = i % 12 or 12
+    am_pm = "AM" if i < 12 or i == 24 else "PM"
+    return f"{hour}{am_pm}"
+
+
+def draw_grid(c, hour_labels=False):
+    """
+    Draw the 24-hour grid and its row labels
+    """
+    c.setStrokeColorRGB(0, 0, 1)  # Blue for grid lines
+    c.setLineWidth(1)
+    c.lines(GRID_LINES)
+
+    if hour_labels:
+        # Centred 10 units above the top line
+        c.setFont("Helvetica", 6)
+        label_y = GRID_START_Y + (4 * GRID_HEIGHT) + 10
         for i in range(25):
-            # Calculate position for this vertical line
-            x = grid_start_x + (i * (grid_width/24))
-            
-            # Draw the vertical line
-            c.line(x, grid_start_y, x, grid_start_y + (4 * grid_height))
-            
-            # Calculate the hour for this line
-            hour = i % 12
-            if hour == 0:
-                hour = 12  # Convert 0 to 12 for 12-hour format
-            
-            # Determine AM/PM
-            am_pm = "AM" if i < 12 or i == 24 else "PM"
-            
-            # Special case for midnight and noon
-            if i == 0:
-                time_label = "MID"
-            elif i == 12:
-                time_label = "NOON"
-            else:
-                time_label = f"{hour}{am_pm}"
-            
-            # Position the label above the grid (10 units above the top line)
-            label_y = grid_start_y + (4 * grid_height) + 10
-            
-            # Center the text on the line
-            text_width = c.stringWidth(time_label, "Helvetica", 6)
-            label_x = x - (text_width / 2)
-            
-            # Draw the time label
-            c.drawString(label_x, label_y, time_label)
-        
-        # Label the grid rows
-        c.setFont("Helvetica", 8)
-        c.drawString(grid_start_x - 60, grid_start_y + (3 * grid_height), "OFF DUTY")
-        c.drawString(grid_start_x - 60, grid_start_y + (2 * grid_height), "SLEEPER")
-        c.drawString(grid_start_x - 60, grid_start_y + (1 * grid_height), "DRIVING")
-        c.drawString(grid_start_x - 60, grid_start_y, "ON DUTY")
-        
-        # Define activity row positions (y-coordinates)
-        activity_rows = {
-            'OFF_DUTY': grid_start_y + (3 * grid_height),
-            'SLEEPER': grid_start_y + (2 * grid_height),
-            'Driving': grid_start_y + (1 * grid_height),
-            'ON_DUTY': grid_start_y,
-        }
-        
-        # Function to convert 12-hour time string to x-coordinate
-        def time_to_x_coord(time_str):
-            try:
-                # Handle different possible 12-hour formats
-                if ':' in time_str:
-                    # Format like "2:30 PM" or "10:45 AM"
-                    time_parts = time_str.strip().split(' ')
-                    hour_minute = time_parts[0].split(':')
-                    hour = int(hour_minute[0])
-                    minute = int(hour_minute[1]) if len(hour_minute) > 1 else 0
-                    am_pm = time_parts[1].upper() if len(time_parts) > 1 else 'AM'
-                else:
-                    # Format like "2 PM" or "10 AM"
-                    time_parts = time_str.strip().split(' ')
-                    hour = int(time_parts[0])
-                    minute = 0
-                    am_pm = time_parts[1].upper() if len(time_parts) > 1 else 'AM'
-                
-                # Convert to 24-hour format
-                if am_pm == 'PM' and hour < 12:
-                    hour += 12
-                elif am_pm == 'AM' and hour == 12:
-                    hour = 0
-                
-                # Calculate position on 24-hour grid
-                hour_fraction = hour + (minute / 60)
-                x_position = grid_start_x + (hour_fraction / 24) * grid_width
-                return x_position
-            except (ValueError, IndexError):
-                # Return default position if conversion fails
-                print(f"Could not parse time: {time_str}")
-                return grid_start_x
-        
-        # Reset stroke color for activity lines
-        c.setStrokeColorRGB(0, 0, 0)  # Black for activity lines
-        
-        # Draw activity lines
-        for activity in activities:
-            # Get y-coordinate for this activity type
-            y_position = activity_rows.get(activity.activity_type, grid_start_y)
-            
-            # Get x-coordinates for start and end times
-            start_x = time_to_x_coord(activity.start_time)
-            end_x = time_to_x_coord(activity.end_time)
-            
-            # Set line properties
-            c.setLineWidth(2)  # Line thickness
-            
-            # Draw the horizontal line
-            c.line(start_x, y_position, end_x, y_position)
-            
-            # Draw small vertical markers at start and end
+            label = hour_label(i)
+            x = GRID_START_X + (i * (GRID_WIDTH / 24))
+            c.drawString(x - (c.stringWidth(label, "Helvetica", 6) / 2), label_y, label)
+
+    c.setFont("Helvetica", 8)
+    for label, y in ROW_LABELS:
+        c.drawString(GRID_START_X - 60, y, label)
+
+
+def draw_activities(c, activities, date, markers=False):
+    """
+    Draw one black line per activity on its duty status row
+
+    Args:
+        c: ReportLab canvas
+        activities: LogActivity instances
+        date (date): Day of the log sheet; only the part of each activity
+            that falls on this day is drawn
+        markers (bool): Also draw short vertical ticks at each start and end
+    """
+    day_start, day_end = day_bounds(date)
+    c.setStrokeColorRGB(0, 0, 0)
+    c.setLineWidth(2)
+    for activity in activities:
+        if activity.end_time <= day_start or activity.start_time >= day_end:
+            continue
+        y_position = ACTIVITY_ROWS.get(activity.activity_type, GRID_START_Y)
+        start_x = time_to_x_coord(activity.start_time, day_start)
+        end_x = time_to_x_coord(activity.end_time, day_start)
+
+        c.line(start_x, y_position, end_x, y_position)
+        if markers:
             c.line(start_x, y_position - 5, start_x, y_position + 5)
             c.line(end_x, y_position - 5, end_x, y_position + 5)
-        
-        # Finalize the canvas
+
+
+def draw_log_sheet(c, date, trip, activities, driver, driving_used, duty_used):
+    """
+    Draw one day of the canvas layout: header, static grid and activity lines
+
+    Args:
+        c: ReportLab canvas
+        date (date): The day drawn
+        trip (Trip): The trip under way that day, or None for a day without one
+        activities: LogActivity instances; only their part on this day is drawn
+        driver (DriverProfile): The driver's profile
+        driving_used (str): Driving hours to print
+        duty_used (str): Duty hours to print
+    """
+    c.setFont("Helvetica", 18)
+    c.setFillColorRGB(0, 0, 0)
+    c.drawString(50, 750, "Driver Log Sheet")
+    c.drawString(350, 750.0, date.strftime('%m/%d/%Y'))
+    c.drawString(100, 710, f'Tractor number: {driver.driver_license}')
+    if trip is not None:
+        c.drawString(100, 665.7, f'From: {trip.pickup_location}')
+        c.drawString(331.5, 667.7, f'To: {trip.dropoff_location}')
+        c.drawString(100, 630.3, f'Total Distance (miles): {str(trip.distance)}')
+    c.drawString(100, 600, f'Total driving time (Hrs): {driving_used}')
+    c.drawString(331.5, 600, f'Total duty time (Hrs): {duty_used}')
+
+    # Static grid, then this driver's activities
+    draw_grid(c)
+    draw_activities(c, activities, date)
+
+
+def _row(instance):
+    """
+    Every stored field of a model instance, in field order
+    """
+    if instance is None:
+        return None
+    return [getattr(instance, field.attname) for field in instance._meta.concrete_fields]
+
+
+def log_sheet_etag(layout, pages, driver):
+    """
+    Strong ETag over every input of a rendered log
+
+    Args:
+        layout (str): Which layout is rendered
+        pages (list): (LogSheet or None, activities, HoursOfService or None) per page
+        driver (DriverProfile): The driver's profile
+
+    Returns:
+        str: Quoted SHA-256 hex digest
+    """
+    inputs = [layout, LAYOUT_VERSION, _row(driver)]
+    for log_sheet, activities, hours in pages:
+        inputs.append([
+            _row(log_sheet),
+            _row(log_sheet.trip) if log_sheet is not None else None,
+            [_row(activity) for activity in activities],
+            _row(hours),
+        ])
+    digest = hashlib.sha256(json.dumps(inputs, default=str).encode())
+    return f'"{digest.hexdigest()}"'
+
+
+def get_or_render(etag, render):
+    """
+    Return the cached PDF for an ETag, calling render() and caching its bytes on a miss
+    """
+    cache = caches[PDF_CACHE_ALIAS]
+    key = 'log-pdf:' + etag.strip('"')
+    pdf = cache.get(key)
+    if pdf is None:
+        pdf = render()
+        cache.set(key, pdf)
+    return pdf
+
+
+class StreamingPDFWriter:
+    """
+    Minimal PDF writer that emits a document incrementally
+
+    Every page is drawn on its own ReportLab canvas. Its content stream and
+    every object its resources refer to (fonts, graphics states, images)
+    are written out straight away, and only the byte offsets of the
+    objects are kept for the cross-reference table at the end.
+    """
+    CATALOG, PAGES = 1, 2
+
+    def __init__(self, pagesize=letter):
+        self.pagesize = pagesize
+        self.position = 0
+        self.offsets = [None, None, None]   # Object number -> byte offset
+        self.kids = []
+        self.shared = {}                    # Object body -> object number
+
+    def _emit(self, data):
+        self.position += len(data)
+        return data
+
+    def _object(self, number, body):
+        self.offsets[number] = self.position
+        return self._emit(b'%d 0 obj\n%s\nendobj\n' % (number, body))
+
+    def _new_object(self, body):
+        self.offsets.append(None)
+        return len(self.offsets) - 1, self._object(len(self.offsets) - 1, body)
+
+    def _copy(self, obj, chunks):
+        """
+        Serialize a value from a page's resources into this document
+
+        Objects it refers to are written out first, once per distinct body
+        across the document, and their bytes appended to chunks.
+        """
+        if isinstance(obj, IndirectObject):
+            body = self._copy(obj.get_object(), chunks)
+            if body not in self.shared:
+                self.shared[body], chunk = self._new_object(body)
+                chunks.append(chunk)
+            return b'%d 0 R' % self.shared[body]
+
+        if isinstance(obj, StreamObject):
+            # Decoding raises on filters PyPDF2 cannot undo rather than
+            # writing a stream that no longer matches its dictionary
+            data = zlib.compress(obj.get_data())
+            entries = {
+                key: value for key, value in obj.items()
+                if key not in ('/Length', '/Filter', '/DecodeParms')
+            }
+            entries[NameObject('/Filter')] = NameObject('/FlateDecode')
+            return b'%s\nstream\n%s\nendstream' % (
+                self._copy_dict(entries, chunks, b'/Length %d' % len(data)), data
+            )
+        if isinstance(obj, DictionaryObject):
+            return self._copy_dict(obj, chunks)
+        if isinstance(obj, ArrayObject):
+            return b'[%s]' % b' '.join(self._copy(item, chunks) for item in obj)
+
+        buffer = io.BytesIO()
+        obj.write_to_stream(buffer, None)
+        return buffer.getvalue()
+
+    def _copy_dict(self, entries, chunks, extra=b''):
+        items = [b'%s %s' % (self._copy(key, chunks), self._copy(value, chunks)) for key, value in entries.items()]
+        return b'<< %s >>' % b' '.join(items + ([extra] if extra else []))
+
+    def begin(self):
+        return self._emit(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n') + self._object(
+            self.CATALOG, b'<< /Type /Catalog /Pages %d 0 R >>' % self.PAGES
+        )
+
+    def add_page(self, draw):
+        """
+        Draw a page and return the bytes of its objects
+        """
+        packet = io.BytesIO()
+        c = canvas.Canvas(packet, pagesize=self.pagesize, invariant=1)
+        draw(c)
+        c.showPage()
+        c.save()
+        page = PdfReader(packet).pages[0]
+
+        chunks = []
+        resources = self._copy(page['/Resources'], chunks)
+
+        content = zlib.compress(page.get_contents().get_data())
+        content_number, chunk = self._new_object(
+            b'<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream' % (len(content), content)
+        )
+        chunks.append(chunk)
+
+        width, height = self.pagesize
+        page_number, chunk = self._new_object(
+            b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %s %s] /Contents %d 0 R /Resources %s >>'
+            % (self.PAGES, str(width).encode(), str(height).encode(), content_number, resources)
+        )
+        chunks.append(chunk)
+        self.kids.append(page_number)
+        return b''.join(chunks)
+
+    def finish(self):
+        """
+        Write the page tree, cross-reference table and trailer
+        """
+        kids = b' '.join(b'%d 0 R' % number for number in self.kids)
+        chunk = self._object(self.PAGES, b'<< /Type /Pages /Kids [%s] /Count %d >>' % (kids, len(self.kids)))
+
+        xref_offset = self.position
+        xref = [b'xref\n0 %d\n0000000000 65535 f \n' % len(self.offsets)]
+        xref += [b'%010d 00000 n \n' % offset for offset in self.offsets[1:]]
+        trailer = b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (
+            len(self.offsets), self.CATALOG, xref_offset
+        )
+        return chunk + b''.join(xref) + trailer
+
+
+def stream_pdf(draws, pagesize=letter):
+    """
+    Generate a PDF one page at a time
+
+    Args:
+        draws (iterable): One callable per page, drawing it on a ReportLab canvas
+
+    Yields:
+        bytes: Chunks of the document
+    """
+    writer = StreamingPDFWriter(pagesize)
+    yield writer.begin()
+    for draw in draws:
+        yield writer.add_page(draw)
+    yield writer.finish()
+
+
+class LogTemplate:
+    """
+    The blank paper log with the grid drawn on it, as one form XObject
+
+    The form and the page content that draws it live in a private in-memory
+    PDF. Requests clone them into their own writer, which copies object
+    references rather than re-parsing anything.
+    """
+    FORM_NAME = '/LogTemplate'
+
+    def __init__(self, path):
+        page = PdfReader(path).pages[0]
+
+        # The grid is static, so merge it into the template once
+        packet = io.BytesIO()
+        c = canvas.Canvas(packet, pagesize=letter)
+        draw_grid(c, hour_labels=True)
         c.save()
-        
-        # Move to the beginning of the buffer
         packet.seek(0)
-        
-        # Create a PDF from the buffer
-        overlay_pdf = PdfReader(packet)
-        
-        # Merge the overlay with the template page
-        page.merge_page(overlay_pdf.pages[0])
-        
-        # Write the output PDF to the response buffer
-        output_pdf.write(buffer)
+        page.merge_page(PdfReader(packet).pages[0])
+
+        writer = PdfWriter()
+        page = writer.add_page(page)
+
+        form = DecodedStreamObject()
+        form.set_data(page.get_contents().get_data())
+        form.update({
+            NameObject('/Type'): NameObject('/XObject'),
+            NameObject('/Subtype'): NameObject('/Form'),
+            NameObject('/BBox'): page.mediabox,
+            NameObject('/Resources'): page['/Resources'],
+        })
+        content = DecodedStreamObject()
+        content.set_data(f'q {self.FORM_NAME} Do Q'.encode())
+
+        # PyPDF2 has no public API for adding a standalone object, so this
+        # uses the private _add_object. requirements.txt pins PyPDF2 3.0.1,
+        # its final release (development moved to pypdf), so the method
+        # cannot change under us; revisit this on a move to pypdf.
+        page[NameObject('/Resources')] = DictionaryObject({
+            NameObject('/XObject'): DictionaryObject({NameObject(self.FORM_NAME): writer._add_object(form)})
+        })
+        page[NameObject('/Contents')] = writer._add_object(content)
+
+        buffer = io.BytesIO()
+        writer.write(buffer)
         buffer.seek(0)
-        
-        # Create response with PDF
-        response = HttpResponse(buffer, content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="driver_log.pdf"'
-        
-        return response
-        
-    except LogSheet.DoesNotExist:
-        return Response({'error': 'Log sheet not found'}, status=404)
\ No newline at end of file
+        base = PdfReader(buffer).pages[0]
+
+        self.mediabox = base.mediabox
+        self.form = base['/Resources']['/XObject'][self.FORM_NAME]
+        self.content = base['/Contents']
+
+        # Resolve every object now, so later clones only read cached objects
+        self.render(lambda c: None)
+
+    def render(self, draw):
+        """
+        Render a log sheet over the template
+
+        Args:
+            draw (callable): Draws the driver-specific content on a ReportLab canvas
+
+        Returns:
+            bytes: The PDF
+        """
+        packet = io.BytesIO()
+        c = canvas.Canvas(packet, pagesize=letter, invariant=1)
+        draw(c)
+        # Emit the page even if nothing was drawn on it
+        c.showPage()
+        c.save()
+        packet.seek(0)
+
+        writer = PdfWriter()
+        page = writer.add_page(PdfReader(packet).pages[0])
+
+        # Draw the template form first, then the overlay's own content on top
+        xobjects = page['/Resources'].setdefault(NameObject('/XObject'), DictionaryObject())
+        xobjects[NameObject(self.FORM_NAME)] = self.form.clone(writer).indirect_reference
+        page[NameObject('/Contents')] = ArrayObject([
+            self.content.clone(writer).indirect_reference,
+            page.raw_get('/Contents'),
+        ])
+        page.mediabox = self.mediabox
+
+        buffer = io.BytesIO()
+        writer.write(buffer)
+        return buffer.getvalue()
+
+
+@process_singleton
+def get_log_template():
+    """
+    Return the process-wide log template, loading it on first use
+
+    Raises:
+        FileNotFoundError: If the template PDF is missing
+    """
+    if not os.path.exists(TEMPLATE_PATH):
+        raise FileNotFoundError(TEMPLATE_PATH)
+    return LogTemplate(TEMPLATE_PATH)
@@ -0,0 +1,211 @@
+"""
+Offline truck stop and fuel station index for placing stops along a route
+
+Points of interest are loaded once per process from a local CSV or GeoJSON
+export (settings.POI_DATASET) into a uniform lat/lng grid. Rest and fuel
+stops are then matched to the nearest suitable POI inside a corridor
+around the route, without any network calls.
+
+CSV files need name, kind, lat and lon columns and may add an address
+column. GeoJSON files need Point features whose properties carry name,
+kind and optionally address. Recognised kinds are truck_stop, rest_area
+and fuel.
+"""
+import csv
+import json
+import logging
+import math
+import os
+from collections import defaultdict
+
+import numpy as np
+from django.conf import settings
+
+from .geometry import EARTH_RADIUS_METERS
+from .singleton import process_singleton
+
+
+logger = logging.getLogger(__name__)
+
+REST_STOP_KINDS = ('truck_stop', 'rest_area')
+FUEL_STOP_KINDS = ('truck_stop', 'fuel')
+
+DEFAULT_POI_CONFIG = {
+    'PATH': None,
+    'CELL_SIZE': 0.1,           # Grid cell size in degrees (~11km of latitude)
+    'CORRIDOR': 5000,           # Max meters a POI may lie off the route
+    'WINDOW': 40000,            # Max meters a stop may move along the route
+    'SAMPLE_SPACING': 1000,     # Meters between route samples in the window
+}
+
+
+def get_poi_config():
+    config = dict(DEFAULT_POI_CONFIG)
+    config.update(getattr(settings, 'POI_DATASET', {}))
+    return config
+
+
+class PointOfInterest:
+    __slots__ = ('name', 'kind', 'lon', 'lat', 'address')
+
+    def __init__(self, name, kind, lon, lat, address=''):
+        self.name = name
+        self.kind = kind
+        self.lon = lon
+        self.lat = lat
+        self.address = address
+
+    @property
+    def description(self):
+        return f'{self.name}, {self.address}' if self.address else self.name
+
+    @property
+    def coordinates(self):
+        return f'{self.lon},{self.lat}'
+
+
+def load_pois(path):
+    """
+    Read points of interest from a CSV or GeoJSON file
+
+    Args:
+        path (str): Path to a .csv, .json or .geojson file
+
+    Returns:
+        list: PointOfInterest instances
+    """
+    if path.lower().endswith('.csv'):
+        with open(path, newline='', encoding='utf-8') as f:
+            return [
+                PointOfInterest(
+                    row['name'], row['kind'].strip().lower(),
+                    float(row['lon']), float(row['lat']), row.get('address') or ''
+                )
+                for row in csv.DictReader(f)
+            ]
+
+    with open(path, encoding='utf-8') as f:
+        features = json.load(f).get('features', [])
+    pois = []
+    for feature in features:
+        geometry = feature.get('geometry') or {}
+        if geometry.get('type') != 'Point':
+            continue
+        properties = feature.get('properties') or {}
+        lon, lat = geometry['coordinates'][:2]
+        pois.append(PointOfInterest(
+            properties.get('name', ''), str(properties.get('kind', '')).lower(),
+            float(lon), float(lat), properties.get('address') or ''
+        ))
+    return pois
+
+
+class POIIndex:
+    """
+    Uniform grid over POI coordinates for corridor queries along a route
+    """
+    def __init__(self, pois, cell_size=DEFAULT_POI_CONFIG['CELL_SIZE']):
+        self.pois = list(pois)
+        self.cell_size = cell_size
+        self.coords = np.array([[poi.lon, poi.lat] for poi in self.pois], dtype=float).reshape(-1, 2)
+        self.kinds = np.array([poi.kind for poi in self.pois], dtype=object)
+
+        self.cells = defaultdict(list)
+        for i, (lon, lat) in enumerate(self.coords):
+            self.cells[self._cell(lon, lat)].append(i)
+
+    def __len__(self):
+        return len(self.pois)
+
+    def _cell(self, lon, lat):
+        return (math.floor(lon / self.cell_size), math.floor(lat / self.cell_size))
+
+    def _candidates(self, coords, radius):
+        """
+        Indices of POIs in grid cells within radius meters of any of coords
+        """
+        # Widen the longitude reach towards the poles, where degrees shrink
+        max_lat = min(float(np.abs(coords[:, 1]).max()), 85.0)
+        reach_lat = math.ceil(math.degrees(radius / EARTH_RADIUS_METERS) / self.cell_size)
+        reach_lon = math.ceil(reach_lat / math.cos(math.radians(max_lat)))
+
+        centres = {self._cell(lon, lat) for lon, lat in coords}
+        found = set()
+        for x, y in centres:
+            for dx in range(-reach_lon, reach_lon + 1):
+                for dy in range(-reach_lat, reach_lat + 1):
+                    found.update(self.cells.get((x + dx, y + dy), ()))
+        return np.fromiter(found, dtype=np.int64, count=len(found))
+
+    def find_along(self, geometry, ratio, kinds, corridor=None, window=None, spacing=None):
+        """
+        Find the POI closest to a target position along a route
+
+        Candidates must lie within corridor meters of the route somewhere
+        within window meters (along the route) of the target position. Of
+        those, the one whose nearest route position is closest to the
+        target wins.
+
+        Args:
+            geometry (RouteGeometry): Decoded route geometry
+            ratio (float): Route completion ratio (0-1) of the target position
+            kinds (tuple): Acceptable POI kinds
+
+        Returns:
+            PointOfInterest or None
+        """
+        if not self.pois or not len(geometry):
+            return None
+
+        config = get_poi_config()
+        if corridor is None:
+            corridor = config['CORRIDOR']
+        if window is None:
+            window = config['WINDOW']
+        if spacing is None:
+            spacing = config['SAMPLE_SPACING']
+
+        target = min(max(ratio, 0.0), 1.0) * geometry.total_distance
+        distances, samples = geometry.points_between(target - window, target + window, spacing)
+
+        candidates = self._candidates(samples, corridor)
+        if not len(candidates):
+            return None
+        candidates = candidates[np.isin(self.kinds[candidates], kinds)]
+        if not len(candidates):
+            return None
+
+        # Equirectangular distance from every candidate to every route sample
+        points = np.radians(self.coords[candidates])
+        route = np.radians(samples)
+        mean_lat = np.cos((points[:, 1:2] + route[None, :, 1]) / 2)
+        dx = (points[:, 0:1] - route[None, :, 0]) * mean_lat
+        dy = points[:, 1:2] - route[None, :, 1]
+        offsets = EARTH_RADIUS_METERS * np.sqrt(dx ** 2 + dy ** 2)
+
+        nearest = offsets.argmin(axis=1)
+        within = offsets[np.arange(len(candidates)), nearest] <= corridor
+        if not within.any():
+            return None
+
+        shift = np.abs(distances[nearest] - target)
+        shift[~within] = np.inf
+        return self.pois[candidates[int(shift.argmin())]]
+
+
+@process_singleton
+def get_poi_index():
+    """
+    Return the process-wide POI index, loading the dataset on first use
+
+    An empty index is returned when no dataset is configured or it cannot
+    be read, in which case callers fall back to reverse geocoding.
+    """
+    config = get_poi_config()
+    pois = []
+    if config['PATH'] and os.path.exists(config['PATH']):
+        try:
+            pois = load_pois(str(config['PATH']))
+        except (OSError, ValueError, KeyError):
+            logger.exception("Could not load POI dataset %s", config['PATH'])
+    return POIIndex(pois, cell_size=config['CELL_SIZE'])
@@ -0,0 +1,149 @@
+"""
+Serializer output from plain rows, skipping per-field introspection
+
+A Projection looks at a flat serializer once and records, for each output
+field, the key to read and the conversion DRF would apply. Rows from
+QuerySet.values() or plain dicts are then turned into the same output as
+the serializer, with none of its per-instance field binding or
+attribute lookups. Columns whose database value is already what the
+field outputs (text, numbers, booleans, choices) are copied as they are;
+every other field still converts through its own to_representation,
+except ISO 8601 datetimes, which look up the current timezone once per
+list rather than once per value.
+"""
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+
+# Fields whose output equals a value of the matching database column type
+PLAIN_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.ChoiceField,
+    serializers.FloatField,
+    serializers.IntegerField,
+)
+
+
+def is_iso_datetime(field):
+    """
+    Whether a field outputs datetimes as ISO 8601 in the current timezone
+    """
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    return (
+        type(field) is serializers.DateTimeField
+        and isinstance(output_format, str)
+        and output_format.lower() == ISO_8601
+        and not hasattr(field, 'timezone')
+    )
+
+
+def iso_datetime(tz, fallback):
+    """
+    DateTimeField.to_representation with the current timezone already resolved
+    """
+    def convert(value):
+        if getattr(value, 'tzinfo', None) is None:
+            return fallback(value)
+        try:
+            value = value.astimezone(tz).isoformat()
+        except OverflowError:
+            return fallback(value)
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return convert
+
+
+class Projection:
+    """
+    The output plan of a serializer with only direct fields and nested lists
+    """
+    _cache = {}
+
+    @classmethod
+    def of(cls, serializer_class):
+        """
+        The shared projection of a serializer class
+        """
+        projection = cls._cache.get(serializer_class)
+        if projection is None:
+            projection = cls._cache[serializer_class] = cls(serializer_class)
+        return projection
+
+    def __init__(self, serializer_class):
+        self.columns = []
+        self.datetimes = []
+        for name, field in serializer_class().fields.items():
+            if field.write_only:
+                continue
+            if field.source == '*' or '.' in field.source:
+                raise ImproperlyConfigured(f"{serializer_class.__name__}.{name} does not read a single key")
+
+            if isinstance(field, serializers.ListSerializer):
+                convert = Projection.of(type(field.child)).rows
+            elif isinstance(field, (serializers.BaseSerializer, serializers.RelatedField,
+                                    serializers.ManyRelatedField, serializers.SerializerMethodField)):
+                raise ImproperlyConfigured(f"{serializer_class.__name__}.{name} needs the model instance")
+            elif type(field) in PLAIN_FIELDS:
+                convert = None
+            else:
+                if is_iso_datetime(field):
+                    self.datetimes.append(len(self.columns))
+                convert = field.to_representation
+            self.columns.append((name, field.source, convert))
+
+    @property
+    def sources(self):
+        """
+        Keys to read, e.g. to pass to QuerySet.values()
+        """
+        return [source for _, source, _ in self.columns]
+
+    def row(self, row, columns=None):
+        """
+        Serializer output for one mapping
+        """
+        data = {}
+        for name, source, convert in columns or self.columns:
+            try:
+                value = row[source]
+            except KeyError:
+                # The serializer leaves out missing read-only values too
+                continue
+            data[name] = value if value is None or convert is None else convert(value)
+        return data
+
+    def rows(self, rows):
+        columns = self.columns
+        if self.datetimes and settings.USE_TZ:
+            tz = timezone.get_current_timezone()
+            columns = list(columns)
+            for index in self.datetimes:
+                name, source, convert = columns[index]
+                columns[index] = name, source, iso_datetime(tz, convert)
+        return [self.row(row, columns) for row in rows]
+
+
+def serialize(serializer_class, instance=None, queryset=None, many=False):
+    """
+    Output of serializer_class, through a Projection when settings.FAST_JSON is on
+
+    Args:
+        serializer_class: A serializer Projection can handle
+        instance: A mapping (or list of mappings with many=True) to serialize
+        queryset: Alternatively, the queryset of model rows to serialize
+
+    Returns:
+        The same data as serializer_class(..., many=many).data
+    """
+    if not getattr(settings, 'FAST_JSON', False):
+        return serializer_class(queryset if queryset is not None else instance, many=many).data
+
+    projection = Projection.of(serializer_class)
+    if queryset is not None:
+        return projection.rows(queryset.values(*projection.sources))
+    return projection.rows(instance) if many else projection.row(instance)
@@ -0,0 +1,71 @@
+"""
+JSON renderer backed by orjson
+
+orjson is an optional dependency. Without it, or when FAST_JSON is off,
+the API uses DRF's stock JSONRenderer.
+"""
+import math
+import re
+
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# orjson writes exponents as 1e16 and 1e-5 where json writes 1e+16 and 1e-05
+EXPONENT = re.compile(rb'[0-9]e[-0-9]')
+
+
+def has_non_finite(data):
+    """
+    Whether data holds a NaN or infinite float anywhere, which orjson writes as null
+    """
+    if isinstance(data, float):
+        return not math.isfinite(data)
+    if isinstance(data, dict):
+        return any(has_non_finite(value) for value in data.values())
+    if isinstance(data, (list, tuple)):
+        return any(has_non_finite(value) for value in data)
+    return False
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that encodes compact UTF-8 JSON with orjson
+
+    The bytes are the same as JSONRenderer's. Values orjson has no native
+    encoding for (dates, decimals, lazy strings...) go through DRF's own
+    encoder, and anything else that could come out differently is
+    rendered by JSONRenderer instead: indented output such as the
+    browsable API's, non-default JSON settings, data orjson rejects,
+    NaN and infinite floats, which JSONRenderer refuses but orjson writes
+    as null, and, rarely, floats written with an exponent.
+    """
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME
+            )
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Only output with a null can hide a NaN or infinity
+        if EXPONENT.search(ret) or (b'null' in ret and has_non_finite(data)):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Same strict javascript subset as JSONRenderer
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
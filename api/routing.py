@@ -0,0 +1,155 @@
+"""
+Routing backends and the route cache
+
+The planner asks the configured backend (settings.ROUTING_BACKEND) for a
+single route through all of its waypoints and splits the legs out of that
+one response. Responses are cached keyed by the snapped waypoints.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .cache import Lookup, TwoTierCache
+from .http import aget, get_http_config, get_session
+from .singleton import process_singleton
+
+
+route_cache = TwoTierCache('route')
+
+DEFAULT_ROUTING_BACKEND = {
+    'BACKEND': 'api.routing.OSRMBackend',
+    'OPTIONS': {
+        'base_url': 'https://router.project-osrm.org',
+        'profile': 'driving',
+    },
+}
+
+
+def snap_coords(coords, precision=None):
+    """
+    Snap "lon,lat" coordinates to a fixed-precision grid
+
+    Routes whose waypoints fall within the same grid cells share one cache entry.
+    """
+    if precision is None:
+        precision = route_cache.config.get('SNAP_PRECISION', 3)
+    lon, lat = (float(value) for value in coords.split(','))
+    return f"{lon:.{precision}f},{lat:.{precision}f}"
+
+
+def route_key(*coords):
+    """
+    Cache key for a route through the given "lon,lat" waypoints
+    """
+    return ';'.join(snap_coords(point) for point in coords)
+
+
+class RoutingBackend:
+    """
+    Base class for routing services
+
+    Subclasses return an OSRM-shaped route dict with 'distance' (meters),
+    'duration' (seconds) and one entry in 'legs' per pair of waypoints.
+    """
+    def route(self, waypoints):
+        raise NotImplementedError
+
+    async def aroute(self, waypoints):
+        """
+        Async route. Backends without a native async client run route() on a thread.
+        """
+        return await sync_to_async(self.route, thread_sensitive=False)(waypoints)
+
+
+class OSRMBackend(RoutingBackend):
+    """
+    OSRM HTTP API, either the public demo server or a self-hosted instance
+    """
+    def __init__(self, base_url, profile='driving', timeout=None):
+        self.base_url = base_url.rstrip('/')
+        self.profile = profile
+        self.timeout = timeout or get_http_config()['TIMEOUT']
+
+    def _url(self, waypoints):
+        return (
+            f"{self.base_url}/route/v1/{self.profile}/{';'.join(waypoints)}"
+            "?overview=full&alternatives=false&steps=true"
+        )
+
+    def route(self, waypoints):
+        """
+        Get one route through all waypoints
+
+        Args:
+            waypoints (list): Coordinates "lon,lat" in visiting order
+
+        Returns:
+            dict: Route information
+        """
+        response = get_session().get(self._url(waypoints), timeout=self.timeout)
+        return self._parse(response)
+
+    async def aroute(self, waypoints):
+        response = await aget(self._url(waypoints), timeout=self.timeout)
+        return self._parse(response)
+
+    def _parse(self, response):
+        if response.status_code != 200:
+            raise Exception(f"OSRM API error: {response.status_code}")
+
+        data = response.json()
+        if data['code'] != 'Ok':
+            raise Exception(f"Routing error: {data['code']}")
+
+        return data['routes'][0]
+
+
+@process_singleton
+def get_routing_backend():
+    """
+    Instantiate the backend configured in settings.ROUTING_BACKEND once per process
+    """
+    config = getattr(settings, 'ROUTING_BACKEND', DEFAULT_ROUTING_BACKEND)
+    backend_class = import_string(config['BACKEND'])
+    return backend_class(**config.get('OPTIONS', {}))
+
+
+def route_lookup(*waypoints):
+    """
+    Lookup of the route through the waypoints in the route cache, for api.cache.resolve
+    """
+    return Lookup(route_cache, route_key(*waypoints), lambda: get_routing_backend().route(list(waypoints)))
+
+
+def get_route(*waypoints):
+    """
+    Route through the waypoints, served from the route cache when possible
+    """
+    return route_lookup(*waypoints).get()
+
+
+async def aget_route(*waypoints):
+    """
+    Async get_route, sharing the route cache with the sync version
+    """
+    async def fetch():
+        return await get_routing_backend().aroute(list(waypoints))
+
+    return await route_cache.aget_or_fetch(route_key(*waypoints), fetch)
+
+
+def split_legs(route):
+    """
+    Split a multi-waypoint route into one single-leg route per leg
+
+    Each part keeps the shape the stop finders expect: 'distance',
+    'duration' and a 'legs' list holding that one leg with its steps.
+    """
+    return [
+        {
+            'distance': leg['distance'],
+            'duration': leg['duration'],
+            'legs': [leg],
+        }
+        for leg in route['legs']
+    ]
@@ -1,10 +1,15 @@
 from rest_framework import serializers
-from .models import Trip, TripStop, HoursOfService, LogSheet, LogActivity
+from .geometry import POLYLINE_PRECISION
+from .models import Trip, TripStop, HoursOfService, LogSheet, LogActivity, PlanningJob
 
 class TripStopSerializer(serializers.ModelSerializer):
+    # Stops are stored with full datetimes; clients get the local clock time
+    arrival_time = serializers.DateTimeField(format='%I:%M %p')
+    departure_time = serializers.DateTimeField(format='%I:%M %p')
+
     class Meta:
         model = TripStop
-        fields = ['id', 'type', 'location', 'arrival_time', 'duration', 'coordinates']
+        fields = ['id', 'type', 'location', 'arrival_time', 'departure_time', 'duration', 'coordinates']
 
 class TripSerializer(serializers.ModelSerializer):
     class Meta:
@@ -12,13 +17,18 @@ class TripSerializer(serializers.ModelSerializer):
         fields = ['id', 'pickup_location', 'dropoff_location', 'distance', 
                   'estimated_hours', 'status', 'start_time']
 
-class TripDetailSerializer(serializers.ModelSerializer):
-    stops = TripStopSerializer(many=True, read_only=True)
-    
+class TripRouteSerializer(serializers.ModelSerializer):
+    polyline = serializers.CharField(source='route_polyline')
+    precision = serializers.SerializerMethodField()
+    leg_starts = serializers.JSONField(source='route_leg_starts')
+
     class Meta:
         model = Trip
-        fields = ['id', 'pickup_location', 'dropoff_location', 'distance', 
-                  'estimated_hours', 'status', 'start_time', 'end_time', 'stops']
+        fields = ['id', 'distance', 'precision', 'polyline', 'leg_starts']
+
+    def get_precision(self, trip):
+        return POLYLINE_PRECISION
+
 
 class HoursOfServiceSerializer(serializers.ModelSerializer):
     class Meta:
@@ -28,7 +38,7 @@ class HoursOfServiceSerializer(serializers.ModelSerializer):
 class LogActivitySerializer(serializers.ModelSerializer):
     class Meta:
         model = LogActivity
-        fields = ['id', 'type', 'start_time', 'end_time', 'description', 'location']
+        fields = ['id', 'activity_type', 'start_time', 'end_time', 'description', 'location']
 
 class LogSheetSerializer(serializers.ModelSerializer):
     class Meta:
@@ -42,6 +52,16 @@ class LogSheetDetailSerializer(serializers.ModelSerializer):
         model = LogSheet
         fields = ['id', 'date', 'trip_description', 'hours_logged', 
                   'cycle_hours', 'status', 'activities']
+
+class TripDetailSerializer(serializers.ModelSerializer):
+    stops = TripStopSerializer(many=True, read_only=True)
+    log_sheets = LogSheetDetailSerializer(many=True, read_only=True)
+    
+    class Meta:
+        model = Trip
+        fields = ['id', 'pickup_location', 'dropoff_location', 'distance', 
+                  'estimated_hours', 'status', 'start_time', 'end_time', 'created_at',
+                  'stops', 'log_sheets']
         
 # class CurrentHoursSerializer(serializers.Serializer):
 #     driving_used = serializers.FloatField()
@@ -57,6 +77,13 @@ class RouteRequestSerializer(serializers.Serializer):
     pickup_location = serializers.CharField(max_length=255)
     dropoff_location = serializers.CharField(max_length=255)
 
+class BatchRouteRequestSerializer(serializers.Serializer):
+    # Items are validated one by one with RouteRequestSerializer so that
+    # each gets its own errors
+    routes = serializers.ListField(
+        child=serializers.DictField(), allow_empty=False, max_length=100
+    )
+
 class RouteResponseSerializer(serializers.Serializer):
     total_distance = serializers.FloatField()
     driving_hours = serializers.FloatField()
@@ -66,4 +93,24 @@ class RouteResponseSerializer(serializers.Serializer):
 
 class GeocodingRequestSerializer(serializers.Serializer):
     lat = serializers.FloatField()
-    lng = serializers.FloatField()
\ No newline at end of file
+    lng = serializers.FloatField()
+
+class DriverLogRangeSerializer(serializers.Serializer):
+    MAX_DAYS = 31
+
+    start = serializers.DateField()
+    end = serializers.DateField()
+
+    def validate(self, data):
+        days = (data['end'] - data['start']).days + 1
+        if days < 1:
+            raise serializers.ValidationError("end must not be before start")
+        if days > self.MAX_DAYS:
+            raise serializers.ValidationError(f"A log covers at most {self.MAX_DAYS} days")
+        return data
+
+class PlanningJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PlanningJob
+        fields = ['id', 'status', 'current_location', 'pickup_location', 'dropoff_location',
+                  'result', 'error', 'trip', 'created_at', 'started_at', 'finished_at']
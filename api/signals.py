@@ -0,0 +1,38 @@
+"""
+Bump a driver's dashboard version whenever their data changes
+
+Bumps happen once the write is committed. Bumping earlier would let a
+concurrent poll cache the old data under the new version.
+
+Bulk inserts send no signals. The planner's bulk inserted stops and
+activities are always saved together with a trip, so the trip's signal
+covers them.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .dashboard import bump_version
+from .models import HoursOfService, LogActivity, LogSheet, Trip
+
+
+def bump_on_commit(driver_id):
+    transaction.on_commit(lambda: bump_version(driver_id))
+
+
+@receiver([post_save, post_delete], sender=Trip)
+@receiver([post_save, post_delete], sender=HoursOfService)
+@receiver([post_save, post_delete], sender=LogSheet)
+def driver_data_changed(sender, instance, **kwargs):
+    bump_on_commit(instance.driver_id)
+
+
+@receiver([post_save, post_delete], sender=LogActivity)
+def activity_changed(sender, instance, **kwargs):
+    if LogActivity.log_sheet.is_cached(instance):
+        # Activities are saved through their sheet, so no query is needed
+        driver_id = instance.log_sheet.driver_id
+    else:
+        driver_id = LogSheet.objects.filter(id=instance.log_sheet_id).values_list('driver_id', flat=True).first()
+    if driver_id is not None:
+        bump_on_commit(driver_id)
@@ -0,0 +1,36 @@
+"""
+Lazily built process-wide instances
+
+The HTTP session, lookup pool, geocoder, routing backend, POI index, log
+template and stand-in are each built once per process, on first use, and
+shared by every thread after that. process_singleton wraps the function
+building one of them so concurrent first calls build it only once.
+"""
+import functools
+import threading
+
+
+class process_singleton:
+    """
+    Decorator calling a factory once per process and returning its result from then on
+
+    A factory that raises is retried on the next call. reset() drops the
+    instance, so the next call builds a new one, e.g. after a test changes
+    the settings it was built from.
+    """
+    def __init__(self, factory):
+        functools.update_wrapper(self, factory)
+        self.factory = factory
+        self.instance = None
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        if self.instance is None:
+            with self._lock:
+                if self.instance is None:
+                    self.instance = self.factory()
+        return self.instance
+
+    def reset(self):
+        with self._lock:
+            self.instance = None
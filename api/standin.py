@@ -0,0 +1,317 @@
+"""
+Offline stand-in for OSRM and Nominatim
+
+Serves route, search and reverse responses from a JSON fixture file, after
+a configurable artificial latency, so the planner can be load tested and
+developed without touching the public services. It can run in process,
+as a requests adapter and httpx transport on the shared HTTP clients
+(settings.GEO_STANDIN), or as a local HTTP server (run_geo_standin) that
+OSRM_BASE_URL and NOMINATIM_URL point at.
+
+The fixture file holds the upstream JSON bodies keyed by request:
+
+    {
+        "search": {"denver": [...]},
+        "reverse": {"39.74000,-104.99000": {...}},
+        "route": {"-104.99000,39.74000;-87.60000,41.80000": {...}}
+    }
+
+With RECORD on, requests missing from the file are forwarded to the real
+service and the responses saved into it. With SYNTHESIZE on, they are
+answered with made up but well formed data instead: a stable point per
+address, a placeholder address per point and a straight line route.
+"""
+import asyncio
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from urllib.parse import parse_qsl, urlsplit
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+from .geometry import EARTH_RADIUS_METERS, encode_polyline
+from .singleton import process_singleton
+
+
+DEFAULT_STANDIN_CONFIG = {
+    'ENABLED': False,
+    'FIXTURES': None,
+    # Seconds added to every response, per service
+    'LATENCY': {'route': 0.0, 'search': 0.0, 'reverse': 0.0},
+    'RECORD': False,
+    'SYNTHESIZE': True,
+}
+
+# Decimal places coordinates are rounded to in fixture keys
+KEY_PRECISION = 5
+
+# Synthetic routes: road distance over straight distance, average speed
+# (m/s) and the length of each step (m)
+ROAD_FACTOR = 1.25
+SYNTHETIC_SPEED = 25.0
+SYNTHETIC_STEP = 5000.0
+
+# Synthetic addresses fall inside the continental US
+SYNTHETIC_BOUNDS = ((-120.0, 30.0), (-75.0, 47.0))
+
+SERVICES = ('route', 'search', 'reverse')
+
+
+def get_standin_config():
+    config = dict(DEFAULT_STANDIN_CONFIG)
+    config.update(getattr(settings, 'GEO_STANDIN', {}))
+    config['LATENCY'] = {**DEFAULT_STANDIN_CONFIG['LATENCY'], **config['LATENCY']}
+    return config
+
+
+def point_key(lon, lat):
+    return f"{float(lon):.{KEY_PRECISION}f},{float(lat):.{KEY_PRECISION}f}"
+
+
+def classify(url):
+    """
+    Which service a URL calls and its fixture key
+
+    Returns:
+        tuple: (service, key), or (None, None) for anything else
+    """
+    parts = urlsplit(str(url))
+    params = dict(parse_qsl(parts.query))
+    path = parts.path.rstrip('/')
+
+    if '/route/v1/' in path:
+        waypoints = path.split('/route/v1/', 1)[1].split('/', 1)[-1].split(';')
+        return 'route', ';'.join(point_key(*point.split(',')) for point in waypoints)
+    if path.endswith('/search'):
+        return 'search', ' '.join(params.get('q', '').lower().split())
+    if path.endswith('/reverse'):
+        # Keyed lon first like every other point here
+        return 'reverse', point_key(params.get('lon', 0), params.get('lat', 0))
+    return None, None
+
+
+class StandIn:
+    """
+    Fixture responses for OSRM and Nominatim requests
+    """
+    def __init__(self, fixtures=None, latency=None, record=False, synthesize=True):
+        self.path = fixtures
+        self.latency = {**DEFAULT_STANDIN_CONFIG['LATENCY'], **(latency or {})}
+        self.record = record
+        self.synthesize = synthesize
+        self._lock = threading.Lock()
+        self.fixtures = {service: {} for service in SERVICES}
+
+        if fixtures and os.path.exists(fixtures):
+            with open(fixtures) as f:
+                for service, entries in json.load(f).items():
+                    self.fixtures.setdefault(service, {}).update(entries)
+
+    @classmethod
+    def from_settings(cls):
+        config = get_standin_config()
+        return cls(
+            fixtures=config['FIXTURES'],
+            latency=config['LATENCY'],
+            record=config['RECORD'],
+            synthesize=config['SYNTHESIZE'],
+        )
+
+    def delay(self, url):
+        service, _ = classify(url)
+        return self.latency.get(service, 0.0)
+
+    def lookup(self, url):
+        """
+        The recorded or synthesized response to a request
+
+        Returns:
+            tuple: (status, body), or None if the request should be forwarded
+        """
+        service, key = classify(url)
+        if service is None:
+            return 404, {'error': 'Not served by the stand-in'}
+
+        body = self.fixtures[service].get(key)
+        if body is not None:
+            return 200, body
+        if self.record:
+            return None
+        if self.synthesize:
+            return 200, getattr(self, f'_synthetic_{service}')(key)
+
+        if service == 'route':
+            return 400, {'code': 'NoRoute', 'message': 'No recorded route'}
+        if service == 'reverse':
+            return 200, {'error': 'Unable to geocode'}
+        return 200, []
+
+    def save(self, url, status, body):
+        """
+        Record an upstream response into the fixture file
+        """
+        service, key = classify(url)
+        if service is None or status != 200:
+            return
+        if service == 'route' and body.get('code') != 'Ok':
+            return
+
+        with self._lock:
+            self.fixtures[service][key] = body
+            if self.path:
+                # Write a sibling file and swap it in, so a crash never leaves half a file
+                tmp = f'{self.path}.tmp'
+                with open(tmp, 'w') as f:
+                    json.dump(self.fixtures, f, indent=1, sort_keys=True)
+                os.replace(tmp, self.path)
+
+    def _synthetic_search(self, query):
+        digest = hashlib.sha256(query.encode()).digest()
+        (west, south), (east, north) = SYNTHETIC_BOUNDS
+        lon = west + (east - west) * int.from_bytes(digest[:4], 'big') / 2 ** 32
+        lat = south + (north - south) * int.from_bytes(digest[4:8], 'big') / 2 ** 32
+        return [{
+            'place_id': int.from_bytes(digest[8:12], 'big'),
+            'lat': f'{lat:.7f}',
+            'lon': f'{lon:.7f}',
+            'display_name': query.title(),
+        }]
+
+    def _synthetic_reverse(self, key):
+        lon, lat = key.split(',')
+        return {
+            'lat': lat,
+            'lon': lon,
+            'display_name': f'Stand-in address at {float(lat):.3f}, {float(lon):.3f}',
+        }
+
+    def _synthetic_route(self, key):
+        points = [tuple(float(value) for value in point.split(',')) for point in key.split(';')]
+        legs, route_coords = [], [points[0]]
+
+        for start, end in zip(points, points[1:]):
+            straight = _haversine(start, end)
+            count = max(1, math.ceil(straight / SYNTHETIC_STEP))
+            coords = [
+                (start[0] + (end[0] - start[0]) * i / count, start[1] + (end[1] - start[1]) * i / count)
+                for i in range(count + 1)
+            ]
+            distance = straight * ROAD_FACTOR / count
+            steps = [
+                {
+                    'distance': distance,
+                    'duration': distance / SYNTHETIC_SPEED,
+                    'geometry': encode_polyline([a, b]),
+                    'maneuver': {'location': list(a), 'type': 'depart' if i == 0 else 'continue'},
+                    'name': '',
+                }
+                for i, (a, b) in enumerate(zip(coords, coords[1:]))
+            ]
+            steps.append({
+                'distance': 0.0,
+                'duration': 0.0,
+                'geometry': encode_polyline([end, end]),
+                'maneuver': {'location': list(end), 'type': 'arrive'},
+                'name': '',
+            })
+            legs.append({
+                'distance': straight * ROAD_FACTOR,
+                'duration': straight * ROAD_FACTOR / SYNTHETIC_SPEED,
+                'steps': steps,
+                'summary': '',
+            })
+            route_coords += coords[1:]
+
+        return {
+            'code': 'Ok',
+            'routes': [{
+                'distance': sum(leg['distance'] for leg in legs),
+                'duration': sum(leg['duration'] for leg in legs),
+                'geometry': encode_polyline(route_coords),
+                'legs': legs,
+            }],
+            'waypoints': [{'location': list(point), 'name': ''} for point in points],
+        }
+
+
+def _haversine(a, b):
+    lon1, lat1, lon2, lat2 = map(math.radians, (*a, *b))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * math.asin(math.sqrt(h))
+
+
+class StandInAdapter(BaseAdapter):
+    """
+    requests adapter answering from a StandIn, forwarding misses when recording
+    """
+    def __init__(self, standin, forward=None):
+        super().__init__()
+        self.standin = standin
+        self.forward = forward
+
+    def send(self, request, **kwargs):
+        answer = self.standin.lookup(request.url)
+        if answer is None:
+            response = self.forward.send(request, **kwargs)
+            self.standin.save(request.url, response.status_code, response.json())
+            return response
+
+        time.sleep(self.standin.delay(request.url))
+        status, body = answer
+        response = requests.Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict({'Content-Type': 'application/json'})
+        response._content = json.dumps(body).encode()
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        return response
+
+    def close(self):
+        if self.forward is not None:
+            self.forward.close()
+
+
+class StandInTransport(httpx.AsyncBaseTransport):
+    """
+    httpx transport answering from a StandIn, forwarding misses when recording
+    """
+    def __init__(self, standin, forward=None):
+        self.standin = standin
+        self.forward = forward
+
+    async def handle_async_request(self, request):
+        answer = self.standin.lookup(request.url)
+        if answer is None:
+            response = await self.forward.handle_async_request(request)
+            await response.aread()
+            self.standin.save(request.url, response.status_code, response.json())
+            return response
+
+        await asyncio.sleep(self.standin.delay(request.url))
+        status, body = answer
+        return httpx.Response(status, json=body, request=request)
+
+    async def aclose(self):
+        if self.forward is not None:
+            await self.forward.aclose()
+
+
+_shared_standin = process_singleton(StandIn.from_settings)
+
+
+def get_standin():
+    """
+    The process-wide stand-in, or None unless settings.GEO_STANDIN enables it
+    """
+    if not get_standin_config()['ENABLED']:
+        return None
+    return _shared_standin()
@@ -1,3 +1,1484 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import io
+import json
+import os
+import ssl
+import tempfile
+import time
+from unittest import mock
 
-# Create your tests here.
+import httpx
+import requests
+
+import numpy as np
+from PyPDF2 import PdfReader
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import DatabaseError
+from django.db.models import F, QuerySet
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from accounts.models import DriverProfile
+
+from .cache import Lookup, TwoTierCache, resolve
+from .cycle import cycle_hours_used, record_duty_hours
+from .geometry import RouteGeometry, compact_route, decode_polyline, encode_polyline
+from . import geocoding, http, standin
+from .http import HostRateLimiter, PooledRequestsAdapter, UpstreamThrottled, fail_fast
+from .benchmarks import compare, percentile, run_suite
+from .hos import PICKUP, HOSState, Leg, simulate_trip
+from .jobs import MAX_ATTEMPTS, Heartbeat, claim_next_job, renew_lease, requeue_expired_jobs, run_job
+from .lookups import run_concurrently
+from .models import (
+    Trip, TripStop, HoursOfService, LogSheet, LogActivity, DutyRollup, GeoCacheEntry, PlanningJob, DashboardVersion
+)
+from .pdf import draw_activities, stream_pdf
+from .poi import FUEL_STOP_KINDS, REST_STOP_KINDS, POIIndex, PointOfInterest, load_pois
+from .projection import serialize
+from .routing import get_routing_backend, route_cache, split_legs
+from .renderers import FastJSONRenderer
+from .serializers import RouteResponseSerializer, TripSerializer
+from .singleton import process_singleton
+from .standin import StandIn, StandInAdapter, StandInTransport
+from .views import PlanningJobView, RoutePlannerView
+
+
+def make_route_data(rest_stops):
+    """
+    Planner output with a start, pickup, dropoff and the given number of rest stops
+    """
+    stop_types = ['start', 'pickup'] + ['rest'] * rest_stops + ['dropoff']
+    start = timezone.now()
+    stops = [
+        {
+            'type': stop_type,
+            'location': f'Stop {i}',
+            'coordinates': '-100.0,40.0',
+            'arrival_time': start + datetime.timedelta(hours=i),
+            'departure_time': start + datetime.timedelta(hours=i, minutes=30),
+            'duration': 0.5,
+            'activity': 'ON_DUTY',
+        }
+        for i, stop_type in enumerate(stop_types)
+    ]
+    return {
+        'total_distance': 500.0,
+        'driving_hours': 8.0,
+        'total_hours': 10.0,
+        'duty_hours': 9.0,
+        'duty_hours_by_day': {timezone.localdate(): 9.0},
+        'required_stops': len(stops) - 2,
+        'stops': stops,
+        'route_polyline': '_p~iF~ps|U_ulLnnqC_mqNvxq`@',
+        'route_leg_starts': [0, 1],
+    }
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class RoutePlannerPersistenceTests(TestCase):
+    payload = {
+        'current_location': 'Los Angeles',
+        'pickup_location': 'Denver',
+        'dropoff_location': 'Chicago',
+    }
+
+    def setUp(self):
+        self.user = User.objects.create_user('driver@example.com', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def plan(self, route_data):
+        with mock.patch.object(RoutePlannerView, '_calculate_route', return_value=route_data):
+            return self.client.post('/api/routes/plan/', self.payload, format='json')
+
+    def test_plan_query_count_is_fixed(self):
+        # get_or_create today's hours (6 with its savepoint and the two cycle
+        # lookups), then in one transaction: locking today's hours, trip,
+        # one bulk insert of stops, get_or_create log sheet (4), one bulk
+        # insert of activities, the hours update and the cycle rollup (9:
+        # its savepoint, locking the driver, get_or_create of the day with
+        # its savepoint and the previous day lookup, and the update; 20 with
+        # the transaction savepoint)
+        for rest_stops in (0, 10):
+            LogSheet.objects.all().delete()
+            HoursOfService.objects.all().delete()
+            DutyRollup.objects.all().delete()
+            with self.assertNumQueries(26):
+                response = self.plan(make_route_data(rest_stops))
+            self.assertEqual(response.status_code, 200)
+
+    def test_plan_persists_trip_log_sheet_and_activities(self):
+        route_data = make_route_data(10)
+        response = self.plan(route_data)
+
+        self.assertEqual(response.status_code, 200)
+        trip = Trip.objects.get(driver=self.user)
+        self.assertEqual(
+            list(trip.stops.order_by('id').values_list('type', 'location')),
+            [(stop['type'], stop['location']) for stop in route_data['stops']]
+        )
+        log_sheet = LogSheet.objects.get(driver=self.user)
+        self.assertEqual(log_sheet.trip, trip)
+        self.assertEqual(
+            list(LogActivity.objects.filter(log_sheet=log_sheet).order_by('id').values_list('location', flat=True)),
+            [f'Stop {i}' for i in range(13)]
+        )
+        self.assertEqual(
+            list(LogActivity.objects.filter(log_sheet=log_sheet).order_by('start_time').values_list('start_time', 'end_time')),
+            [(stop['arrival_time'], stop['departure_time']) for stop in route_data['stops']]
+        )
+        # Activities carry the sheet's driver for the log range scans
+        self.assertEqual(LogActivity.objects.filter(driver=self.user).count(), 13)
+        hours = HoursOfService.objects.get(driver=self.user)
+        self.assertEqual((hours.driving_used, hours.daily_used, hours.cycle_used), (8.0, 10.0, 9.0))
+
+    def test_stops_keep_their_dates_across_days(self):
+        route_data = make_route_data(1)
+        # An overnight before the dropoff puts it on the next day
+        dropoff = route_data['stops'][-1]
+        dropoff['arrival_time'] += datetime.timedelta(days=1)
+        dropoff['departure_time'] += datetime.timedelta(days=1)
+        self.plan(route_data)
+        trip = Trip.objects.get(driver=self.user)
+
+        self.assertEqual(
+            list(trip.stops.values_list('arrival_time', 'departure_time')),
+            [(stop['arrival_time'], stop['departure_time']) for stop in route_data['stops']]
+        )
+        stops = self.client.get(f'/api/trips/{trip.id}/').data['stops']
+        self.assertEqual(
+            [stop['arrival_time'] for stop in stops],
+            [timezone.localtime(stop['arrival_time']).strftime('%I:%M %p') for stop in route_data['stops']]
+        )
+
+    def test_hours_saved_by_a_concurrent_plan_are_kept(self):
+        view = RoutePlannerView()
+        stale_hours = view._get_current_hours(self.user)
+
+        # Another plan for the driver saves while this one is still routing
+        self.plan(make_route_data(1))
+        view._save_plan(self.user, stale_hours, 'Denver', 'Chicago', make_route_data(1))
+
+        hours = HoursOfService.objects.get(driver=self.user)
+        self.assertEqual((hours.driving_used, hours.daily_used, hours.cycle_used), (16.0, 20.0, 18.0))
+        self.assertEqual((stale_hours.driving_used, stale_hours.daily_used), (16.0, 20.0))
+        self.assertEqual(LogSheet.objects.get(driver=self.user).cycle_hours, 18.0)
+
+    def test_stored_route_is_served_without_routing(self):
+        self.plan(make_route_data(1))
+        trip = Trip.objects.get(driver=self.user)
+
+        with mock.patch('api.views.get_route', side_effect=AssertionError('OSRM called')):
+            response = self.client.get(f'/api/trips/{trip.id}/route/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['polyline'], '_p~iF~ps|U_ulLnnqC_mqNvxq`@')
+        self.assertEqual(response.data['leg_starts'], [0, 1])
+
+        other = User.objects.create_user('other@example.com', password='secret')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(f'/api/trips/{trip.id}/route/').status_code, 404)
+
+    def test_second_plan_adds_to_todays_log_sheet(self):
+        self.plan(make_route_data(1))
+        self.plan(make_route_data(1))
+
+        log_sheet = LogSheet.objects.get(driver=self.user)
+        self.assertEqual(log_sheet.hours_logged, 20.0)
+        self.assertEqual(log_sheet.activities.count(), 8)
+        self.assertEqual(Trip.objects.filter(driver=self.user).count(), 2)
+
+
+STANDIN_SETTINGS = {'ENABLED': True, 'FIXTURES': None, 'LATENCY': {'route': 0, 'search': 0, 'reverse': 0}}
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, GEO_STANDIN=STANDIN_SETTINGS)
+class BatchRoutePlannerTests(TestCase):
+    trip = {
+        'current_location': 'Stand-in Tulsa',
+        'pickup_location': 'Stand-in Omaha',
+        'dropoff_location': 'Stand-in Reno',
+    }
+
+    def setUp(self):
+        def reset():
+            for accessor in (http.get_session, geocoding.get_geolocator, standin._shared_standin):
+                accessor.reset()
+            for cache in TwoTierCache.registry.values():
+                cache.purge()
+        reset()
+        self.addCleanup(reset)
+
+    def plan(self, routes, username='driver@example.com'):
+        driver = User.objects.create_user(username, password='secret')
+        client = APIClient()
+        client.force_authenticate(driver)
+        response = client.post('/api/routes/plan/batch/', {'routes': routes}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        return driver, response.data['results']
+
+    def assertHoursAdd(self, driver, routes):
+        hours = HoursOfService.objects.get(driver=driver)
+        self.assertAlmostEqual(hours.driving_used, sum(route['driving_hours'] for route in routes))
+        self.assertAlmostEqual(hours.daily_used, sum(route['total_hours'] for route in routes))
+
+    def test_each_item_starts_from_the_hours_left_by_the_ones_before(self):
+        driver, results = self.plan([self.trip, self.trip])
+
+        self.assertEqual([result['status'] for result in results], ['ok', 'ok'])
+        first, second = (result['route'] for result in results)
+        # Same trip, but the second starts with the first's hours used up
+        self.assertGreater(second['total_hours'], first['total_hours'])
+        self.assertHoursAdd(driver, [first, second])
+        self.assertEqual(Trip.objects.filter(driver=driver).count(), 2)
+
+    def test_failed_geocode_only_fails_its_item(self):
+        synthetic_search = StandIn._synthetic_search
+
+        def search(stand_in, query):
+            return [] if 'nowhere' in query else synthetic_search(stand_in, query)
+
+        with mock.patch.object(StandIn, '_synthetic_search', search):
+            driver, results = self.plan([self.trip, {**self.trip, 'pickup_location': 'Nowhere'}, self.trip])
+
+        self.assertEqual([result['status'] for result in results], ['ok', 'error', 'ok'])
+        self.assertIn('Nowhere', results[1]['errors'])
+        self.assertHoursAdd(driver, [results[0]['route'], results[2]['route']])
+
+    def test_failed_save_does_not_leak_hours_into_later_items(self):
+        _, expected = self.plan([self.trip, self.trip], username='reference@example.com')
+
+        # The second item's save fails part way through
+        bulk_create = LogActivity.objects.bulk_create
+        saves = iter([bulk_create, mock.Mock(side_effect=DatabaseError('disk full')), bulk_create])
+        with mock.patch.object(LogActivity.objects, 'bulk_create', lambda *args, **kwargs: next(saves)(*args, **kwargs)):
+            driver, results = self.plan([self.trip, self.trip, self.trip])
+
+        self.assertEqual([result['status'] for result in results], ['ok', 'error', 'ok'])
+        self.assertEqual(results[1]['errors'], 'disk full')
+        # The third item is planned again from the first item's hours alone
+        self.assertEqual(results[2]['route']['total_hours'], expected[1]['route']['total_hours'])
+        self.assertHoursAdd(driver, [results[0]['route'], results[2]['route']])
+        self.assertEqual(Trip.objects.filter(driver=driver).count(), 2)
+        self.assertEqual(LogSheet.objects.get(driver=driver).hours_logged,
+                         results[0]['route']['total_hours'] + results[2]['route']['total_hours'])
+
+    def test_batches_are_capped_at_a_hundred_items(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('driver@example.com', password='secret'))
+
+        response = client.post('/api/routes/plan/batch/', {'routes': [self.trip] * 101}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('routes', response.data)
+        self.assertFalse(Trip.objects.exists())
+
+    def test_throttled_upstream_fails_the_batch_fast(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('driver@example.com', password='secret'))
+
+        throttled = UpstreamThrottled('nominatim.openstreetmap.org', 3.2)
+        with mock.patch.object(StandIn, '_synthetic_search', side_effect=throttled):
+            response = client.post('/api/routes/plan/batch/', {'routes': [self.trip] * 2}, format='json')
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '4')
+        self.assertIn('nominatim.openstreetmap.org', response.data['error'])
+        self.assertFalse(Trip.objects.exists())
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, GEO_STANDIN=STANDIN_SETTINGS)
+class PlanningJobTests(TestCase):
+    trip = BatchRoutePlannerTests.trip
+
+    def setUp(self):
+        self.user = User.objects.create_user('driver@example.com', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for accessor in (http.get_session, geocoding.get_geolocator, standin._shared_standin):
+            accessor.reset()
+            self.addCleanup(accessor.reset)
+
+    def enqueue(self):
+        response = self.client.post('/api/routes/plan/?async=true', self.trip, format='json')
+        self.assertEqual(response.status_code, 202)
+        return PlanningJob.objects.get(id=response.data['job_id'])
+
+    def expire(self, job):
+        PlanningJob.objects.filter(id=job.id).update(lease_expires_at=timezone.now() - datetime.timedelta(seconds=1))
+
+    def test_jobs_are_claimed_once_oldest_first(self):
+        first, second = self.enqueue(), self.enqueue()
+
+        claimed = claim_next_job(lease=30)
+        self.assertEqual(claimed.id, first.id)
+        self.assertEqual((claimed.status, claimed.attempts), ('RUNNING', 1))
+        self.assertAlmostEqual(
+            (claimed.lease_expires_at - claimed.started_at).total_seconds(), 30
+        )
+        self.assertEqual(claim_next_job().id, second.id)
+        self.assertIsNone(claim_next_job())
+
+    def test_claimed_job_is_planned_and_polled(self):
+        self.enqueue()
+        job = run_job(claim_next_job())
+
+        self.assertEqual(job.status, 'DONE')
+        self.assertEqual(Trip.objects.get(driver=self.user), job.trip)
+        response = self.client.get(f'/api/routes/plan/jobs/{job.id}/')
+        self.assertEqual(response.data['status'], 'DONE')
+        self.assertEqual(response.data['result']['total_distance'], job.result['total_distance'])
+
+    def test_failed_plan_is_recorded_on_the_job(self):
+        self.enqueue()
+        with mock.patch.object(RoutePlannerView, '_calculate_route', side_effect=ValueError('Geocoding error: boom')), \
+                self.assertLogs('api.jobs', 'ERROR'):
+            job = run_job(claim_next_job())
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), ('FAILED', 'Geocoding error: boom'))
+        self.assertFalse(Trip.objects.exists())
+
+    def test_only_expired_leases_are_requeued(self):
+        self.enqueue(), self.enqueue()
+        expired, running = claim_next_job(), claim_next_job()
+        self.expire(expired)
+
+        self.assertEqual(requeue_expired_jobs(), 1)
+        self.assertEqual(PlanningJob.objects.get(id=expired.id).status, 'QUEUED')
+        self.assertEqual(PlanningJob.objects.get(id=running.id).status, 'RUNNING')
+
+    def test_job_is_failed_after_its_last_attempt(self):
+        self.enqueue()
+        for _ in range(MAX_ATTEMPTS):
+            job = claim_next_job()
+            self.expire(job)
+            requeue_expired_jobs()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'FAILED')
+        self.assertIsNone(claim_next_job())
+
+    def test_worker_whose_job_was_handed_on_saves_nothing(self):
+        self.enqueue()
+        stale = claim_next_job()
+        self.expire(stale)
+        requeue_expired_jobs()
+        current = claim_next_job()
+
+        with self.assertLogs('api.jobs', 'WARNING'):
+            run_job(stale)
+
+        self.assertFalse(Trip.objects.exists())
+        self.assertEqual(PlanningJob.objects.get(id=current.id).status, 'RUNNING')
+        self.assertEqual(run_job(current).status, 'DONE')
+        self.assertEqual(Trip.objects.count(), 1)
+
+    def test_lease_is_renewed_until_the_job_is_handed_on(self):
+        self.enqueue()
+        job = claim_next_job()
+        self.expire(job)
+
+        self.assertTrue(renew_lease(job, lease=30))
+        job.refresh_from_db()
+        self.assertGreater(job.lease_expires_at, timezone.now() + datetime.timedelta(seconds=25))
+
+        PlanningJob.objects.filter(id=job.id).update(attempts=2)
+        self.assertFalse(renew_lease(job))
+
+    def test_heartbeat_renews_while_the_job_runs(self):
+        job = PlanningJob(id=1)
+        with mock.patch('api.jobs.renew_lease', return_value=True) as renew:
+            heartbeat = Heartbeat(job, lease=0.3)
+            heartbeat.start()
+            time.sleep(0.25)
+            heartbeat.stop()
+
+        renew.assert_called_with(job, 0.3)
+        self.assertFalse(heartbeat.is_alive())
+
+    def test_wait_is_capped(self):
+        job = self.enqueue()
+
+        started = time.monotonic()
+        response = self.client.get(f'/api/routes/plan/jobs/{job.id}/', {'wait': 25})
+
+        self.assertEqual(response.data['status'], 'QUEUED')
+        self.assertLess(time.monotonic() - started, PlanningJobView.max_wait + 1)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, GEO_STANDIN=STANDIN_SETTINGS)
+class AsyncViewTests(TestCase):
+    trip = BatchRoutePlannerTests.trip
+
+    def setUp(self):
+        self.user = User.objects.create_user('driver@example.com', password='secret')
+        self.token = Token.objects.create(user=self.user)
+        for accessor in (http.get_session, geocoding.get_geolocator, standin._shared_standin):
+            accessor.reset()
+            self.addCleanup(accessor.reset)
+        for cache in TwoTierCache.registry.values():
+            cache.purge()
+
+    def plan(self, data, token=None):
+        return self.async_client.post(
+            '/api/async/routes/plan/', data, content_type='application/json',
+            headers={'Authorization': f'Token {token or self.token.key}'}
+        )
+
+    async def test_requests_need_a_valid_token_of_an_active_user(self):
+        response = await self.async_client.post('/api/async/routes/plan/', self.trip, content_type='application/json')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual((await self.plan(self.trip, token='not-a-token')).status_code, 401)
+
+        self.user.is_active = False
+        await self.user.asave(update_fields=['is_active'])
+        self.assertEqual((await self.plan(self.trip)).status_code, 401)
+
+    async def test_plan_is_returned_and_saved(self):
+        response = await self.plan(self.trip)
+
+        self.assertEqual(response.status_code, 200, response.content)
+        route = response.json()
+        self.assertEqual(route['stops'][0]['type'], 'start')
+        self.assertEqual(route['stops'][-1]['type'], 'dropoff')
+        trip = await Trip.objects.aget(driver=self.user)
+        self.assertEqual(trip.distance, route['total_distance'])
+        self.assertTrue(await LogSheet.objects.filter(driver=self.user).aexists())
+
+    async def test_geocoding_error_is_a_bad_request(self):
+        with mock.patch.object(StandIn, '_synthetic_search', return_value=[]):
+            response = await self.plan(self.trip)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Geocoding error: Could not geocode location', response.json()['error'])
+        self.assertFalse(await Trip.objects.filter(driver=self.user).aexists())
+
+    async def test_throttled_upstream_is_service_unavailable(self):
+        throttled = UpstreamThrottled('nominatim.openstreetmap.org', 3.2)
+        with mock.patch.object(StandIn, '_synthetic_search', side_effect=throttled):
+            response = await self.plan(self.trip)
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '4')
+        self.assertFalse(await Trip.objects.filter(driver=self.user).aexists())
+
+    async def test_reverse_geocode(self):
+        response = await self.async_client.get(
+            '/api/async/geocode/reverse/', {'lat': 40.0, 'lng': -100.0},
+            headers={'Authorization': f'Token {self.token.key}'}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('40.000, -100.000', response.json()['formatted_address'])
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class DriverLogPDFTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('driver@example.com', password='secret')
+        DriverProfile.objects.create(user=self.user, driver_license='TX-1234', phone_number='555-0100')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        caches['pdf'].clear()
+
+        self.today = datetime.date.today()
+        trip = Trip.objects.create(
+            driver=self.user, pickup_location='Denver, CO', dropoff_location='Chicago, IL',
+            distance=1003.5, estimated_hours=20.0
+        )
+        HoursOfService.objects.create(driver=self.user, date=self.today, driving_used=6.0, daily_used=8.0)
+        for days in (1, 0):
+            date = self.today - datetime.timedelta(days=days)
+            sheet = LogSheet.objects.create(driver=self.user, trip=trip, date=date, hours_logged=8.0, cycle_hours=8.0)
+            morning = timezone.make_aware(datetime.datetime.combine(date, datetime.time(6)))
+            LogActivity.objects.create(
+                log_sheet=sheet, driver=self.user, activity_type='ON_DUTY', location='Denver, CO', description='pickup',
+                start_time=morning, end_time=morning + datetime.timedelta(hours=1)
+            )
+
+    def pdf(self, response):
+        content = b''.join(response.streaming_content) if response.streaming else response.content
+        return PdfReader(io.BytesIO(content), strict=True)
+
+    def test_matching_etag_is_not_modified(self):
+        for url in ('/api/driver-logs/pdf/', '/api/driver-logs/pdf/template/'):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(self.pdf(response).pages), 1)
+
+                cached = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(cached.status_code, 304)
+                self.assertEqual(cached.content, b'')
+
+    def test_etag_changes_when_an_activity_is_edited(self):
+        etag = self.client.get('/api/driver-logs/pdf/')['ETag']
+
+        activity = LogActivity.objects.get(log_sheet__date=self.today)
+        activity.end_time += datetime.timedelta(minutes=30)
+        activity.save()
+
+        response = self.client.get('/api/driver-logs/pdf/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_range_is_streamed_one_page_per_day(self):
+        start = self.today - datetime.timedelta(days=1)
+        response = self.client.get('/api/driver-logs/pdf/', {'start': start.isoformat(), 'end': self.today.isoformat()})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        pages = self.pdf(response).pages
+        self.assertEqual(len(pages), 2)
+        self.assertIn(start.strftime('%m/%d/%Y'), pages[0].extract_text())
+        self.assertIn(self.today.strftime('%m/%d/%Y'), pages[1].extract_text())
+
+        etag = response['ETag']
+        response = self.client.get(
+            '/api/driver-logs/pdf/', {'start': start.isoformat(), 'end': self.today.isoformat()},
+            HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_range_pages_show_activities_running_past_their_sheet(self):
+        # Planned today, driven through the night into tomorrow
+        evening = timezone.make_aware(datetime.datetime.combine(self.today, datetime.time(22)))
+        overnight = LogActivity.objects.create(
+            log_sheet=LogSheet.objects.get(date=self.today), driver=self.user, activity_type='Driving', location=None,
+            description='drive', start_time=evening, end_time=evening + datetime.timedelta(hours=10)
+        )
+        start, end = self.today - datetime.timedelta(days=2), self.today + datetime.timedelta(days=1)
+
+        with mock.patch('api.pdf.draw_activities', wraps=draw_activities) as draw:
+            response = self.client.get('/api/driver-logs/pdf/', {'start': start.isoformat(), 'end': end.isoformat()})
+            pages = self.pdf(response).pages
+
+        # A page for every day, with or without a sheet
+        self.assertEqual(len(pages), 4)
+        drawn = {call.args[2]: list(call.args[1]) for call in draw.call_args_list}
+        self.assertEqual(drawn[start], [])
+        self.assertIn(overnight, drawn[self.today])
+        self.assertEqual(drawn[end], [overnight])
+        self.assertNotIn('From:', pages[0].extract_text())
+        self.assertIn('From: Denver, CO', pages[3].extract_text())
+
+    def test_streamed_pages_keep_every_resource(self):
+        def draw(c):
+            c.setFont('Courier', 8)
+            c.drawString(100, 700, 'Translucent box')
+            c.setFillAlpha(0.5)
+            c.rect(100, 600, 50, 50, fill=1)
+
+        reader = PdfReader(io.BytesIO(b''.join(stream_pdf([draw, draw]))), strict=True)
+
+        for page in reader.pages:
+            resources = page['/Resources']
+            self.assertEqual(resources['/ExtGState'].get_object()['/gRLs0']['/ca'], 0.5)
+            self.assertIn('Translucent box', page.extract_text())
+        # Both pages share one copy of the font
+        self.assertEqual(
+            reader.pages[0]['/Resources'].raw_get('/Font'), reader.pages[1]['/Resources'].raw_get('/Font')
+        )
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class TripPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('driver@example.com', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        Trip.objects.bulk_create(
+            Trip(driver=self.user, pickup_location=f'Pickup {i}', dropoff_location='Dropoff',
+                 distance=100.0, estimated_hours=2.0)
+            for i in range(25)
+        )
+
+    def test_pages_cover_every_trip_once_newest_first(self):
+        # bulk_create gives every trip the same created_at, so order falls back to id
+        url, ids = '/api/trips/all/?page_size=10', []
+        while url:
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 10)
+            ids += [trip['id'] for trip in response.data['results']]
+            url = response.data['next']
+
+        self.assertEqual(ids, list(Trip.objects.order_by('-id').values_list('id', flat=True)))
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get('/api/trips/all/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class FastJSONTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('driver@example.com', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        start = timezone.now()
+        Trip.objects.bulk_create(
+            Trip(driver=self.user, pickup_location=location, dropoff_location='Dropoff',
+                 distance=distance, estimated_hours=2.5, start_time=start if i % 2 else None)
+            for i, (location, distance) in enumerate([
+                ('Denver', 100.0), ('Zürich', 1 / 3), ('Line\u2028break', 1e-7),
+                ('"Quoted" \\ path', 1e16), ('Tab\there', 0.0),
+            ])
+        )
+
+    def render_both(self, serializer_class, instance=None, queryset=None, many=False):
+        with override_settings(FAST_JSON=False):
+            stock = JSONRenderer().render(serialize(serializer_class, instance, queryset, many))
+        with override_settings(FAST_JSON=True):
+            fast = FastJSONRenderer().render(serialize(serializer_class, instance, queryset, many))
+        return stock, fast
+
+    def test_trip_list_bytes_match_stock_rendering(self):
+        trips = Trip.objects.order_by('id')
+        for tz in ('UTC', 'America/Chicago'):
+            with timezone.override(tz):
+                stock, fast = self.render_both(TripSerializer, queryset=trips, many=True)
+            self.assertEqual(fast, stock)
+
+    def test_plan_response_bytes_match_stock_rendering(self):
+        stock, fast = self.render_both(RouteResponseSerializer, make_route_data(3))
+        self.assertEqual(fast, stock)
+
+    def test_trip_listing_is_the_same_with_fast_json_off(self):
+        responses = {}
+        for fast_json in (False, True):
+            with override_settings(FAST_JSON=fast_json):
+                url, pages = '/api/trips/all/?page_size=2', []
+                while url:
+                    response = self.client.get(url)
+                    pages.append(response.content)
+                    url = response.data['next']
+                responses[fast_json] = pages
+        self.assertEqual(len(responses[True]), 3)
+        self.assertEqual(responses[True], responses[False])
+
+    def test_non_finite_floats_are_refused_like_stock_rendering(self):
+        for value in (float('nan'), float('inf'), -float('inf')):
+            data = [{'distance': 1.0, 'start_time': None}, {'distance': value}]
+            with self.assertRaisesMessage(ValueError, 'Out of range float values are not JSON compliant'):
+                JSONRenderer().render(data)
+            with self.assertRaisesMessage(ValueError, 'Out of range float values are not JSON compliant'):
+                FastJSONRenderer().render(data)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class TripDetailTests(TestCase):
+    trips = 1000
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('driver@example.com', password='secret')
+        Trip.objects.bulk_create(
+            Trip(driver=cls.user, pickup_location=f'Pickup {i}', dropoff_location='Dropoff',
+                 distance=100.0, estimated_hours=2.0)
+            for i in range(cls.trips)
+        )
+        trips = list(Trip.objects.order_by('id'))
+        start = timezone.now()
+        TripStop.objects.bulk_create(
+            TripStop(trip=trip, type=stop_type, location=stop_type, arrival_time=start,
+                     departure_time=start + datetime.timedelta(hours=1), duration=1.0, coordinates='-100.0,40.0')
+            for trip in trips for stop_type in ('start', 'pickup', 'dropoff')
+        )
+        first_day = datetime.date(2020, 1, 1)
+        LogSheet.objects.bulk_create(
+            LogSheet(driver=cls.user, trip=trip, date=first_day + datetime.timedelta(days=i),
+                     hours_logged=2.0, cycle_hours=2.0)
+            for i, trip in enumerate(trips)
+        )
+        LogActivity.objects.bulk_create(
+            LogActivity(log_sheet=log_sheet, driver=cls.user, activity_type='Driving', description='drive',
+                        start_time=start, end_time=start + datetime.timedelta(hours=1))
+            for log_sheet in LogSheet.objects.all() for _ in range(2)
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_detail_list_query_count_does_not_grow_with_trips(self):
+        # Trips, stops, log sheets and activities, whatever the page size
+        for page_size in (1, 200):
+            with self.assertNumQueries(4):
+                response = self.client.get(f'/api/trips/details/?page_size={page_size}')
+            self.assertEqual(len(response.data['results']), page_size)
+
+        trip = response.data['results'][0]
+        self.assertEqual([stop['type'] for stop in trip['stops']], ['start', 'pickup', 'dropoff'])
+        self.assertEqual(len(trip['log_sheets'][0]['activities']), 2)
+
+    def test_walking_all_trips_costs_four_queries_per_page(self):
+        url, seen = '/api/trips/details/?page_size=200', 0
+        with self.assertNumQueries(4 * (self.trips // 200)):
+            while url:
+                response = self.client.get(url)
+                seen += len(response.data['results'])
+                url = response.data['next']
+        self.assertEqual(seen, self.trips)
+
+    def test_detail(self):
+        trip = Trip.objects.order_by('id').first()
+        with self.assertNumQueries(4):
+            response = self.client.get(f'/api/trips/{trip.id}/')
+        self.assertEqual(response.data['log_sheets'][0]['trip_description'], 'Pickup 0 to Dropoff')
+        self.assertEqual(self.client.get('/api/trips/999999/').status_code, 404)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class DashboardCacheTests(TestCase):
+    def setUp(self):
+        caches['dashboard'].clear()
+        self.user = User.objects.create_user('driver@example.com', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_unchanged_data_is_served_with_only_the_version_read(self):
+        for url in ('/api/hours-of-service/current/', '/api/trips/recent/'):
+            first = self.client.get(url)
+            self.assertEqual(first.status_code, 200)
+
+            with self.assertNumQueries(2):
+                again = self.client.get(url)
+                not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+            self.assertEqual(again.data, first.data)
+            self.assertEqual(not_modified.status_code, 304)
+
+    def test_plan_invalidates_dashboard(self):
+        etag = self.client.get('/api/trips/recent/')['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with mock.patch.object(RoutePlannerView, '_calculate_route', return_value=make_route_data(1)):
+                self.client.post('/api/routes/plan/', RoutePlannerPersistenceTests.payload, format='json')
+
+        response = self.client.get('/api/trips/recent/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(self.client.get('/api/hours-of-service/current/').data['driving_used'], 8.0)
+
+    def test_bump_from_another_process_is_seen(self):
+        first = self.client.get('/api/trips/recent/')
+        Trip.objects.create(
+            driver=self.user, pickup_location='Denver, CO', dropoff_location='Chicago, IL',
+            distance=1003.5, estimated_hours=20.0
+        )
+
+        # Another process's cache never saw this response, only the database row is shared
+        DashboardVersion.objects.filter(driver=self.user).update(version=F('version') + 1)
+
+        response = self.client.get('/api/trips/recent/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+
+    def test_activity_save_bumps_without_looking_up_its_sheet(self):
+        sheet = LogSheet.objects.create(driver=self.user, date=timezone.localdate(), hours_logged=1.0, cycle_hours=1.0)
+        etag = self.client.get('/api/trips/recent/')['ETag']
+        now = timezone.now()
+
+        # The insert and the bump
+        with self.assertNumQueries(2), self.captureOnCommitCallbacks(execute=True):
+            LogActivity.objects.create(
+                log_sheet=sheet, driver=self.user, activity_type='ON_DUTY', location='Denver, CO', description='pickup',
+                start_time=now, end_time=now + datetime.timedelta(hours=1)
+            )
+        self.assertEqual(self.client.get('/api/trips/recent/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class CycleRollupTests(TestCase):
+    def setUp(self):
+        caches['dashboard'].clear()
+        self.user = User.objects.create_user('driver@example.com', password='secret')
+        self.today = datetime.date.today()
+
+    def days_ago(self, days):
+        return self.today - datetime.timedelta(days=days)
+
+    def test_window_covers_the_last_eight_days(self):
+        for days in (10, 8, 7, 3, 0):
+            record_duty_hours(self.user, self.days_ago(days), 10.0)
+
+        # Days 7, 3 and 0 are inside the window ending today
+        with self.assertNumQueries(2):
+            self.assertEqual(cycle_hours_used(self.user, self.today), 30.0)
+        self.assertEqual(cycle_hours_used(self.user, self.days_ago(1)), 30.0)
+        self.assertEqual(cycle_hours_used(self.user, self.days_ago(20)), 0.0)
+
+    def test_backdated_hours_update_later_totals(self):
+        record_duty_hours(self.user, self.today, 5.0)
+        record_duty_hours(self.user, self.days_ago(2), 4.0)
+        record_duty_hours(self.user, self.days_ago(2), 1.0)
+
+        self.assertEqual(cycle_hours_used(self.user, self.today), 10.0)
+        self.assertEqual(
+            list(DutyRollup.objects.order_by('date').values_list('duty_hours', 'cumulative_hours')),
+            [(5.0, 5.0), (5.0, 10.0)]
+        )
+
+    def test_day_created_by_a_concurrent_plan_is_reused(self):
+        record_duty_hours(self.user, self.days_ago(1), 4.0)
+        get = QuerySet.get
+
+        def get_before_another_plan_inserts(queryset, *args, **kwargs):
+            # Another plan inserts the day's row just after our lookup misses it
+            if queryset.model is DutyRollup and not DutyRollup.objects.filter(date=self.today).exists():
+                DutyRollup.objects.create(driver=self.user, date=self.today, cumulative_hours=4.0)
+                raise DutyRollup.DoesNotExist
+            return get(queryset, *args, **kwargs)
+
+        with mock.patch.object(QuerySet, 'get', get_before_another_plan_inserts):
+            record_duty_hours(self.user, self.today, 6.0)
+
+        self.assertEqual(
+            list(DutyRollup.objects.order_by('date').values_list('duty_hours', 'cumulative_hours')),
+            [(4.0, 4.0), (6.0, 10.0)]
+        )
+
+    @override_settings(SECURE_SSL_REDIRECT=False)
+    def test_new_day_starts_with_the_previous_days_cycle_hours(self):
+        record_duty_hours(self.user, self.days_ago(1), 12.0)
+        record_duty_hours(self.user, self.days_ago(9), 12.0)
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        response = client.get('/api/hours-of-service/current/')
+
+        self.assertEqual(response.data['cycle_used'], 12.0)
+        self.assertEqual(response.data['daily_used'], 0.0)
+
+    def test_multi_day_plan_counts_hours_on_each_day(self):
+        route_data = make_route_data(1)
+        route_data['duty_hours_by_day'] = {self.today: 5.0, self.today + datetime.timedelta(days=1): 4.0}
+        view = RoutePlannerView()
+
+        view._save_plan(self.user, view._get_current_hours(self.user), 'Denver', 'Chicago', route_data)
+
+        self.assertEqual(cycle_hours_used(self.user, self.today), 5.0)
+        self.assertEqual(cycle_hours_used(self.user, self.today + datetime.timedelta(days=1)), 9.0)
+
+
+class CycleSimulationTests(TestCase):
+    legs = [Leg(300, 5.0), Leg(1200, 20.0)]
+    start = datetime.datetime(2024, 1, 1, 6, 0)
+
+    def test_fresh_cycle_needs_no_restart(self):
+        timeline = simulate_trip(self.legs, HOSState(), self.start)
+        self.assertNotIn('restart', [event.type for event in timeline.events])
+
+    def test_restart_when_the_cycle_runs_out_on_the_way(self):
+        timeline = simulate_trip(self.legs, HOSState(cycle_used=50.0), self.start)
+        restarts = [event for event in timeline.events if event.type == 'restart']
+
+        self.assertEqual(len(restarts), 1)
+        self.assertEqual(restarts[0].leg, 1)
+        self.assertEqual(restarts[0].duration, 34.0)
+
+    def test_restart_before_setting_off_when_the_cycle_is_spent(self):
+        timeline = simulate_trip(self.legs, HOSState(cycle_used=68.0), self.start)
+        self.assertEqual([event.type for event in timeline.events[:2]], ['start', 'restart'])
+
+
+class SimulateTripTests(TestCase):
+    start = datetime.datetime(2024, 1, 1, 6, 0)
+
+    def types(self, timeline):
+        return [event.type for event in timeline.events]
+
+    def test_break_after_eight_hours_on_the_way_to_pickup(self):
+        timeline = simulate_trip([Leg(540, 9.0), Leg(60, 1.0)], HOSState(), self.start)
+
+        self.assertEqual(self.types(timeline), ['start', 'rest', 'pickup', 'dropoff'])
+        rest = timeline.events[1]
+        self.assertEqual((rest.leg, rest.offset, rest.duration), (0, 8.0, 0.5))
+        self.assertAlmostEqual(rest.ratio, 8 / 9)
+        self.assertEqual(rest.start, self.start + datetime.timedelta(hours=8))
+
+    def test_break_after_eight_hours_en_route(self):
+        timeline = simulate_trip([Leg(60, 1.0), Leg(600, 10.0)], HOSState(), self.start)
+
+        self.assertEqual(self.types(timeline), ['start', 'pickup', 'rest', 'dropoff'])
+        rest = timeline.events[2]
+        self.assertEqual((rest.leg, rest.offset), (1, 9.0))
+        self.assertAlmostEqual(rest.ratio, 0.7)
+        self.assertEqual(timeline.total_hours, 13.5)
+
+    def test_overnight_at_pickup_when_the_duty_window_is_used_up(self):
+        timeline = simulate_trip([Leg(180, 3.0), Leg(60, 1.0)], HOSState(driving_used=2.0, duty_used=11.0), self.start)
+
+        self.assertEqual(self.types(timeline), ['start', 'pickup', 'overnight', 'dropoff'])
+        overnight = timeline.events[2]
+        self.assertEqual((overnight.waypoint, overnight.activity, overnight.offset), (PICKUP, 'SLEEPER', 4.0))
+        self.assertEqual(overnight.duration, 10.0)
+
+    def test_overnight_en_route(self):
+        timeline = simulate_trip([Leg(60, 1.0), Leg(900, 15.0)], HOSState(), self.start)
+
+        self.assertEqual(self.types(timeline), ['start', 'pickup', 'rest', 'overnight', 'dropoff'])
+        overnight = timeline.events[3]
+        self.assertEqual((overnight.leg, overnight.offset), (1, 9.5))
+        self.assertAlmostEqual(overnight.ratio, 7 / 15)
+        self.assertEqual(timeline.events[-1].offset, 27.5)
+
+    def test_duty_hours_are_split_by_calendar_day(self):
+        overnight = simulate_trip([Leg(60, 1.0), Leg(900, 15.0)], HOSState(), self.start)
+        evening = simulate_trip([Leg(60, 1.0), Leg(300, 5.0)], HOSState(), datetime.datetime(2024, 1, 1, 20, 0))
+
+        # Pickup, drive and break before the overnight; the rest of the drive and dropoff after it
+        self.assertEqual(overnight.duty_hours_by_day(), {
+            datetime.date(2024, 1, 1): 9.5, datetime.date(2024, 1, 2): 9.0
+        })
+        # The drive from pickup runs past midnight
+        self.assertEqual(evening.duty_hours_by_day(), {
+            datetime.date(2024, 1, 1): 4.0, datetime.date(2024, 1, 2): 4.0
+        })
+        self.assertEqual(sum(evening.duty_hours_by_day().values()), evening.duty_hours)
+
+    def test_fuel_every_thousand_miles(self):
+        timeline = simulate_trip([Leg(100, 2.0), Leg(2400, 40.0)], HOSState(), self.start)
+        fuel = [event for event in timeline.events if event.type == 'fuel']
+
+        self.assertEqual(len(fuel), 2)
+        self.assertTrue(all(event.leg == 1 and event.duration == 0.25 for event in fuel))
+        # Each stop comes at the end of the segment crossing the next thousand miles
+        driven = [100 + 2400 * event.ratio for event in fuel]
+        self.assertTrue(1000 <= driven[0] < 1500, driven)
+        self.assertTrue(2000 <= driven[1] < 2500, driven)
+
+    def test_no_fuel_stop_under_a_thousand_miles(self):
+        timeline = simulate_trip([Leg(100, 2.0), Leg(850, 14.0)], HOSState(), self.start)
+        self.assertNotIn('fuel', self.types(timeline))
+
+    def test_exhausted_duty_window_ends_in_an_overnight(self):
+        # Pickup uses the duty window up exactly, leaving no driving segment
+        # and no break due; this used to loop forever taking breaks
+        timeline = simulate_trip([Leg(30, 1.0), Leg(300, 5.0)], HOSState(duty_used=12.0), self.start)
+
+        self.assertEqual(self.types(timeline), ['start', 'pickup', 'overnight', 'dropoff'])
+        self.assertEqual(timeline.events[2].leg, 1)
+        self.assertEqual(timeline.events[2].ratio, 0)
+
+    def test_break_then_overnight_when_both_limits_are_reached(self):
+        timeline = simulate_trip(
+            [Leg(30, 0.5), Leg(300, 5.0)], HOSState(driving_used=7.5, duty_used=12.5), self.start
+        )
+        self.assertEqual(self.types(timeline), ['start', 'pickup', 'rest', 'overnight', 'dropoff'])
+
+
+class RouteGeometryTests(TestCase):
+    # The example from Google's encoded polyline documentation
+    reference = '_p~iF~ps|U_ulLnnqC_mqNvxq`@'
+    reference_points = [[-120.2, 38.5], [-120.95, 40.7], [-126.453, 43.252]]
+
+    def test_decodes_the_reference_polyline(self):
+        np.testing.assert_allclose(decode_polyline(self.reference), self.reference_points)
+        self.assertEqual(decode_polyline('').shape, (0, 2))
+
+    def test_encoding_round_trips(self):
+        self.assertEqual(encode_polyline(decode_polyline(self.reference)), self.reference)
+
+        rng = np.random.default_rng(7)
+        coords = np.round(np.column_stack((rng.uniform(-180, 180, 500), rng.uniform(-90, 90, 500))), 5)
+        np.testing.assert_allclose(decode_polyline(encode_polyline(coords)), coords, atol=1e-9)
+
+    def test_from_route_joins_steps_and_falls_back_to_maneuvers(self):
+        route = {'legs': [
+            {'steps': [
+                {'geometry': encode_polyline([[-100.0, 40.0], [-100.0, 40.5]])},
+                {'geometry': encode_polyline([[-100.0, 40.5], [-100.0, 41.0]])},
+            ]},
+            {'steps': [{'geometry': '', 'maneuver': {'location': [-100.0, 41.5]}}]},
+        ]}
+
+        geometry = RouteGeometry.from_route(route)
+
+        np.testing.assert_allclose(geometry.coords, [[-100.0, 40.0], [-100.0, 40.5], [-100.0, 41.0], [-100.0, 41.5]])
+        self.assertEqual(len(RouteGeometry.from_route({'legs': []})), 0)
+
+    def test_point_at_ends_and_between_vertices(self):
+        # Along a meridian distance is proportional to latitude
+        geometry = RouteGeometry([[0.0, 0.0], [0.0, 1.0], [0.0, 3.0]])
+
+        self.assertEqual(geometry.point_at(0), (0.0, 0.0))
+        self.assertEqual(geometry.point_at(1), (0.0, 3.0))
+        np.testing.assert_allclose(geometry.point_at(0.5), (0.0, 1.5))
+        np.testing.assert_allclose(geometry.point_at(0.25), (0.0, 0.75))
+        # Ratios outside 0-1 are clamped
+        self.assertEqual(geometry.point_at(-1), (0.0, 0.0))
+        self.assertEqual(geometry.point_at(2), (0.0, 3.0))
+
+    def test_point_at_skips_zero_length_segments(self):
+        geometry = RouteGeometry([[0.0, 0.0], [0.0, 0.0], [0.0, 1.0], [0.0, 1.0], [0.0, 2.0]])
+
+        self.assertEqual(geometry.point_at(0), (0.0, 0.0))
+        np.testing.assert_allclose(geometry.point_at(0.25), (0.0, 0.5))
+        # Exactly on the repeated vertex, where searchsorted ties
+        np.testing.assert_allclose(geometry.point_at(0.5), (0.0, 1.0))
+        np.testing.assert_allclose(geometry.point_at(0.75), (0.0, 1.5))
+        self.assertEqual(geometry.point_at(1), (0.0, 2.0))
+
+    def test_single_point_and_empty_geometries(self):
+        single = RouteGeometry([[-100.0, 40.0]])
+
+        self.assertEqual(single.total_distance, 0.0)
+        self.assertEqual(single.point_at(0.3), (-100.0, 40.0))
+        self.assertIsNone(RouteGeometry(np.empty((0, 2))).point_at(0.5))
+
+
+class OSRMRoutingTests(TestCase):
+    coords = ['-100.0,40.0', '-99.0,40.0', '-98.0,40.0']
+
+    def setUp(self):
+        route_cache.purge()
+        get_routing_backend.reset()
+        self.addCleanup(route_cache.purge)
+        self.addCleanup(get_routing_backend.reset)
+
+    def leg(self, start, end, distance, duration):
+        return {
+            'distance': distance,
+            'duration': duration,
+            'steps': [{'geometry': encode_polyline([start, end]), 'maneuver': {'location': start}}],
+        }
+
+    def test_plan_routes_through_pickup_in_one_request(self):
+        legs = [
+            self.leg([-100.0, 40.0], [-99.0, 40.0], 90000.0, 3600.0),
+            self.leg([-99.0, 40.0], [-98.0, 40.0], 100000.0, 5400.0),
+        ]
+        response = mock.Mock(status_code=200)
+        response.json.return_value = {'code': 'Ok', 'routes': [{'distance': 190000.0, 'duration': 9000.0, 'legs': legs}]}
+        session = mock.Mock()
+        session.get.return_value = response
+
+        with mock.patch('api.routing.get_session', return_value=session), \
+                mock.patch('api.views.resolve', return_value=self.coords), \
+                mock.patch.object(RoutePlannerView, '_locate_stops'):
+            route_data = RoutePlannerView()._calculate_route(
+                'Current', 'Pickup', 'Dropoff', HoursOfService(driving_used=0, daily_used=0, cycle_used=0)
+            )
+
+        session.get.assert_called_once()
+        url = session.get.call_args.args[0]
+        self.assertIn('/route/v1/driving/' + ';'.join(self.coords) + '?', url)
+        self.assertEqual(route_data['total_distance'], round(190000.0 / 1609.34, 1))
+        self.assertEqual(route_data['driving_hours'], 2.5)
+
+        to_pickup, to_dropoff = split_legs(response.json.return_value['routes'][0])
+        self.assertEqual((to_pickup['distance'], to_pickup['duration'], to_pickup['legs']), (90000.0, 3600.0, [legs[0]]))
+        self.assertEqual((to_dropoff['distance'], to_dropoff['duration'], to_dropoff['legs']), (100000.0, 5400.0, [legs[1]]))
+        np.testing.assert_allclose(RouteGeometry.from_route(to_pickup).coords, [[-100.0, 40.0], [-99.0, 40.0]])
+        np.testing.assert_allclose(RouteGeometry.from_route(to_dropoff).coords, [[-99.0, 40.0], [-98.0, 40.0]])
+
+
+class CompactRouteTests(TestCase):
+    def test_round_trip_stays_within_tolerance(self):
+        t = np.linspace(0, 1, 5000)
+        line = np.column_stack((-118 + 10 * t, 34 + 2 * t + 0.01 * np.sin(t * 200)))
+        legs = [RouteGeometry(line[:2000]), RouteGeometry(line[1999:])]
+
+        polyline, leg_starts = compact_route(legs)
+        coords = decode_polyline(polyline)
+
+        self.assertLess(len(coords), len(line) / 2)
+        self.assertEqual(leg_starts[0], 0)
+        np.testing.assert_allclose(coords[leg_starts[1]], line[1999], atol=1e-5)
+        # Cutting corners by at most 10m barely shortens the line
+        self.assertAlmostEqual(
+            RouteGeometry(coords).total_distance, RouteGeometry(line).total_distance, delta=100
+        )
+
+
+class POIIndexTests(TestCase):
+    # About 85km due east along the 40th parallel
+    geometry = RouteGeometry([[-100.0, 40.0], [-99.0, 40.0]])
+
+    def find(self, pois, kinds=REST_STOP_KINDS, ratio=0.5, **kwargs):
+        index = POIIndex([PointOfInterest(*poi) for poi in pois])
+        poi = index.find_along(self.geometry, ratio, kinds, **kwargs)
+        return poi and poi.name
+
+    def test_pois_outside_the_corridor_are_rejected(self):
+        # About 11km north of the route
+        pois = [('North', 'truck_stop', -99.5, 40.1)]
+
+        self.assertIsNone(self.find(pois))
+        self.assertEqual(self.find(pois, corridor=15000), 'North')
+
+    def test_explicit_zero_corridor_is_not_replaced_by_the_default(self):
+        # About 1km north of the route
+        pois = [('Near', 'truck_stop', -99.5, 40.01)]
+
+        self.assertEqual(self.find(pois), 'Near')
+        self.assertIsNone(self.find(pois, corridor=0))
+
+    def test_poi_closest_to_the_target_along_the_route_wins(self):
+        # About 4km and 17km from the middle of the route
+        pois = [('Far', 'truck_stop', -99.7, 40.0), ('Close', 'truck_stop', -99.45, 40.0)]
+
+        self.assertEqual(self.find(pois), 'Close')
+        self.assertEqual(self.find(pois, spacing=5000), 'Close')
+        # Neither is within 2km of the target along the route
+        self.assertIsNone(self.find(pois, window=2000, corridor=500))
+
+    def test_only_the_requested_kinds_match(self):
+        pois = [('Fuel', 'fuel', -99.5, 40.0), ('Rest area', 'rest_area', -99.4, 40.0)]
+
+        self.assertEqual(self.find(pois, REST_STOP_KINDS), 'Rest area')
+        self.assertEqual(self.find(pois, FUEL_STOP_KINDS), 'Fuel')
+        self.assertIsNone(self.find(pois, ('truck_stop',)))
+
+    def test_pois_across_a_cell_boundary_are_candidates(self):
+        geometry = RouteGeometry([[-100.5, 39.99], [-99.5, 39.99]])
+        # The route runs in the cells below latitude 40, the POIs sit just
+        # above it and just west of the -100.5 boundary
+        index = POIIndex([
+            PointOfInterest('Across', 'truck_stop', -100.0, 40.01),
+            PointOfInterest('West', 'fuel', -100.51, 39.99),
+        ])
+
+        self.assertEqual(index.find_along(geometry, 0.5, REST_STOP_KINDS).name, 'Across')
+        self.assertEqual(index.find_along(geometry, 0.0, FUEL_STOP_KINDS).name, 'West')
+
+    def test_load_csv_and_geojson(self):
+        with tempfile.TemporaryDirectory() as directory:
+            csv_path = os.path.join(directory, 'pois.csv')
+            with open(csv_path, 'w', encoding='utf-8') as f:
+                f.write('name,kind,lat,lon,address\nBig Rig Stop,Truck_Stop,40.0,-99.5,I-80 exit 1\nPumps,fuel,41.0,-98.0,\n')
+            geojson_path = os.path.join(directory, 'pois.geojson')
+            with open(geojson_path, 'w', encoding='utf-8') as f:
+                json.dump({'type': 'FeatureCollection', 'features': [
+                    {'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': [-99.5, 40.0]},
+                     'properties': {'name': 'Rest', 'kind': 'REST_AREA'}},
+                    {'type': 'Feature', 'geometry': {'type': 'LineString', 'coordinates': [[0, 0], [1, 1]]},
+                     'properties': {'name': 'Road', 'kind': 'fuel'}},
+                ]}, f)
+
+            from_csv, from_geojson = load_pois(csv_path), load_pois(geojson_path)
+
+        self.assertEqual(
+            [(poi.kind, poi.coordinates, poi.description) for poi in from_csv],
+            [('truck_stop', '-99.5,40.0', 'Big Rig Stop, I-80 exit 1'), ('fuel', '-98.0,41.0', 'Pumps')]
+        )
+        self.assertEqual([(poi.name, poi.kind, poi.coordinates) for poi in from_geojson], [('Rest', 'rest_area', '-99.5,40.0')])
+
+    def test_stop_falls_back_to_reverse_geocoding_without_a_poi(self):
+        view = RoutePlannerView()
+        lon, lat = self.geometry.point_at(0.5)
+
+        with mock.patch('api.views.get_poi_index', return_value=POIIndex([])), \
+                mock.patch('api.views.get_geolocator'), \
+                mock.patch('api.views.reverse_geocode_lookup', return_value='Kearney, NE') as lookup:
+            self.assertEqual(view._find_rest_stop_along_route(self.geometry, 0.5), ('Kearney, NE', f'{lon},{lat}'))
+            self.assertEqual(view._find_fuel_stop_along_route(self.geometry, 0.5), ('Kearney, NE', f'{lon},{lat}'))
+        self.assertEqual(lookup.call_args.args[1:], (lat, lon))
+
+        index = POIIndex([PointOfInterest('Big Rig Stop', 'truck_stop', -99.5, 40.0)])
+        with mock.patch('api.views.get_poi_index', return_value=index):
+            self.assertEqual(view._find_rest_stop_along_route(self.geometry, 0.5), ('Big Rig Stop', '-99.5,40.0'))
+
+
+class GeoStandInTests(TestCase):
+    route_url = 'https://router.example/route/v1/driving/-104.99,39.74;-87.6,41.8?overview=full'
+
+    def session(self, stand_in, forward=None):
+        session = requests.Session()
+        session.mount('https://', StandInAdapter(stand_in, forward))
+        return session
+
+    def fixture_file(self, fixtures):
+        fd, path = tempfile.mkstemp(suffix='.json')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(fixtures, f)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_recorded_responses_are_replayed(self):
+        path = self.fixture_file({
+            'search': {'denver, co': [{'lat': '39.7392', 'lon': '-104.9903', 'display_name': 'Denver'}]},
+        })
+        session = self.session(StandIn(fixtures=path, synthesize=False))
+
+        found = session.get('https://nominatim.example/search?q=Denver,%20%20CO&format=json').json()
+        missing = session.get('https://nominatim.example/search?q=Nowhere&format=json').json()
+        no_route = session.get(self.route_url)
+
+        self.assertEqual(found[0]['display_name'], 'Denver')
+        self.assertEqual(missing, [])
+        self.assertEqual(no_route.status_code, 400)
+
+    def test_recording_fills_the_fixture_file(self):
+        path = self.fixture_file({})
+        upstream = StandInAdapter(StandIn())
+        recorded = self.session(StandIn(fixtures=path, record=True), forward=upstream).get(self.route_url).json()
+
+        replayed = self.session(StandIn(fixtures=path, synthesize=False)).get(self.route_url).json()
+        self.assertEqual(replayed, recorded)
+        self.assertEqual(len(replayed['routes'][0]['legs']), 1)
+
+    def test_latency_applies_to_the_async_transport(self):
+        stand_in = StandIn(latency={'reverse': 0.05})
+
+        async def reverse():
+            async with httpx.AsyncClient(transport=StandInTransport(stand_in)) as client:
+                return await client.get('https://nominatim.example/reverse', params={'lat': 40.0, 'lon': -100.0})
+
+        started = datetime.datetime.now()
+        response = asyncio.run(reverse())
+        self.assertGreaterEqual(datetime.datetime.now() - started, datetime.timedelta(seconds=0.05))
+        self.assertIn('40.000, -100.000', response.json()['display_name'])
+
+    @override_settings(
+        SECURE_SSL_REDIRECT=False,
+        GEO_STANDIN={'ENABLED': True, 'FIXTURES': None, 'LATENCY': {'route': 0, 'search': 0, 'reverse': 0}},
+    )
+    def test_planner_runs_against_the_stand_in(self):
+        def reset():
+            for accessor in (http.get_session, geocoding.get_geolocator, standin._shared_standin):
+                accessor.reset()
+        reset()
+        self.addCleanup(reset)
+
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('driver@example.com', password='secret'))
+        with mock.patch('requests.adapters.HTTPAdapter.send', side_effect=AssertionError('network used')):
+            response = client.post('/api/routes/plan/', {
+                'current_location': 'Stand-in Tulsa',
+                'pickup_location': 'Stand-in Omaha',
+                'dropoff_location': 'Stand-in Reno',
+            }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(response.data['total_distance'], 0)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class BenchmarkSuiteTests(TestCase):
+    def test_percentile_interpolates(self):
+        values = [10.0, 20.0, 30.0, 40.0]
+        self.assertEqual(percentile(values, 50), 25.0)
+        self.assertEqual(percentile(values, 100), 40.0)
+        self.assertEqual(percentile([5.0], 95), 5.0)
+
+    def test_compare_flags_slowdowns_and_extra_queries(self):
+        baseline = {'cases': {'plan_view': {'p50_ms': 100.0, 'p95_ms': 120.0, 'peak_kib': 1000.0, 'queries': 22}}}
+        current = {'cases': {
+            'plan_view': {'p50_ms': 120.0, 'p95_ms': 160.0, 'peak_kib': 900.0, 'queries': 23},
+            'new_case': {'p50_ms': 1.0},
+        }}
+        regressed = {(name, metric) for name, metric, _, _, regressed in compare(baseline, current, 0.25) if regressed}
+        self.assertEqual(regressed, {('plan_view', 'p95_ms'), ('plan_view', 'queries')})
+
+    def test_suite_reports_every_metric(self):
+        caches['pdf'].clear()
+        results = run_suite(samples=2, only=['stop_placement_long_route', 'pdf_canvas'])
+
+        self.assertEqual(set(results['cases']), {'stop_placement_long_route', 'pdf_canvas'})
+        pdf = results['cases']['pdf_canvas']
+        self.assertLessEqual(pdf['p50_ms'], pdf['p99_ms'])
+        self.assertGreater(pdf['peak_kib'], 0)
+        self.assertGreater(pdf['queries'], 0)
+        self.assertEqual(results['cases']['stop_placement_long_route']['queries'], 0)
+        self.assertFalse(User.objects.filter(username__startswith='benchmark-suite-').exists())
+
+
+class TwoTierCacheTests(TestCase):
+    def make_cache(self, **config):
+        config = {'MAX_ENTRIES': 10, 'DB_MAX_ENTRIES': 3, 'TTL': 60, 'EVICT_EVERY': 100, **config}
+        with override_settings(GEO_CACHES={'test': config}):
+            cache = TwoTierCache('test')
+        self.addCleanup(TwoTierCache.registry.pop, 'test', None)
+        return cache
+
+    def test_memory_hit_skips_the_database(self):
+        cache = self.make_cache()
+        cache.set('denver', '-104.99,39.74')
+
+        with self.assertNumQueries(0):
+            self.assertEqual(cache.get('denver'), '-104.99,39.74')
+        self.assertEqual(cache.stats()['memory_hits'], 1)
+
+    def test_database_hit_is_promoted_to_memory(self):
+        cache = self.make_cache()
+        cache.set('denver', '-104.99,39.74')
+        cache.memory.clear()
+
+        self.assertEqual(cache.get('denver'), '-104.99,39.74')
+        with self.assertNumQueries(0):
+            self.assertEqual(cache.get('denver'), '-104.99,39.74')
+        self.assertEqual((cache.db_hits, cache.memory_hits), (1, 1))
+
+    def test_expired_entries_are_misses(self):
+        cache = self.make_cache()
+        cache.set('denver', '-104.99,39.74')
+        cache.memory.set('denver', '-104.99,39.74', ttl=-1)
+        GeoCacheEntry.objects.update(expires_at=timezone.now() - datetime.timedelta(seconds=1))
+
+        self.assertIsNone(cache.get('denver'))
+        self.assertEqual(cache.misses, 1)
+
+    def test_sets_only_sweep_every_evict_every_writes(self):
+        cache = self.make_cache(EVICT_EVERY=5)
+        for i in range(4):
+            cache.set(f'key {i}', i + 1)
+        self.assertEqual(GeoCacheEntry.objects.filter(namespace='test').count(), 4)
+
+        cache.set('key 4', 5)
+        keys = set(GeoCacheEntry.objects.filter(namespace='test').values_list('key', flat=True))
+        self.assertEqual(len(keys), 3)
+        self.assertIn('key 4', keys)
+
+    def test_purge_reaches_other_processes(self):
+        # Two caches on one namespace stand in for two worker processes
+        worker = self.make_cache(GENERATION_CHECK=0)
+        command = self.make_cache(GENERATION_CHECK=0)
+        worker.set('denver', '-104.99,39.74')
+
+        command.purge()
+
+        self.assertIsNone(worker.get('denver'))
+        self.assertFalse(GeoCacheEntry.objects.filter(namespace='test').exists())
+
+    def test_generation_is_checked_at_most_every_interval(self):
+        cache = self.make_cache(GENERATION_CHECK=60)
+        cache.set('denver', '-104.99,39.74')
+        with self.assertNumQueries(0):
+            for _ in range(3):
+                cache.get('denver')
+
+    def test_resolve_fetches_misses_once_and_stores_them(self):
+        cache = self.make_cache()
+        cache.set('denver', 'cached')
+        fetches = []
+
+        def fetch(value):
+            def run():
+                fetches.append(value)
+                if value == 'fail':
+                    raise ValueError('upstream down')
+                return value
+            return run
+
+        values = resolve([
+            Lookup(cache, 'denver', fetch('fetched')),
+            Lookup(cache, 'chicago', fetch('chicago')),
+            Lookup(cache, 'chicago', fetch('chicago')),
+            Lookup(cache, 'nowhere', fetch('fail')),
+        ], safe=True)
+
+        self.assertEqual(values[:3], ['cached', 'chicago', 'chicago'])
+        self.assertIsInstance(values[3], ValueError)
+        self.assertEqual(sorted(fetches), ['chicago', 'fail'])
+        # Stored on this thread, inside the test's transaction
+        self.assertEqual(
+            set(GeoCacheEntry.objects.filter(namespace='test').values_list('key', flat=True)),
+            {'denver', 'chicago'}
+        )
+
+    def test_long_keys_sharing_a_prefix_stay_apart(self):
+        cache = self.make_cache()
+        prefix = 'x' * 300
+        cache.set(prefix + ' denver', 1)
+        cache.set(prefix + ' chicago', 2)
+        cache.memory.clear()
+
+        self.assertEqual((cache.get(prefix + ' denver'), cache.get(prefix + ' chicago')), (1, 2))
+
+
+class ReverseGeocodeCacheTests(TestCase):
+    def setUp(self):
+        geocoding.reverse_cache.purge()
+        self.addCleanup(geocoding.reverse_cache.purge)
+        self.geolocator = mock.Mock()
+        self.geolocator.reverse.side_effect = lambda query: mock.Mock(address=f'Near {query}')
+
+    def test_points_in_one_grid_cell_share_an_upstream_call(self):
+        # Both fall in the cell from 39.742 to 39.743, -104.992 to -104.991
+        first = geocoding.reverse_geocode_address(self.geolocator, 39.7421, -104.9911)
+        second = geocoding.reverse_geocode_address(self.geolocator, 39.7429, -104.9919)
+
+        self.assertEqual(self.geolocator.reverse.call_count, 1)
+        self.assertEqual(second, first)
+
+    def test_neighbouring_cells_are_looked_up_separately(self):
+        geocoding.reverse_geocode_address(self.geolocator, 39.7429, -104.9911)
+        # One cell north, then one cell west
+        geocoding.reverse_geocode_address(self.geolocator, 39.7431, -104.9911)
+        geocoding.reverse_geocode_address(self.geolocator, 39.7429, -104.9921)
+
+        self.assertEqual(self.geolocator.reverse.call_count, 3)
+        self.assertEqual(
+            len({geocoding.grid_cell(*point) for point in ((39.7429, -104.9911), (39.7431, -104.9911), (39.7429, -104.9921))}),
+            3
+        )
+
+
+class HostRateLimiterTests(TestCase):
+    def test_requests_to_a_limited_host_are_spaced_out(self):
+        limiter = HostRateLimiter({'nominatim.openstreetmap.org': 1.0})
+        url = 'https://nominatim.openstreetmap.org/search?q=Denver'
+
+        waits = [limiter.reserve(url) for _ in range(3)]
+
+        self.assertEqual(waits[0], 0.0)
+        self.assertAlmostEqual(waits[1], 1.0, delta=0.05)
+        self.assertAlmostEqual(waits[2], 2.0, delta=0.05)
+        self.assertEqual(limiter.reserve('http://localhost:5000/route/v1/driving/1,2;3,4'), 0.0)
+
+    def test_reserve_refuses_to_wait_past_max_wait(self):
+        limiter = HostRateLimiter({'nominatim.openstreetmap.org': 1.0})
+        url = 'https://nominatim.openstreetmap.org/search?q=Denver'
+        limiter.reserve(url)
+
+        with self.assertRaises(UpstreamThrottled) as raised:
+            limiter.reserve(url, max_wait=0.5)
+
+        self.assertAlmostEqual(raised.exception.wait, 1.0, delta=0.05)
+        # The refused request did not take the slot
+        self.assertAlmostEqual(limiter.reserve(url, max_wait=2.0), 1.0, delta=0.05)
+
+    def test_fail_fast_applies_to_lookups_on_the_pool(self):
+        with fail_fast(2.5):
+            limits = run_concurrently([(http._max_wait.get,), (http._max_wait.get,)])
+
+        self.assertEqual(limits, [2.5, 2.5])
+        self.assertIsNone(http._max_wait.get())
+
+
+class PooledRequestsAdapterTests(TestCase):
+    def test_default_geocoders_share_the_pooled_session(self):
+        adapter = PooledRequestsAdapter(proxies=None, ssl_context=None)
+        self.assertIs(adapter.session, http.get_session())
+
+    def test_proxies_and_ssl_context_get_their_own_session(self):
+        context = ssl.create_default_context()
+        adapter = PooledRequestsAdapter(proxies={'https': 'proxy.example.com:3128'}, ssl_context=context)
+
+        self.assertIsNot(adapter.session, http.get_session())
+        self.assertEqual(adapter.session.proxies, {'https': 'http://proxy.example.com:3128'})
+        self.assertFalse(adapter.session.trust_env)
+        https = adapter.session.get_adapter('https://nominatim.openstreetmap.org/search')
+        self.assertIsInstance(https, http.RateLimitedHTTPAdapter)
+        self.assertIs(https.poolmanager.connection_pool_kw['ssl_context'], context)
+
+
+class ProcessSingletonTests(TestCase):
+    def test_factory_runs_once_until_reset(self):
+        factory = mock.Mock(side_effect=lambda: object())
+        accessor = process_singleton(factory)
+
+        first = accessor()
+        self.assertIs(accessor(), first)
+        accessor.reset()
+        self.assertIsNot(accessor(), first)
+        self.assertEqual(factory.call_count, 2)
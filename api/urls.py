@@ -1,15 +1,26 @@
 from django.urls import path, include
 from .views import (
     CurrentHoursView, RecentTripsView, RoutePlannerView, reverse_geocode, AllTripsView,
-    generate_driver_log_pdf
+    generate_driver_log_pdf, generate_driver_log_template_pdf, geo_cache_stats,
+    BatchRoutePlannerView, PlanningJobView, TripRouteView, TripDetailView, TripDetailListView
 )
+from .async_views import AsyncRoutePlannerView, AsyncReverseGeocodeView
 
 
 urlpatterns = [
     path('hours-of-service/current/', CurrentHoursView.as_view(), name='current-hours'),
     path('trips/recent/', RecentTripsView.as_view(), name='recent-trips'),
     path('routes/plan/', RoutePlannerView.as_view(), name='plan-route'),
+    path('routes/plan/batch/', BatchRoutePlannerView.as_view(), name='plan-route-batch'),
+    path('routes/plan/jobs/<int:job_id>/', PlanningJobView.as_view(), name='plan-route-job'),
     path('trips/all/', AllTripsView.as_view(), name='all-trips'),
+    path('trips/details/', TripDetailListView.as_view(), name='trip-details'),
+    path('trips/<int:trip_id>/', TripDetailView.as_view(), name='trip-detail'),
+    path('trips/<int:trip_id>/route/', TripRouteView.as_view(), name='trip-route'),
     path('geocode/reverse/', reverse_geocode, name='reverse-geocode'),
+    path('geocode/cache-stats/', geo_cache_stats, name='geo-cache-stats'),
+    path('async/routes/plan/', AsyncRoutePlannerView.as_view(), name='plan-route-async'),
+    path('async/geocode/reverse/', AsyncReverseGeocodeView.as_view(), name='reverse-geocode-async'),
     path('driver-logs/pdf/', generate_driver_log_pdf, name='generate_driver_log_pdf'),
+    path('driver-logs/pdf/template/', generate_driver_log_template_pdf, name='generate_driver_log_template_pdf'),
 ]
\ No newline at end of file
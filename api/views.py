@@ -2,34 +2,56 @@
 from rest_framework import status, viewsets
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.views import APIView
 
 # Django imports
 import os
 from django.conf import settings
+from django.db import DatabaseError, transaction
 from django.shortcuts import get_object_or_404
-from django.http import HttpResponse
+from django.urls import reverse
+from django.db.models import Prefetch
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
 
 # My custom API imports
-from .models import Trip, HoursOfService, LogSheet, TripStop, LogActivity
+from .models import Trip, HoursOfService, LogSheet, TripStop, LogActivity, PlanningJob
 from .serializers import (
     TripSerializer, TripDetailSerializer, HoursOfServiceSerializer,
     LogSheetSerializer, LogSheetDetailSerializer, RouteRequestSerializer,
-    RouteResponseSerializer, GeocodingRequestSerializer
+    RouteResponseSerializer, GeocodingRequestSerializer, BatchRouteRequestSerializer,
+    PlanningJobSerializer, DriverLogRangeSerializer, TripRouteSerializer
+)
+from .cache import Lookup, cache_stats, resolve
+from .cycle import hours_of_service_defaults, record_duty_hours
+from .dashboard import cached_driver_response
+from .pagination import KeysetPagination
+from .projection import Projection, serialize
+from .geocoding import (
+    geocode_lookup, get_geolocator, normalize_address, reverse_geocode_address, reverse_geocode_lookup
+)
+from .http import UpstreamThrottled, fail_fast
+from .routing import get_route, route_key, route_lookup, split_legs
+from .geometry import RouteGeometry, compact_route
+from .hos import HOSState, Leg, simulate_trip
+from .poi import FUEL_STOP_KINDS, REST_STOP_KINDS, get_poi_index
+from .pdf import (
+    day_bounds, draw_activities, draw_log_sheet, get_log_template, get_or_render, log_sheet_etag, stream_pdf
 )
 from accounts.models import DriverProfile
 
 # Third part API imports
+import copy
 import datetime
 import math
-import requests
+import time
 import io
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
 from PyPDF2 import PdfReader, PdfWriter
 from datetime import timedelta
-from geopy.geocoders import Nominatim
     
         
 
@@ -38,38 +60,105 @@ class CurrentHoursView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        # Get today's hours or create default entry
         today = datetime.date.today()
-        hours, created = HoursOfService.objects.get_or_create(
-            driver=request.user,
-            date=today,
-            defaults={
-                'cycle_used': 0, 
-                'daily_used': 0,
-                'driving_used': 0
-            }
-        )
-        serializer = HoursOfServiceSerializer(hours)
-        return Response(serializer.data)
+        
+        def build():
+            # Get today's hours or create default entry
+            hours, created = HoursOfService.objects.get_or_create(
+                driver=request.user,
+                date=today,
+                defaults=hours_of_service_defaults(request.user, today)
+            )
+            return HoursOfServiceSerializer(hours).data
+        
+        # Served from the cache until the driver's data changes or the day does
+        return cached_driver_response(request, 'current-hours', build, today)
     
 
 class RecentTripsView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        # Get 5 most recent trips
-        trips = Trip.objects.filter(driver=request.user).order_by('-created_at')[:5]
-        serializer = TripSerializer(trips, many=True)
-        return Response(serializer.data)
+        def build():
+            # Get 5 most recent trips
+            trips = Trip.objects.filter(driver=request.user).order_by('-created_at', '-id')[:5]
+            return serialize(TripSerializer, queryset=trips, many=True)
+        
+        # Served from the cache until the driver's data changes
+        return cached_driver_response(request, 'recent-trips', build)
 
 class AllTripsView(APIView):
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get(self,request):
-        trip_details = Trip.objects.filter(driver=request.user).order_by('-created_at')
-        serializer = TripSerializer(trip_details, many=True)
-        return Response(serializer.data)
+        paginator = self.pagination_class()
+        trips = Trip.objects.filter(driver=request.user)
+        
+        if settings.FAST_JSON:
+            # Plain rows, plus the cursor columns for the next link
+            projection = Projection.of(TripSerializer)
+            rows = paginator.paginate_queryset(
+                trips.values(*projection.sources, 'created_at'), request, view=self
+            )
+            return paginator.get_paginated_response(projection.rows(rows))
         
+        trip_details = paginator.paginate_queryset(trips, request, view=self)
+        serializer = TripSerializer(trip_details, many=True)
+        return paginator.get_paginated_response(serializer.data)
+        
+def with_trip_details(trips):
+    """
+    Prefetch what TripDetailSerializer reads, so any number of trips takes
+    four queries: trips, stops, log sheets and activities
+    """
+    return trips.prefetch_related(
+        Prefetch('stops', queryset=TripStop.objects.order_by('arrival_time', 'id')),
+        Prefetch('log_sheets', queryset=LogSheet.objects.order_by('date').prefetch_related(
+            Prefetch('activities', queryset=LogActivity.objects.order_by('start_time', 'id'))
+        ))
+    )
+
+class TripDetailView(APIView):
+    """
+    One of the driver's trips with its stops, log sheets and activities
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, trip_id):
+        trip = get_object_or_404(with_trip_details(Trip.objects.filter(driver=request.user)), id=trip_id)
+        return Response(TripDetailSerializer(trip).data)
+
+class TripDetailListView(APIView):
+    """
+    Pages of the driver's trips with their details, paginated like AllTripsView
+    """
+    permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    
+    def get(self, request):
+        paginator = self.pagination_class()
+        trips = paginator.paginate_queryset(
+            with_trip_details(Trip.objects.filter(driver=request.user)), request, view=self
+        )
+        return paginator.get_paginated_response(TripDetailSerializer(trips, many=True).data)
+
+class TripRouteView(APIView):
+    """
+    The stored route of one of the driver's trips, served without calling OSRM
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, trip_id):
+        trip = get_object_or_404(
+            Trip.objects.only('id', 'distance', 'route_polyline', 'route_leg_starts'),
+            id=trip_id,
+            driver=request.user
+        )
+        if not trip.route_polyline:
+            return Response({'error': 'No route stored for this trip'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(TripRouteSerializer(trip).data)
+
 class RoutePlannerView(APIView):
     permission_classes = [IsAuthenticated]
     
@@ -81,11 +170,25 @@ class RoutePlannerView(APIView):
             pickup_location = serializer.validated_data['pickup_location']
             dropoff_location = serializer.validated_data['dropoff_location']
             
+            # Queue the plan for the worker and return immediately if asked to
+            if request.query_params.get('async') in ('1', 'true'):
+                job = PlanningJob.objects.create(
+                    driver=request.user,
+                    current_location=current_location,
+                    pickup_location=pickup_location,
+                    dropoff_location=dropoff_location
+                )
+                return Response(
+                    {
+                        'job_id': job.id,
+                        'status': job.status,
+                        'status_url': request.build_absolute_uri(reverse('plan-route-job', args=[job.id]))
+                    },
+                    status=status.HTTP_202_ACCEPTED
+                )
+            
             # Retrieve current hours of service for the driver
-            current_hours = HoursOfService.objects.get(
-                driver=request.user, 
-                date=datetime.date.today()
-            )
+            current_hours = self._get_current_hours(request.user)
             
             # Call the mapping API and calculate the route
             route_data = self._calculate_route(
@@ -95,75 +198,139 @@ class RoutePlannerView(APIView):
                 current_hours
             )
 
+            # Log trip, log sheet and activities and update hours of service
+            self._save_plan(
+                request.user,
+                current_hours,
+                pickup_location,
+                dropoff_location,
+                route_data
+            )
+            
+            return Response(serialize(RouteResponseSerializer, route_data))
+            
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    def _get_current_hours(self, driver):
+        """
+        Today's hours of service for the driver. When missing it is created
+        with the cycle hours of the previous 7 days.
+        """
+        today = datetime.date.today()
+        hours, created = HoursOfService.objects.get_or_create(
+            driver=driver,
+            date=today,
+            defaults=hours_of_service_defaults(driver, today)
+        )
+        return hours
+    
+    def _save_plan(self, driver, current_hours, pickup_location, dropoff_location, route_data):
+        """
+        Persist a planned trip with its log sheet activities and update hours of service
+
+        Everything is written in one transaction with a fixed number of
+        queries, however many stops the plan has. The trip's hours are added
+        to the driver's hours as they are in the database, which are copied
+        back onto current_hours.
+        """
+        today = datetime.date.today()
+
+        with transaction.atomic():
+            # Planning can take minutes, and another plan for the driver may
+            # have saved its hours in the meantime, so add to the locked row
+            # rather than the copy the plan started from
+            hours = HoursOfService.objects.select_for_update().get(pk=current_hours.pk)
+            cycle_hours = hours.cycle_used + route_data['duty_hours']
+
             # Log trip details to database
             trip = Trip.objects.create(
-                driver = request.user,
+                driver = driver,
                 pickup_location = pickup_location,
                 dropoff_location = dropoff_location,
                 estimated_hours = route_data['total_hours'],
-                distance = route_data['total_distance']
+                distance = route_data['total_distance'],
+                route_polyline = route_data['route_polyline'],
+                route_leg_starts = route_data['route_leg_starts']
             )
 
-            trip.save()
-
-            cycle_hours = current_hours.cycle_used + route_data['total_hours']
+            # Keep the planned stops with the trip, in a single insert
+            TripStop.objects.bulk_create([
+                TripStop(
+                    trip=trip,
+                    type=stop['type'],
+                    location=stop['location'],
+                    arrival_time=stop['arrival_time'],
+                    departure_time=stop['departure_time'],
+                    duration=stop['duration'],
+                    coordinates=stop['coordinates']
+                )
+                for stop in route_data['stops']
+            ])
 
-            # Create a logsheet instance to receive trip activity information
-            logsheet = LogSheet.objects.create(
-                driver=request.user,
-                trip = trip,
-                date = datetime.date.today(),
-                hours_logged = route_data['total_hours'],
-                cycle_hours = cycle_hours,
+            # Create today's logsheet to receive trip activity information, or
+            # add to it when another trip was already planned today
+            logsheet, created = LogSheet.objects.get_or_create(
+                driver=driver,
+                date = today,
+                defaults={
+                    'trip': trip,
+                    'hours_logged': route_data['total_hours'],
+                    'cycle_hours': cycle_hours,
+                }
             )
+            if not created:
+                logsheet.hours_logged += route_data['total_hours']
+                logsheet.cycle_hours = cycle_hours
+                logsheet.save(update_fields=['hours_logged', 'cycle_hours'])
 
-            logsheet.save()
-
-            stops = route_data['stops']
-            for stop in stops:
-                activity = stop['activity']
-                start_time, end_time = stop['arrival_time'], stop['departure_time']
-                location, type = stop['location'], stop['type']
-            
-                # Log activity on sheet
-                log_activity = LogActivity.objects.create(
+            # Log every stop's activity on the sheet in a single insert
+            LogActivity.objects.bulk_create([
+                LogActivity(
                     log_sheet=logsheet,
-                    activity_type = activity,
-                    location = location,
-                    description = type,
-                    start_time=start_time,
-                    end_time=end_time
+                    driver=driver,
+                    activity_type = stop['activity'],
+                    location = stop['location'],
+                    description = stop['type'],
+                    start_time=stop['arrival_time'],
+                    end_time=stop['departure_time']
                 )
-
-                log_activity.save()
+                for stop in route_data['stops']
+            ])
 
             # Update hours of service after route calculation
-            self._update_hours_of_service(
-                current_hours, 
-                route_data['driving_hours'], 
-                route_data['total_hours']
-            )
-            
-            response_serializer = RouteResponseSerializer(route_data)
-            return Response(response_serializer.data)
+            self._update_hours_of_service(hours, route_data)
             
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            # Keep the rolling 8-day cycle totals in step, counting the
+            # hours on each day a multi-day trip is on duty
+            for day, duty_hours in route_data['duty_hours_by_day'].items():
+                record_duty_hours(driver, day, duty_hours)
+
+        for field in ('driving_used', 'daily_used', 'cycle_used'):
+            setattr(current_hours, field, getattr(hours, field))
+        return trip
     
-    def _update_hours_of_service(self, hours_of_service, driving_hours, total_hours):
+    def _add_hours(self, hours_of_service, route_data):
         """
-        Update driver's hours of service after trip planning
+        Add a trip's hours to an hours of service record without saving it
         """
         # Update driving hours used
-        hours_of_service.driving_used += driving_hours
+        hours_of_service.driving_used += route_data['driving_hours']
         
         # Update daily duty hours
-        hours_of_service.daily_used += total_hours
+        hours_of_service.daily_used += route_data['total_hours']
         
-        # Update cycle hours (70-hr/8-day cycle)
-        hours_of_service.cycle_used += total_hours
+        # Update cycle hours (70-hr/8-day cycle). cycle_used already holds
+        # the window ending today, so today's new duty hours simply add on.
+        hours_of_service.cycle_used += route_data['duty_hours']
+    
+    def _update_hours_of_service(self, hours_of_service, route_data):
+        """
+        Update driver's hours of service after trip planning
+        """
+        self._add_hours(hours_of_service, route_data)
         
         # Save updated hours
-        hours_of_service.save()
+        hours_of_service.save(update_fields=['driving_used', 'daily_used', 'cycle_used'])
     
     def _calculate_route(self, current_location, pickup_location, dropoff_location, current_hours):
         """
@@ -179,23 +346,57 @@ class RoutePlannerView(APIView):
             dict: Route details including stops, distances, and times
         """
         
-        # Initialize geocoder for converting addresses to coordinates
-        geolocator = Nominatim(user_agent="trucking_route_planner")
+        # Shared geocoder for converting addresses to coordinates
+        geolocator = get_geolocator()
         
-        # Convert addresses to coordinates
+        # Convert addresses to coordinates, all three lookups in parallel
         try:
-            current_coords = self._geocode_location(geolocator, current_location)
-            pickup_coords = self._geocode_location(geolocator, pickup_location)
-            dropoff_coords = self._geocode_location(geolocator, dropoff_location)
+            current_coords, pickup_coords, dropoff_coords = resolve([
+                geocode_lookup(geolocator, location)
+                for location in (current_location, pickup_location, dropoff_location)
+            ])
         except Exception as e:
             # Handle geocoding errors
             raise ValueError(f"Geocoding error: {str(e)}")
         
-        # Get route from current location to pickup
-        to_pickup_route = self._get_osrm_route(current_coords, pickup_coords)
+        # Get one route through current location, pickup and dropoff
+        route = self._get_route(current_coords, pickup_coords, dropoff_coords)
+        
+        route_data, pending_stops = self._plan_route(
+            [current_location, pickup_location, dropoff_location],
+            [current_coords, pickup_coords, dropoff_coords],
+            route,
+            current_hours
+        )
+        
+        # Locate every stop placed along the route concurrently
+        self._locate_stops(geolocator, pending_stops)
+        
+        return route_data
+    
+    def _plan_route(self, locations, coords, route, current_hours):
+        """
+        Lay out the HOS compliant stops for a routed trip
+        
+        Args:
+            locations (list): Current, pickup and dropoff location names
+            coords (list): Current, pickup and dropoff coordinates "lon,lat"
+            route (dict): Route through the three waypoints
+            current_hours: Driver's hours of service
+        
+        Returns:
+            tuple: (route details, stops along the route still to be located).
+            Each pending stop is a (stop, find_stop, geometry, ratio) tuple for _locate_stops.
+        """
+        current_location, pickup_location, dropoff_location = locations
+        current_coords, pickup_coords, dropoff_coords = coords
         
-        # Get route from pickup to dropoff
-        pickup_to_dropoff_route = self._get_osrm_route(pickup_coords, dropoff_coords)
+        # Split the route into the leg to pickup and the leg from pickup to dropoff
+        to_pickup_route, pickup_to_dropoff_route = split_legs(route)
+        
+        # Decode each leg's geometry once for placing stops along it
+        to_pickup_geometry = RouteGeometry.from_route(to_pickup_route)
+        pickup_to_dropoff_geometry = RouteGeometry.from_route(pickup_to_dropoff_route)
         
         # Extract distances and durations
         to_pickup_distance = to_pickup_route['distance'] / 1609.34  # Convert meters to miles
@@ -204,359 +405,360 @@ class RoutePlannerView(APIView):
         pickup_to_dropoff_distance = pickup_to_dropoff_route['distance'] / 1609.34
         pickup_to_dropoff_duration = pickup_to_dropoff_route['duration'] / 3600
         
-        total_distance = to_pickup_distance + pickup_to_dropoff_distance
-        total_driving_duration = to_pickup_duration + pickup_to_dropoff_duration
-        
-        # HOS compliance calculations
-        # Current hours already used
-        current_driving_used = current_hours.driving_used
-        current_duty_used = current_hours.daily_used
-        
-        # HOS limits
-        max_driving_hours = 11  # Maximum 11 hours driving time
-        max_duty_hours = 14     # Maximum 14 hours on duty
-        break_required_after = 8  # Break required after 8 hours of driving
-        remaining_driving_hours = max_driving_hours - current_driving_used
-        remaining_duty_hours = max_duty_hours - current_duty_used
+        # Lay out the HOS compliant timeline, starting now
+        timeline = simulate_trip(
+            [
+                Leg(to_pickup_distance, to_pickup_duration),
+                Leg(pickup_to_dropoff_distance, pickup_to_dropoff_duration),
+            ],
+            HOSState(current_hours.driving_used, current_hours.daily_used, current_hours.cycle_used),
+            timezone.localtime()
+        )
         
-        # Generate stops with locations based on HOS regulations
+        # Enrich the timeline events with locations. Endpoints are already
+        # known; stops along a route are located concurrently afterwards.
+        waypoints = [
+            (current_location, current_coords),
+            (pickup_location, pickup_coords),
+            (dropoff_location, dropoff_coords),
+        ]
+        geometries = [to_pickup_geometry, pickup_to_dropoff_geometry]
         stops = []
+        pending_stops = []
         
-        # Start time is now
-        from datetime import datetime
-        current_time = datetime.now()
-        
-        # Add current location as starting point
-        stops.append({
-            'type': 'start',
-            'location': current_location,
-            'coordinates': self._geocode_location(geolocator, current_location),
-            'arrival_time': current_time.strftime('%I:%M %p'),
-            'departure_time': current_time.strftime('%I:%M %p'),
-            'duration': 0,
-            'activity': 'OFF_DUTY'
-        })
-
-        
-        # Calculate drive to pickup
-        current_driving_segment = to_pickup_duration
-        
-        # Check if we need a break before reaching pickup
-        if current_driving_used + current_driving_segment > break_required_after:
-            # Time until break is needed
-            driving_until_break = break_required_after - current_driving_used
-            # Calculate where the break would occur
-            break_ratio = driving_until_break / current_driving_segment
-            break_distance = to_pickup_distance * break_ratio
-            
-            # Find a rest stop location along the route
-            break_location = self._find_rest_stop_along_route(
-                to_pickup_route, 
-                break_ratio
+        for event in timeline.events:
+            location, coordinates = (
+                waypoints[event.waypoint] if event.waypoint is not None else (None, None)
             )
+            stop = {
+                'type': event.type,
+                'location': location,
+                'coordinates': coordinates,
+                'arrival_time': event.start,
+                'departure_time': event.end,
+                'duration': event.duration,
+                'activity': event.activity
+            }
+            stops.append(stop)
             
-            # Add drive time to current time
-            current_time += timedelta(hours=driving_until_break)
-            
-            # Add break stop
-            stops.append({
-                'type': 'rest',
-                'location': break_location,
-                'coordinates': self._geocode_location(geolocator, break_location),
-                'arrival_time': current_time.strftime('%I:%M %p'),
-                'departure_time': (current_time + timedelta(minutes=30)).strftime('%I:%M %p'),
-                'duration': 0.5,
-                'activity': 'ON_DUTY'
-            })
-            
-            # Update times
-            current_time += timedelta(minutes=30)
-            current_driving_used = 0  # Reset driving hours after break
-            current_driving_segment -= driving_until_break
-        
-        # Update driving hours
-        current_driving_used += current_driving_segment
-        
-        # Update current time after driving to pickup
-        current_time += timedelta(hours=current_driving_segment)
-        
-        # Add pickup stop
-        stops.append({
-            'type': 'pickup',
-            'location': pickup_location,
-            'coordinates': self._geocode_location(geolocator, pickup_location),
-            'arrival_time': current_time.strftime('%I:%M %p'),
-            'departure_time': (current_time + timedelta(hours=1)).strftime('%I:%M %p'),
-            'duration': 1.0,
-            'activity': 'ON_DUTY'
-        })
-        
-        # Update current time after pickup
-        current_time += timedelta(hours=1)
-        
-        # Check if we need to take a 10-hour rest
-        if current_duty_used + to_pickup_duration + 1 > max_duty_hours:
-            stops.append({
-                'type': 'overnight',
-                'location': pickup_location,
-                'coordinates': self._geocode_location(geolocator, pickup_location),
-                'arrival_time': current_time.strftime('%I:%M %p'),
-                'departure_time': (current_time + timedelta(hours=10)).strftime('%I:%M %p'),
-                'duration': 10.0,
-                'activity': 'SLEEPER'
-            })
-            current_time += timedelta(hours=10)
-            current_driving_used = 0
-            current_duty_used = 0
-        else:
-            current_duty_used += to_pickup_duration + 1
-        
-        # Calculate rest stops for the route from pickup to dropoff
-        remaining_distance = pickup_to_dropoff_distance
-        remaining_duration = pickup_to_dropoff_duration
-        
-        while remaining_distance > 0:
-            # Calculate how far we can drive before next break
-            if current_driving_used >= break_required_after:
-                # Need a break now
-                driving_segment = 0
-            else:
-                driving_segment = min(
-                    break_required_after - current_driving_used,  # Time until break
-                    remaining_duration,  # Remaining drive time
-                    max_duty_hours - current_duty_used  # Time until end of duty
-                )
-            
-            # If we can't drive any further, take a break
-            if driving_segment == 0:
-                ratio_driven = 1 - (remaining_distance / pickup_to_dropoff_distance)
-                rest_location = self._find_rest_stop_along_route(
-                    pickup_to_dropoff_route, 
-                    ratio_driven
-                )
-                
-                stops.append({
-                    'type': 'rest',
-                    'location': rest_location,
-                    'coordinates': self._geocode_location(geolocator, rest_location),
-                    'arrival_time': current_time.strftime('%I:%M %p'),
-                    'departure_time': (current_time + timedelta(minutes=30)).strftime('%I:%M %p'),
-                    'duration': 0.5,
-                    'activity': 'ON_DUTY'
-                })
-                
-                current_time += timedelta(minutes=30)
-                current_driving_used = 0
-                continue
-                
-            # If we need an overnight rest due to duty hours
-            if current_duty_used + driving_segment + 0.5 >= max_duty_hours:
-                ratio_driven = 1 - (remaining_distance / pickup_to_dropoff_distance)
-                rest_location = self._find_rest_stop_along_route(
-                    pickup_to_dropoff_route, 
-                    ratio_driven
-                )
-                
-                stops.append({
-                    'type': 'overnight',
-                    'location': rest_location,
-                    'coordinates': self._geocode_location(geolocator, rest_location),
-                    'arrival_time': current_time.strftime('%I:%M %p'),
-                    'departure_time': (current_time + timedelta(hours=10)).strftime('%I:%M %p'),
-                    'duration': 10.0,
-                    'activity': 'SLEEPER'
-                })
-                
-                current_time += timedelta(hours=10)
-                current_driving_used = 0
-                current_duty_used = 0
-                continue
-            
-            # Drive for the segment
-            drive_segment_distance = (driving_segment / remaining_duration) * remaining_distance
-            
-            # Update counters
-            current_time += timedelta(hours=driving_segment)
-            current_driving_used += driving_segment
-            current_duty_used += driving_segment
-            remaining_distance -= drive_segment_distance
-            remaining_duration -= driving_segment
-            
-            # Check for fuel stop (roughly every 1000 miles)
-            driven_distance = total_distance - remaining_distance
-            if int(driven_distance / 1000) != int((driven_distance - drive_segment_distance) / 1000):
-                ratio_driven = 1 - (remaining_distance / pickup_to_dropoff_distance)
-                fuel_location = self._find_fuel_stop_along_route(
-                    pickup_to_dropoff_route, 
-                    ratio_driven
+            if event.waypoint is None:
+                find_stop = (
+                    self._find_fuel_stop_along_route if event.type == 'fuel'
+                    else self._find_rest_stop_along_route
                 )
-                
-                stops.append({
-                    'type': 'fuel',
-                    'location': fuel_location,
-                    'coordinates': self._geocode_location(geolocator, fuel_location),
-                    'arrival_time': current_time.strftime('%I:%M %p'),
-                    'departure_time': (current_time + timedelta(minutes=15)).strftime('%I:%M %p'),
-                    'duration': 0.25,
-                    'activity': 'ON_DUTY'
-                })
-                
-                current_time += timedelta(minutes=15)
-                current_duty_used += 0.25
-            
-            # If we've completed the route
-            if remaining_distance <= 0:
-                break
-        
-        # Add dropoff stop
-        stops.append({
-            'type': 'dropoff',
-            'location': dropoff_location,
-            'coordinates': self._geocode_location(geolocator, dropoff_location),
-            'arrival_time': current_time.strftime('%I:%M %p'),
-            'departure_time': (current_time + timedelta(hours=1)).strftime('%I:%M %p'),
-            'duration': 1.0,
-            'activity': 'ON_DUTY'
-        })
-        
-        # Calculate total trip time
-        first_stop_time = datetime.strptime(stops[0]['arrival_time'], '%I:%M %p')
-        last_stop_time = datetime.strptime(stops[-1]['departure_time'], '%I:%M %p')
-
-        
-        # Handle date crossing
-        if last_stop_time < first_stop_time:
-            # Add a day
-            last_stop_time = last_stop_time + timedelta(hours=24)
-        
-        total_trip_time = (last_stop_time - first_stop_time).total_seconds() / 3600
-
-        
-        return {
-            'total_distance': round(total_distance, 1),
-            'driving_hours': round(total_driving_duration, 1),
-            'total_hours': round(total_trip_time, 1),
-            'required_stops': len(stops) - 2,  # Exclude start and end
+                pending_stops.append((stop, find_stop, geometries[event.leg], event.ratio))
+        
+        route_data = {
+            'total_distance': round(timeline.total_distance, 1),
+            'driving_hours': round(timeline.driving_hours, 1),
+            'total_hours': round(timeline.total_hours, 1),
+            'duty_hours': round(timeline.duty_hours, 1),
+            'duty_hours_by_day': {day: round(hours, 2) for day, hours in timeline.duty_hours_by_day().items()},
+            'required_stops': timeline.required_stops,
             'stops': stops,
         }
+        
+        # Keep a compact copy of the route to store on the trip
+        route_data['route_polyline'], route_data['route_leg_starts'] = compact_route(geometries)
+        return route_data, pending_stops
     
-    def _geocode_location(self, geolocator, location_name):
+    def _locate_stops(self, geolocator, pending_stops, safe=False):
         """
-        Convert address to coordinates
+        Fill in the location and coordinates of stops placed along routes
+        
+        POI matches are used as they are; the reverse geocodes of the other
+        stops are looked up together.
         
         Args:
             geolocator: Nominatim geolocator instance
-            location_name (str): Address or location name
-            
+            pending_stops (list): (stop, find_stop, geometry, ratio) tuples from _plan_route
+            safe (bool): Return each stop's error instead of raising the first one
+        
         Returns:
-            tuple: (longitude, latitude)
+            list: The exception each stop failed with, or None, in order
         """
-        location = geolocator.geocode(location_name)
-        if not location:
-            raise ValueError(f"Could not geocode location: {location_name}")
-        return f"{location.longitude},{location.latitude}"
+        found, errors = [], []
+        for stop, find_stop, geometry, ratio in pending_stops:
+            try:
+                location, coordinates = find_stop(geometry, ratio)
+            except Exception as e:
+                if not safe:
+                    raise
+                found.append((stop, e, None))
+                continue
+            if coordinates is None:
+                coordinates = geocode_lookup(geolocator, location)
+            found.append((stop, location, coordinates))
+        
+        lookups = [field for _, *fields in found for field in fields if isinstance(field, Lookup)]
+        values = iter(resolve(lookups, safe=safe))
+        
+        for stop, *fields in found:
+            location, coordinates = (next(values) if isinstance(field, Lookup) else field for field in fields)
+            stop['location'] = location
+            stop['coordinates'] = coordinates
+            errors.append(next((field for field in (location, coordinates) if isinstance(field, Exception)), None))
+        return errors
     
-    def _get_osrm_route(self, start_coords, end_coords):
+    def _get_route(self, *waypoints):
         """
-        Get route from OSRM
+        Get a route through the waypoints from the configured routing backend
         
         Args:
-            start_coords (str): Start coordinates "lon,lat"
-            end_coords (str): End coordinates "lon,lat"
+            waypoints (str): Coordinates "lon,lat" in visiting order
             
         Returns:
-            dict: Route information
+            dict: Route information with one leg per pair of waypoints,
+            served from the route cache when possible
         """
-        # Using a public OSRM instance
-        base_url = "https://router.project-osrm.org/route/v1/driving/"
-        url = f"{base_url}{start_coords};{end_coords}?overview=full&alternatives=false&steps=true"
-       
-        
-        response = requests.get(url)
-        if response.status_code != 200:
-            raise Exception(f"OSRM API error: {response.status_code}")
-        
-        data = response.json()
-        if data['code'] != 'Ok':
-            raise Exception(f"Routing error: {data['code']}")
-        
-        route = data['routes'][0]
-        return route
+        return get_route(*waypoints)
     
-    def _find_rest_stop_along_route(self, route, ratio):
+    def _find_rest_stop_along_route(self, geometry, ratio):
         """
-        Find a rest stop along the route at approximately the given ratio of the journey
+        Find a rest stop along the route at the given ratio of the journey
         
         Args:
-            route (dict): OSRM route response
+            geometry (RouteGeometry): Decoded route geometry
             ratio (float): Route completion ratio (0-1)
             
         Returns:
-            str: Description of a rest stop location
+            tuple: (description or a Lookup of it, "lon,lat" coordinates or None if unknown)
         """
-        # Will use POI data to find actual rest stops in future versions
-        # For now, estimate location based on route geometry
-        steps = route.get('legs', [{}])[0].get('steps', [])
-        
-        # Find the step that corresponds roughly to the ratio
-        current_distance = 0
-        target_distance = route['distance'] * ratio
-        step_location = "Rest Area"
-        
-        for step in steps:
-            current_distance += step['distance']
-            if current_distance >= target_distance:
-                # Extract a location name from the step instructions
-                instruction = step.get('maneuver', {}).get('location', [])
-                if instruction:
-                    long = instruction[0]
-                    lat = instruction[1]
-
-                    geolocator = Nominatim(user_agent="trucking_route_planner")
-                    location = geolocator.reverse(f'{lat}, {long}')
-                    address = location.address
-
-                    step_location = address
-                break
-        
-        return step_location
+        # Prefer an actual truck stop or rest area from the offline POI data
+        poi = get_poi_index().find_along(geometry, ratio, REST_STOP_KINDS)
+        if poi is not None:
+            return poi.description, poi.coordinates
+
+        # Otherwise reverse geocode the exact point on the route geometry
+        point = geometry.point_at(ratio)
+        if point is None:
+            return "Rest Area", None
+
+        long, lat = point
+        return reverse_geocode_lookup(get_geolocator(), lat, long), f"{long},{lat}"
     
-    def _find_fuel_stop_along_route(self, route, ratio):
+    def _find_fuel_stop_along_route(self, geometry, ratio):
         """
-        Find a fuel stop along the route at approximately the given ratio of the journey
+        Find a fuel stop along the route at the given ratio of the journey
         
         Args:
-            route (dict): OSRM route response
+            geometry (RouteGeometry): Decoded route geometry
             ratio (float): Route completion ratio (0-1)
             
         Returns:
-            str: Description of a fuel stop location
+            tuple: (description or a Lookup of it, "lon,lat" coordinates or None if unknown)
+        """
+        # Similar to finding rest stops, but looking for fuel stations
+        poi = get_poi_index().find_along(geometry, ratio, FUEL_STOP_KINDS)
+        if poi is not None:
+            return poi.description, poi.coordinates
+
+        point = geometry.point_at(ratio)
+        if point is None:
+            return "Fuel Station", None
+
+        long, lat = point
+        return reverse_geocode_lookup(get_geolocator(), lat, long), f"{long},{lat}"
+
+
+class PlanningJobView(APIView):
+    """
+    Status and result of an asynchronous route planning job
+
+    Pass ?wait=<seconds> to wait for the job to finish before answering.
+    The wait is capped at max_wait (2s) because it holds a worker thread
+    of this sync view; clients should poll again rather than ask for more.
+    """
+    permission_classes = [IsAuthenticated]
+    max_wait = 2
+    poll_interval = 0.5
+
+    def get(self, request, job_id):
+        job = get_object_or_404(PlanningJob, id=job_id, driver=request.user)
+
+        try:
+            wait = min(float(request.query_params.get('wait', 0)), self.max_wait)
+        except ValueError:
+            return Response({'wait': ['A number is required.']}, status=status.HTTP_400_BAD_REQUEST)
+
+        deadline = time.monotonic() + wait
+        while not job.is_finished and time.monotonic() < deadline:
+            time.sleep(min(self.poll_interval, max(deadline - time.monotonic(), 0)))
+            job.refresh_from_db()
+
+        return Response(PlanningJobSerializer(job).data)
+
+
+def first_throttled(results):
+    """
+    The first UpstreamThrottled among lookup results, or None
+    """
+    return next((result for result in results if isinstance(result, UpstreamThrottled)), None)
+
+
+def throttled_response(error):
+    """
+    503 telling the client when the throttled upstream has a free slot again
+    """
+    response = Response({'error': str(error)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    response['Retry-After'] = str(math.ceil(error.wait))
+    return response
+
+
+class BatchRoutePlannerView(RoutePlannerView):
+    """
+    Plan many loads for the driver in one request
+
+    Addresses and routes shared between items are looked up once and all
+    lookups run concurrently. Items are planned and saved in order, each
+    in its own transaction and starting from the hours of service left by
+    the items saved before it. A failing item is reported in its own
+    result without failing the rest of the batch.
+
+    Lookups do not queue for a rate-limited upstream for longer than
+    OUTBOUND_HTTP['MAX_QUEUE_WAIT']. If one would, the whole batch is
+    answered 503 with Retry-After before anything is saved; the lookups
+    that did finish are cached for the retry.
+    """
+    location_fields = ('current_location', 'pickup_location', 'dropoff_location')
+
+    def post(self, request):
+        with fail_fast():
+            return self._plan_batch(request)
+
+    def _plan_batch(self, request):
+        serializer = BatchRouteRequestSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        items = serializer.validated_data['routes']
+        results = [None] * len(items)
+        valid = {}
+
+        for index, item in enumerate(items):
+            item_serializer = RouteRequestSerializer(data=item)
+            if item_serializer.is_valid():
+                valid[index] = item_serializer.validated_data
+            else:
+                results[index] = self._batch_error(index, item_serializer.errors)
+
+        geolocator = get_geolocator()
+
+        # Geocode each distinct address once
+        addresses = {}
+        for data in valid.values():
+            for field in self.location_fields:
+                addresses.setdefault(normalize_address(data[field]), data[field])
+        geocoded = dict(zip(addresses, resolve(
+            [geocode_lookup(geolocator, name) for name in addresses.values()], safe=True
+        )))
+        if (throttled := first_throttled(geocoded.values())) is not None:
+            return throttled_response(throttled)
+
+        waypoints = {}
+        for index, data in valid.items():
+            coords = [geocoded[normalize_address(data[field])] for field in self.location_fields]
+            errors = [str(c) for c in coords if isinstance(c, Exception)]
+            if errors:
+                results[index] = self._batch_error(index, f"Geocoding error: {errors[0]}")
+            else:
+                waypoints[index] = coords
+
+        # Route each distinct set of waypoints once
+        unique_routes = {}
+        for coords in waypoints.values():
+            unique_routes.setdefault(route_key(*coords), coords)
+        routes = dict(zip(unique_routes, resolve(
+            [route_lookup(*coords) for coords in unique_routes.values()], safe=True
+        )))
+        if (throttled := first_throttled(routes.values())) is not None:
+            return throttled_response(throttled)
+
+        # Plan in order, assuming every item succeeds and carrying the
+        # driver's hours through the batch
+        current_hours = self._get_current_hours(request.user)
+        planning_hours = copy.copy(current_hours)
+        plans = {}
+        pending_stops = []
+
+        for index, coords in waypoints.items():
+            route = routes[route_key(*coords)]
+            if isinstance(route, Exception):
+                results[index] = self._batch_error(index, str(route))
+                continue
+
+            data = valid[index]
+            route_data, pending = self._plan_route(
+                [data[field] for field in self.location_fields], coords, route, planning_hours
+            )
+            plans[index] = (route_data, self._hours_used(planning_hours), None)
+            self._add_hours(planning_hours, route_data)
+            pending_stops.extend((index, stop) for stop in pending)
+
+        # Locate the stops of every plan concurrently
+        errors = self._locate_stops(geolocator, [stop for _, stop in pending_stops], safe=True)
+        if (throttled := first_throttled(errors)) is not None:
+            return throttled_response(throttled)
+        for (index, _), error in zip(pending_stops, errors):
+            if error is not None and plans[index][2] is None:
+                plans[index] = (*plans[index][:2], error)
+
+        # Save each plan in its own transaction, in order. Hours are only
+        # carried forward once an item is saved; an item planned with the
+        # hours of one that failed afterwards is planned again.
+        hours = copy.copy(current_hours)
+        for index, (route_data, planned_from, error) in plans.items():
+            data = valid[index]
+            if planned_from != self._hours_used(hours):
+                route_data, error = self._replan(geolocator, data, waypoints[index], routes, hours)
+            if error is not None:
+                results[index] = self._batch_error(index, str(error))
+                continue
+
+            # _save_plan sets the hours it is given to the saved ones, so
+            # give it a copy that is dropped if the save rolls back
+            saved_hours = copy.copy(hours)
+            try:
+                with transaction.atomic():
+                    self._save_plan(
+                        request.user,
+                        saved_hours,
+                        data['pickup_location'],
+                        data['dropoff_location'],
+                        route_data
+                    )
+            except DatabaseError as e:
+                results[index] = self._batch_error(index, str(e))
+                continue
+            hours = saved_hours
+
+            results[index] = {
+                'index': index,
+                'status': 'ok',
+                'route': serialize(RouteResponseSerializer, route_data),
+            }
+
+        return Response({'results': results})
+
+    def _hours_used(self, hours_of_service):
+        return (hours_of_service.driving_used, hours_of_service.daily_used, hours_of_service.cycle_used)
+
+    def _replan(self, geolocator, data, coords, routes, hours_of_service):
+        """
+        Plan one item again from the given hours and locate its stops
+
+        Returns:
+            tuple: (route details, the error locating a stop failed with or None)
         """
-        # Similar to finding rest stops, but looking for gas stations
-        # Would use OSM or Overpass API to find actual gas stations
-        steps = route.get('legs', [{}])[0].get('steps', [])
-        
-        # Find the step that corresponds roughly to the ratio
-        current_distance = 0
-        target_distance = route['distance'] * ratio
-        step_location = "Fuel Station"
-        
-        for step in steps:
-            current_distance += step['distance']
-            if current_distance >= target_distance:
-                instruction = step.get('maneuver', {}).get('location', [])
-                if instruction:
-                    long = instruction[0]
-                    lat = instruction[1]
-
-                    geolocator = Nominatim(user_agent="trucking_route_planner")
-                    location = geolocator.reverse(f'{lat}, {long}')
-                    address = location.address
-                    
-                    step_location = address
-                break
-        
-        return step_location
+        route_data, pending = self._plan_route(
+            [data[field] for field in self.location_fields], coords, routes[route_key(*coords)], hours_of_service
+        )
+        errors = self._locate_stops(geolocator, pending, safe=True)
+        return route_data, next((error for error in errors if error is not None), None)
+
+    def _batch_error(self, index, errors):
+        return {'index': index, 'status': 'error', 'errors': errors}
+
     
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -566,28 +768,38 @@ def reverse_geocode(request):
         lat =  serializer.validated_data['lat']
         lng = serializer.validated_data['lng']
 
-        geolocator = Nominatim(user_agent="trucking_route_planner")
-        location = geolocator.reverse(f'{lat}, {lng}')
-        address = location.address
+        geolocator = get_geolocator()
+        address = reverse_geocode_address(geolocator, lat, lng)
         return Response(
             {'formatted_address': address}
         )
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def geo_cache_stats(request):
+    """
+    Hit/miss counters for the geo lookup caches in this worker process
+    """
+    return Response(cache_stats())
+
+
 @api_view(['GET'])
 def generate_driver_log_pdf(request):
+    # Pass ?start=YYYY-MM-DD&end=YYYY-MM-DD for one page per day of a range
+    if 'start' in request.query_params or 'end' in request.query_params:
+        return generate_driver_log_range_pdf(request)
+    
     try:
         from datetime import datetime
         
         # Try to get data but use defaults if not found
         try:
-            driver_log = LogSheet.objects.get(date=datetime.today())
-            activities = driver_log.activities.all()
+            driver_log = LogSheet.objects.get(driver=request.user, date=datetime.today())
             driver = DriverProfile.objects.get(user=request.user)
         except:
             print("Using placeholder data")
-            activities = []  # Empty list if no activities found
 
         # Get current hours of service
         import datetime
@@ -597,120 +809,154 @@ def generate_driver_log_pdf(request):
             )
         duty_used = str(current_hours.daily_used)
         driving_used = str(current_hours.driving_used)
+        activities = list(driver_log.activities.order_by('start_time', 'id'))
+        
+        # The app already has this exact render
+        etag = log_sheet_etag('canvas', [(driver_log, activities, current_hours)], driver)
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+        
+        def render():
+            buffer = io.BytesIO()
+            c = canvas.Canvas(buffer, pagesize=letter, invariant=1)
+            draw_log_sheet(c, driver_log.date, driver_log.trip, activities, driver, driving_used, duty_used)
+            c.save()
+            return buffer.getvalue()
+        
+        # Create response with PDF, rendered only if it is not cached
+        response = HttpResponse(get_or_render(etag, render), content_type='application/pdf')
+        response['Content-Disposition'] = f'attachment; filename="driver_log_test.pdf"'
+        return pdf_cache_headers(response, etag)
         
-        # Create a fresh PDF
-        buffer = io.BytesIO()
-        c = canvas.Canvas(buffer, pagesize=letter)
-
-        c.setFont("Helvetica", 18)
-        c.setFillColorRGB(0, 0, 0)
-        c.drawString(50, 750, "Driver Log Sheet")
-        c.drawString(350, 750.0, driver_log.date.strftime('%m/%d/%Y'))
-        c.drawString(100, 710, f'Tractor number: {driver.driver_license}')
-        c.drawString(100, 665.7, f'From: {driver_log.trip.pickup_location}')
-        c.drawString(331.5, 667.7, f'To: {driver_log.trip.dropoff_location}')
-        c.drawString(100, 630.3, f'Total Distance (miles): {str(driver_log.trip.distance)}')
-        c.drawString(100, 600, f'Total driving time (Hrs): {driving_used}')
-        c.drawString(331.5, 600, f'Total duty time (Hrs): {duty_used}')
-        
-        # Define grid parameters 
-        grid_start_x = 73.2
-        grid_start_y = 412.4
-        grid_width = 454.9
-        grid_height = 19.2
-
-        # Define activity row positions (y-coordinates)
-        activity_rows = {
-            'OFF_DUTY': grid_start_y + (3 * grid_height),
-            'SLEEPER': grid_start_y + (2 * grid_height),
-            'Driving': grid_start_y + (1 * grid_height),
-            'ON_DUTY': grid_start_y
-        }
+    except Exception as e:
+        import traceback
+        print(traceback.format_exc())
+        return Response({'error': str(e)}, status=500)
 
-        # Function to convert 12-hour time string to x-coordinate
-        def time_to_x_coord(time_str):
-            try:
-                # Handle different possible 12-hour formats
-                if ':' in time_str:
-                    # Format like "2:30 PM" or "10:45 AM"
-                    time_parts = time_str.strip().split(' ')
-                    hour_minute = time_parts[0].split(':')
-                    hour = int(hour_minute[0])
-                    minute = int(hour_minute[1]) if len(hour_minute) > 1 else 0
-                    am_pm = time_parts[1].upper() if len(time_parts) > 1 else 'AM'
-                else:
-                    # Format like "2 PM" or "10 AM"
-                    time_parts = time_str.strip().split(' ')
-                    hour = int(time_parts[0])
-                    minute = 0
-                    am_pm = time_parts[1].upper() if len(time_parts) > 1 else 'AM'
-                
-                # Convert to 24-hour format
-                if am_pm == 'PM' and hour < 12:
-                    hour += 12
-                elif am_pm == 'AM' and hour == 12:
-                    hour = 0
-                
-                # Calculate position on 24-hour grid
-                hour_fraction = hour + (minute / 60)
-                x_position = grid_start_x + (hour_fraction / 24) * grid_width
-                return x_position
-            
-            except (ValueError, IndexError):
-                # Return default position if conversion fails
-                print(f"Could not parse time: {time_str}")
-                return grid_start_x
-        
-        # Draw the grid framework
-        c.setStrokeColorRGB(0, 0, 1)  # Blue for grid lines
-        c.setLineWidth(1)
-        
-        # Draw horizontal grid lines
-        for i in range(5):
-            y = grid_start_y + (i * grid_height)
-            c.line(grid_start_x, y, grid_start_x + grid_width, y)
-        
-        # Draw vertical grid lines (24 hours)
-        for i in range(25):
-            x = grid_start_x + (i * (grid_width/24))
-            c.line(x, grid_start_y, x, grid_start_y + (4 * grid_height))
-        
-        # Label the grid
-        c.setFont("Helvetica", 8)
-        c.drawString(grid_start_x - 60, grid_start_y + (3 * grid_height), "OFF DUTY")
-        c.drawString(grid_start_x - 60, grid_start_y + (2 * grid_height), "SLEEPER")
-        c.drawString(grid_start_x - 60, grid_start_y + (1 * grid_height), "DRIVING")
-        c.drawString(grid_start_x - 60, grid_start_y, "ON DUTY")
-
-        for activity in activities:
-            # Get y-coordinate for this activity type
-            y_position = activity_rows.get(activity.activity_type, grid_start_y)
-            
-            # Get x-coordinates for start and end times
-            start_x = time_to_x_coord(activity.start_time)
-            end_x = time_to_x_coord(activity.end_time)
-            
-            # Set line properties
-            c.setStrokeColorRGB(0, 0, 0)  # Black line
-            c.setLineWidth(2)             # Line thickness
-            
-            # Draw the horizontal line
-            c.line(start_x, y_position, end_x, y_position)
-            
+
+def generate_driver_log_range_pdf(request):
+    """
+    Stream the driver's log for a date range, one page per day
+    
+    A trip is logged on the sheet of the day it was planned, but its
+    activities run on into the following days, so each page shows every
+    activity overlapping its day, whichever sheet it is logged on. Days
+    without a trip get a page with their off-duty grid too. Sheets,
+    activities and hours of service for the whole range are loaded up
+    front in three queries; the PDF is then generated and sent page by page.
+    """
+    serializer = DriverLogRangeSerializer(data=request.query_params)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    start = serializer.validated_data['start']
+    end = serializer.validated_data['end']
+    range_start, _ = day_bounds(start)
+    _, range_end = day_bounds(end)
+    
+    driver = get_object_or_404(DriverProfile, user=request.user)
+    activities = list(
+        LogActivity.objects
+        .filter(driver=request.user, start_time__lt=range_end, end_time__gt=range_start)
+        .select_related('log_sheet__trip')
+        .order_by('start_time', 'id')
+    )
+    sheets_by_date = {
+        log_sheet.date: log_sheet
+        for log_sheet in (
+            LogSheet.objects
+            .filter(driver=request.user, date__range=(start, end), trip__isnull=False)
+            .select_related('trip')
+        )
+    }
+    if not activities and not sheets_by_date:
+        return Response({'error': 'No log sheets in this date range'}, status=404)
+    
+    hours_by_date = {
+        hours.date: hours
+        for hours in HoursOfService.objects.filter(driver=request.user, date__range=(start, end))
+    }
+    days = []
+    for offset in range((end - start).days + 1):
+        date = start + timedelta(days=offset)
+        day_start, day_end = day_bounds(date)
+        day_activities = [a for a in activities if a.start_time < day_end and a.end_time > day_start]
+        # The day's own sheet, else the sheet of the trip still under way
+        log_sheet = sheets_by_date.get(date) or next((a.log_sheet for a in day_activities), None)
+        days.append((date, log_sheet, day_activities, hours_by_date.get(date)))
+    
+    # Ranges are streamed rather than cached, but still revalidate cheaply
+    etag = log_sheet_etag(f'canvas:{start}:{end}', [page[1:] for page in days], driver)
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+    
+    def page(date, log_sheet, activities, hours):
+        trip = log_sheet.trip if log_sheet is not None else None
+        driving_used = str(hours.driving_used) if hours else 'N/A'
+        duty_used = str(hours.daily_used) if hours else 'N/A'
+        return lambda c: draw_log_sheet(c, date, trip, activities, driver, driving_used, duty_used)
+    
+    response = StreamingHttpResponse(
+        stream_pdf(page(*args) for args in days),
+        content_type='application/pdf'
+    )
+    response['Content-Disposition'] = f'attachment; filename="driver_log_{start}_{end}.pdf"'
+    return pdf_cache_headers(response, etag)
+
+
+def pdf_cache_headers(response, etag):
+    """
+    Tag a log PDF response so clients revalidate it with If-None-Match
+    """
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+@api_view(['GET'])
+def generate_driver_log_template_pdf(request):
+    """
+    Today's log sheet filled in on the blank paper log template
+    """
+    try:
+        # Get the driver log data
+        from datetime import datetime
+        driver_log = LogSheet.objects.select_related('trip').get(driver=request.user, date=datetime.today())
+        activities = list(driver_log.activities.order_by('start_time', 'id'))
         
-        # Save the canvas
-        c.save()
+        # Get driver info
+        driver = DriverProfile.objects.get(user=request.user)
         
-        # Reset the buffer position
-        buffer.seek(0)
+        # The app already has this exact render
+        etag = log_sheet_etag('template', [(driver_log, activities, None)], driver)
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
         
-        # Create response with PDF
-        response = HttpResponse(buffer, content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="driver_log_test.pdf"'
+        try:
+            template = get_log_template()
+        except FileNotFoundError:
+            return Response({'error': 'PDF template not found'}, status=404)
         
-        return response
+        def draw(c):
+            # Set font before drawing text
+            c.setFont("Helvetica", 10)
+            
+            # Draw text data on the canvas
+            c.drawString(233.2, 731.0, driver_log.date.strftime('%m/%d/%Y'))
+            c.drawString(117.6, 665.7, driver_log.trip.pickup_location)
+            c.drawString(331.5, 667.7, driver_log.trip.dropoff_location)
+            c.drawString(206.2, 604.3, str(driver_log.trip.distance))
+            c.drawString(113.7, 548.6, driver.driver_license)
+            
+            # Activity lines with start and end markers; the grid is part of the template
+            draw_activities(c, activities, driver_log.date, markers=True)
         
-    except Exception as e:
-        import traceback
-        print(traceback.format_exc())
-        return Response({'error': str(e)}, status=500)
\ No newline at end of file
+        # Create response with PDF, rendered only if it is not cached
+        response = HttpResponse(get_or_render(etag, lambda: template.render(draw)), content_type='application/pdf')
+        response['Content-Disposition'] = f'attachment; filename="driver_log.pdf"'
+        return pdf_cache_headers(response, etag)
+        
+    except LogSheet.DoesNotExist:
+        return Response({'error': 'Log sheet not found'}, status=404)
@@ -145,6 +145,11 @@ STATIC_ROOT= os.path.join(BASE_DIR, 'static')
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 # REST framework settings
+# Serve trip lists and plan responses from plain rows (api.projection) and
+# render JSON with orjson when it is installed (api.renderers). Responses are
+# byte for byte the same either way.
+FAST_JSON = os.getenv('FAST_JSON', 'true').lower() in ('1', 'true')
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.TokenAuthentication',
@@ -152,8 +157,126 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer' if FAST_JSON else 'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
+# Geo lookup caches (in-process LRU in front of the GeoCacheEntry table)
+# TTL is in seconds; anything omitted falls back to api.cache.DEFAULT_CACHE_CONFIG
+GEO_CACHES = {
+    'geocode': {
+        'MAX_ENTRIES': 1024,
+        'DB_MAX_ENTRIES': 50000,
+        'TTL': 60 * 60 * 24 * 30,
+    },
+    'reverse': {
+        'MAX_ENTRIES': 4096,
+        'DB_MAX_ENTRIES': 200000,
+        'TTL': 60 * 60 * 24 * 30,
+        'PRECISION': 3,  # Decimal places of the lat/lng grid cell (~110m)
+    },
+    'route': {
+        'MAX_ENTRIES': 256,
+        'DB_MAX_ENTRIES': 20000,
+        'TTL': 60 * 60 * 24 * 7,
+        'SNAP_PRECISION': 3,  # Decimal places start/end points are snapped to
+    },
+}
+
+# Pooled keep-alive session shared by every outbound geocoding/routing call
+OUTBOUND_HTTP = {
+    'POOL_CONNECTIONS': 10,
+    'POOL_MAXSIZE': 10,
+    'TIMEOUT': 10,          # Seconds
+    'RETRIES': 3,
+    'BACKOFF_FACTOR': 0.5,  # Exponential backoff between retries
+    # Minimum seconds between requests per host. The public servers allow
+    # one request a second; self-hosted ones need no entry.
+    'MIN_INTERVALS': {
+        'nominatim.openstreetmap.org': 1.0,
+        'router.project-osrm.org': 1.0,
+    },
+    # Seconds the batch and async views let a request wait for its host's
+    # slot before answering 503 rather than queueing past the request timeout
+    'MAX_QUEUE_WAIT': 10,
+}
+
+# Routing service used by the route planner. Point OSRM_BASE_URL at a
+# self-hosted or local OSRM to avoid the public demo server.
+ROUTING_BACKEND = {
+    'BACKEND': 'api.routing.OSRMBackend',
+    'OPTIONS': {
+        'base_url': os.getenv('OSRM_BASE_URL', 'https://router.project-osrm.org'),
+        'profile': 'driving',
+        'timeout': 10,
+    },
 }
 
+# Nominatim server used for geocoding and reverse geocoding
+NOMINATIM_URL = os.getenv('NOMINATIM_URL', 'https://nominatim.openstreetmap.org')
+
+# Offline stand-in for OSRM and Nominatim (api.standin), for load tests and
+# development without the public services. When enabled, every routing and
+# geocoding call is answered in process from the fixture file after the
+# given latency; RECORD fills the file from the real services instead.
+# `manage.py run_geo_standin` serves the same responses over HTTP.
+GEO_STANDIN = {
+    'ENABLED': os.getenv('GEO_STANDIN', 'false').lower() in ('1', 'true'),
+    'FIXTURES': os.getenv('GEO_STANDIN_FIXTURES', str(BASE_DIR / 'geo_fixtures.json')),
+    'LATENCY': {    # Seconds
+        'route': float(os.getenv('GEO_STANDIN_ROUTE_LATENCY', '0.2')),
+        'search': float(os.getenv('GEO_STANDIN_SEARCH_LATENCY', '0.1')),
+        'reverse': float(os.getenv('GEO_STANDIN_REVERSE_LATENCY', '0.1')),
+    },
+    'RECORD': os.getenv('GEO_STANDIN_RECORD', 'false').lower() in ('1', 'true'),
+    'SYNTHESIZE': True,     # Make up responses for requests not in the file
+}
+
+# Offline truck stop / fuel station dataset (CSV or GeoJSON) used to place
+# rest and fuel stops. Without it stops are reverse geocoded instead.
+POI_DATASET = {
+    'PATH': os.getenv('POI_DATASET_PATH'),
+    'CORRIDOR': 5000,   # Max meters off the route
+    'WINDOW': 40000,    # Max meters a stop may move along the route
+}
+
+# Rendered driver log PDFs are cached under the hash of their inputs, so
+# entries never go stale; they only age out. Point 'pdf' at a shared cache
+# (e.g. Redis) to share renders between processes.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'pdf': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'log-pdfs',
+        'TIMEOUT': 60 * 60 * 24,
+        'OPTIONS': {'MAX_ENTRIES': 500},
+    },
+    # Per-driver dashboard responses (api.dashboard). Their version counters
+    # live in the database, so every process sees a bump; set
+    # DASHBOARD_CACHE_URL to a shared Redis (needs redis-py) to share the
+    # responses themselves between worker processes too.
+    'dashboard': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'dashboard',
+        'TIMEOUT': 60 * 60,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+if os.getenv('DASHBOARD_CACHE_URL'):
+    CACHES['dashboard'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('DASHBOARD_CACHE_URL'),
+        'TIMEOUT': 60 * 60,
+    }
+
+# Maximum number of geocoding/routing lookups in flight per process
+GEO_LOOKUP_CONCURRENCY = 8
+
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = True
 